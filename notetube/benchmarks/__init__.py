@@ -0,0 +1,30 @@
+"""Бенчмарки производительности проекта.
+
+Запускаются из каталога с ``manage.py``, например::
+
+    python -m benchmarks.query_plans --posts 20000
+"""
+import os
+from contextlib import contextmanager
+
+
+def setup():
+    """Настраивает Django для запуска бенчмарка как скрипта."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database(alias='default'):
+    """Создает на время бенчмарка отдельную тестовую БД."""
+    from django.db import connections
+
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
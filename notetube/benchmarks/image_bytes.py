@@ -0,0 +1,120 @@
+"""Байты картинок на страницу ленты: одна миниатюра 1200x600 против srcset.
+
+Создает посты с картинками, прогоняет их через нормализацию загрузки
+и воркер миниатюр, затем для набора экранов считает, сколько байт
+скачает браузер за одну страницу ленты (``NUMBER_OF_POSTS`` карточек),
+выбирая кандидата из ``srcset`` по правилам ``sizes``.
+"""
+import argparse
+import random
+import tempfile
+from io import BytesIO
+
+from . import setup, test_database
+
+# (ширина окна в CSS-пикселях, плотность экрана)
+VIEWPORTS = ((360, 1), (360, 2), (768, 1), (1024, 1), (1440, 1), (1440, 2))
+CARD_CONTAINER = 1140
+
+
+def make_photo(width, height):
+    """Картинка, сжимающаяся примерно как фотография."""
+    from PIL import Image, ImageFilter
+
+    noise = Image.effect_noise((width // 4, height // 4), 24).convert('RGB')
+    gradient = Image.linear_gradient('L').resize(noise.size).convert('RGB')
+    image = Image.blend(noise, gradient, 0.5).resize((width, height))
+    buffer = BytesIO()
+    image.filter(ImageFilter.SMOOTH).save(buffer, 'JPEG', quality=92)
+
+    return buffer.getvalue()
+
+
+def slot_width(viewport):
+    """Ширина слота карточки по ``RESPONSIVE_CARD_SIZES``."""
+    return CARD_CONTAINER if viewport >= 1200 else viewport
+
+
+def pick(candidates, required):
+    """Кандидат srcset, который выберет браузер: наименьший не уже нужного."""
+    for width, size in candidates:
+        if width >= required:
+            return size
+
+    return candidates[-1][1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(argv)
+    random.seed(options.seed)
+    setup()
+    from django.core.files.storage import default_storage
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test.utils import override_settings
+
+    from posts import thumbnails
+    from posts.constants import (
+        NUMBER_OF_POSTS,
+        RESPONSIVE_FORMATS,
+        RESPONSIVE_WIDTHS,
+    )
+    from posts.images import normalize_image
+    from posts.models import Post, User
+
+    with tempfile.TemporaryDirectory() as media_root, \
+            override_settings(MEDIA_ROOT=media_root), test_database():
+        author = User.objects.create(username='benchmark')
+        for index in range(options.posts):
+            upload = SimpleUploadedFile(
+                f'{index}.jpg',
+                make_photo(random.randint(2000, 4000), 2000)
+            )
+            Post.objects.create(
+                author=author, text='Пост', image=normalize_image(upload)
+            )
+        jobs = thumbnails.claim(options.posts)
+        while jobs:
+            thumbnails.process_batch(jobs)
+            jobs = thumbnails.claim(options.posts)
+        variants = {image_format: [] for image_format in RESPONSIVE_FORMATS}
+        for post in Post.objects.all():
+            for image_format in RESPONSIVE_FORMATS:
+                sizes = []
+                for width in RESPONSIVE_WIDTHS:
+                    thumbnail = thumbnails.backend.get_ready_thumbnail(
+                        post.image,
+                        f'{width}x{width // 2}',
+                        crop='center',
+                        upscale=True,
+                        format=image_format
+                    )
+                    sizes.append((width, default_storage.size(thumbnail.name)))
+                variants[image_format].append(sizes)
+        cards = min(NUMBER_OF_POSTS, options.posts)
+        print(f'Байт картинок на страницу из {cards} карточек')
+        print(f'{"экран":>10} {"1200 JPEG":>12} {"srcset JPEG":>12} '
+              f'{"srcset WebP":>12} {"экономия":>9}')
+        for viewport, dpr in VIEWPORTS:
+            required = slot_width(viewport) * dpr
+            legacy = sum(
+                sizes[-1][1] for sizes in variants['JPEG'][:cards]
+            )
+            totals = {
+                image_format: sum(
+                    pick(sizes, required)
+                    for sizes in variants[image_format][:cards]
+                )
+                for image_format in RESPONSIVE_FORMATS
+            }
+            best = min(totals.values())
+            print(
+                f'{viewport:>6}@{dpr}x {legacy:>12} {totals["JPEG"]:>12} '
+                f'{totals["WEBP"]:>12} {1 - best / legacy:>8.0%}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Планы и время горячих запросов до и после индексов 0008_indexes.
+
+Схема мигрируется до ``0007_userstats``, заполняется данными,
+затем для каждого запроса снимается ``EXPLAIN QUERY PLAN`` и время;
+после миграции на ``0008_indexes`` замеры повторяются.
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from . import setup, test_database
+
+BEFORE = ('posts', '0007_userstats')
+AFTER = ('posts', '0008_indexes')
+PAGE = 11
+BATCH_SIZE = 500
+
+QUERIES = {
+    'index': (
+        'SELECT id FROM posts_post '
+        'ORDER BY pub_date DESC, id DESC LIMIT %s',
+        lambda ids: [PAGE]
+    ),
+    'profile': (
+        'SELECT id FROM posts_post WHERE author_id = %s '
+        'ORDER BY pub_date DESC, id DESC LIMIT %s',
+        lambda ids: [random.choice(ids['users']), PAGE]
+    ),
+    'group_posts': (
+        'SELECT id FROM posts_post WHERE group_id = %s '
+        'ORDER BY pub_date DESC, id DESC LIMIT %s',
+        lambda ids: [random.choice(ids['groups']), PAGE]
+    ),
+    'post_comments': (
+        'SELECT id FROM posts_comment WHERE post_id = %s '
+        'ORDER BY created',
+        lambda ids: [random.choice(ids['posts'])]
+    ),
+    'follow_lookup': (
+        'SELECT 1 FROM posts_follow WHERE user_id = %s AND author_id = %s '
+        'LIMIT 1',
+        lambda ids: [random.choice(ids['users']), random.choice(ids['users'])]
+    ),
+}
+
+
+def migrate(connection, target):
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connection)
+    executor.loader.build_graph()
+    executor.migrate([target])
+
+    return executor.loader.project_state(target).apps
+
+
+def seed(apps, users, groups, posts, comments, follows):
+    """Заполняет БД историческими моделями, минуя сигналы."""
+    from django.utils import timezone
+
+    User = apps.get_model('auth', 'User')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    User.objects.bulk_create(
+        User(username=f'user{index}', password='!') for index in range(users)
+    )
+    Group.objects.bulk_create(
+        Group(title=f'Группа {index}', slug=f'group-{index}', description='')
+        for index in range(groups)
+    )
+    ids = {
+        'users': list(User.objects.values_list('pk', flat=True)),
+        'groups': list(Group.objects.values_list('pk', flat=True)),
+    }
+    now = timezone.now()
+    Post.objects.bulk_create(
+        (
+            Post(
+                text='Текст поста',
+                author_id=random.choice(ids['users']),
+                group_id=random.choice(ids['groups'] + [None]),
+                pub_date=now - timedelta(minutes=index),
+            )
+            for index in range(posts)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    ids['posts'] = list(Post.objects.values_list('pk', flat=True))
+    Comment.objects.bulk_create(
+        (
+            Comment(
+                text='Комментарий',
+                post_id=random.choice(ids['posts']),
+                author_id=random.choice(ids['users']),
+            )
+            for _ in range(comments)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    pairs = {
+        (random.choice(ids['users']), random.choice(ids['users']))
+        for _ in range(follows)
+    }
+    Follow.objects.bulk_create(
+        (Follow(user_id=user, author_id=author) for user, author in pairs),
+        batch_size=BATCH_SIZE
+    )
+
+    return ids
+
+
+def measure(connection, ids, repeat):
+    results = {}
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        for name, (sql, params) in QUERIES.items():
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params(ids))
+            plan = [row[-1] for row in cursor.fetchall()]
+            start = time.perf_counter()
+            for _ in range(repeat):
+                cursor.execute(sql, params(ids))
+                cursor.fetchall()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            results[name] = (plan, elapsed)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--comments', type=int, default=100000)
+    parser.add_argument('--follows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(argv)
+    random.seed(options.seed)
+    setup()
+    with test_database() as connection:
+        apps = migrate(connection, BEFORE)
+        ids = seed(
+            apps,
+            options.users,
+            options.groups,
+            options.posts,
+            options.comments,
+            options.follows,
+        )
+        before = measure(connection, ids, options.repeat)
+        migrate(connection, AFTER)
+        after = measure(connection, ids, options.repeat)
+    for name in QUERIES:
+        print(f'== {name}')
+        for label, (plan, elapsed) in (
+            ('до', before[name]), ('после', after[name])
+        ):
+            print(f'  {label}: {elapsed:.3f} мс')
+            for step in plan:
+                print(f'    {step}')
+
+
+if __name__ == '__main__':
+    main()
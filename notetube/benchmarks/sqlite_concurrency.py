@@ -0,0 +1,146 @@
+"""Конкурентные чтения и записи SQLite с профилем PRAGMA и без него.
+
+Для каждой конфигурации создается отдельная файловая БД, заполняется
+синтетическими данными, затем ``--readers`` потоков читают страницу
+ленты, а ``--writers`` потоков добавляют комментарии в течение
+``--duration`` секунд. ``baseline`` — настройки SQLite по умолчанию
+и новое соединение на каждую операцию (как без ``CONN_MAX_AGE``),
+``tuned`` — профиль ``performance`` и постоянные соединения.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from . import setup, test_database
+
+# Имя: (профиль SQLITE_PROFILES, новое соединение на каждую операцию).
+CONFIGS = {
+    'baseline': ('default', True),
+    'tuned': ('performance', False),
+}
+
+
+def seed(options):
+    from posts import bulk_import
+    from posts.models import Post, User
+
+    importer = bulk_import.Importer()
+    rows = bulk_import.fake_rows(
+        users=options.users, groups=5, posts=options.posts, comments=0,
+        follows_per_user=0, seed=options.seed
+    )
+    for name, model_rows in rows.items():
+        importer.load(name, model_rows)
+
+    return (
+        list(User.objects.values_list('pk', flat=True)),
+        list(Post.objects.values_list('pk', flat=True)),
+    )
+
+
+def worker(kind, ids, deadline, reconnect, results, lock):
+    from django.db import OperationalError, connection
+
+    from posts.models import Comment, Post
+
+    user_ids, post_ids = ids
+    done = errors = 0
+    latencies = []
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if kind == 'read':
+                list(Post.objects.for_listing().order_by(
+                    '-pub_date', '-pk'
+                )[:10])
+            else:
+                Comment.objects.create(
+                    post_id=random.choice(post_ids),
+                    author_id=random.choice(user_ids),
+                    text='Комментарий из бенчмарка'
+                )
+            done += 1
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            errors += 1
+        if reconnect:
+            connection.close()
+    connection.close()
+    with lock:
+        result = results.setdefault(
+            kind, {'done': 0, 'errors': 0, 'latencies': []}
+        )
+        result['done'] += done
+        result['errors'] += errors
+        result['latencies'].extend(latencies)
+
+
+def run(name, options):
+    from django.conf import settings
+    from django.db import connection
+
+    profile, reconnect = CONFIGS[name]
+    settings.SQLITE_PROFILE = profile
+    path = os.path.join(options.directory, f'{name}.sqlite3')
+    connection.settings_dict['TEST']['NAME'] = path
+    with test_database():
+        ids = seed(options)
+        connection.close()
+        results = {}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options.duration
+        threads = [
+            threading.Thread(
+                target=worker,
+                args=(kind, ids, deadline, reconnect, results, lock)
+            )
+            for kind, count in (
+                ('read', options.readers), ('write', options.writers)
+            )
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--configs', nargs='+', choices=CONFIGS, default=list(CONFIGS)
+    )
+    options = parser.parse_args(argv)
+    random.seed(options.seed)
+    setup()
+    with tempfile.TemporaryDirectory() as directory:
+        options.directory = directory
+        for name in options.configs:
+            results = run(name, options)
+            print(f'== {name}')
+            for kind in ('read', 'write'):
+                result = results.get(kind)
+                if result is None:
+                    continue
+                latencies = sorted(result['latencies']) or [0]
+                p95 = latencies[int(len(latencies) * 0.95) - 1]
+                print(
+                    f'  {kind}: {result["done"] / options.duration:.0f} '
+                    f'оп/с, p95 {p95 * 1000:.1f} мс, '
+                    f'ошибок блокировки {result["errors"]}'
+                )
+
+
+if __name__ == '__main__':
+    main()
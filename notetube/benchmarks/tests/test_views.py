@@ -0,0 +1,89 @@
+import json
+
+from django.test import SimpleTestCase
+
+from ..views import compare, percentile, summarize
+
+
+class PercentileTests(SimpleTestCase):
+    """Тестирует перцентили бенчмарка страниц."""
+
+    def test_nearest_rank(self):
+        """Перцентиль — значение ближайшего ранга, порядок не важен."""
+        values = list(range(20, 0, -1))
+        for rank, expected in ((50, 10), (90, 18), (95, 19), (99, 20)):
+            with self.subTest(rank=rank):
+                self.assertEqual(percentile(values, rank), expected)
+
+    def test_small_samples(self):
+        """На одном и двух значениях перцентили не выходят за выборку."""
+        self.assertEqual(percentile([7], 50), 7)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([3, 1], 50), 1)
+        self.assertEqual(percentile([3, 1], 95), 3)
+
+    def test_summarize(self):
+        """Сводка страницы: перцентили, среднее, максимумы и число
+        замеров.
+        """
+        result = summarize(
+            [float(value) for value in range(1, 101)],
+            [5, 6, 5], [1000, 1200, 1100]
+        )
+        self.assertEqual(
+            (result['p50'], result['p95'], result['p99']), (50, 95, 99)
+        )
+        self.assertEqual(result['mean'], 50.5)
+        self.assertEqual(
+            (result['max'], result['queries'], result['bytes']),
+            (100, 6, 1200)
+        )
+        self.assertEqual(result['requests'], 100)
+
+
+class CompareTests(SimpleTestCase):
+    """Тестирует сравнение результатов с сохраненными."""
+
+    # Сохраненные результаты проходят через JSON, как файл --baseline.
+    baseline = json.loads(json.dumps({
+        'views': {
+            'index': {'p95': 100.0, 'bytes': 1000, 'queries': 5},
+        },
+    }))
+
+    def results(self, **metrics):
+        return {'views': {
+            'index': {'p95': 100.0, 'bytes': 1000, 'queries': 5, **metrics},
+            'new_view': {'p95': 1000.0, 'bytes': 10 ** 6, 'queries': 50},
+        }}
+
+    def test_regression(self):
+        """Рост p95, байтов и запросов сверх допуска — регрессия."""
+        self.assertEqual(
+            compare(
+                self.results(p95=130.0, bytes=1300, queries=6),
+                self.baseline, tolerance=0.2, query_tolerance=0
+            ),
+            [
+                'index: p95 130.0 (было 100.0)',
+                'index: bytes 1300 (было 1000)',
+                'index: queries 6 (было 5)',
+            ]
+        )
+
+    def test_improvement_and_tolerance(self):
+        """Улучшение и рост в пределах допуска — не регрессия,
+        страницы без сохраненных результатов не сравниваются.
+        """
+        for metrics in (
+            {'p95': 50.0, 'bytes': 900, 'queries': 3},
+            {'p95': 120.0, 'bytes': 1200, 'queries': 6},
+        ):
+            with self.subTest(metrics=metrics):
+                self.assertEqual(
+                    compare(
+                        self.results(**metrics), self.baseline,
+                        tolerance=0.2, query_tolerance=1
+                    ),
+                    []
+                )
@@ -0,0 +1,242 @@
+"""Задержка, число запросов к БД и размер ответа публичных страниц.
+
+Заполняет тестовую БД синтетическими данными (``posts.bulk_import``),
+затем тестовым клиентом Django запрашивает каждую страницу
+``--requests`` раз и считает перцентили времени, число SQL-запросов
+и байты ответа. Результаты печатаются таблицей и пишутся в JSON
+(``--output``). С ``--baseline`` результаты сравниваются с сохраненными
+и при регрессии скрипт завершается с кодом 1::
+
+    python -m benchmarks.views --output baseline.json
+    python -m benchmarks.views --baseline baseline.json
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+
+from . import setup, test_database
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, rank):
+    """Перцентиль ``rank`` по методу ближайшего ранга."""
+    values = sorted(values)
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+
+    return values[index]
+
+
+def summarize(timings, queries, sizes):
+    result = {
+        f'p{rank}': round(percentile(timings, rank), 3)
+        for rank in PERCENTILES
+    }
+    result.update(
+        mean=round(sum(timings) / len(timings), 3),
+        max=round(max(timings), 3),
+        queries=max(queries),
+        bytes=max(sizes),
+        requests=len(timings),
+    )
+
+    return result
+
+
+def scenarios(ids):
+    """Для каждой страницы — функция, возвращающая метод, адрес и данные."""
+    from django.urls import reverse
+
+    def get(name, **kwargs):
+        return 'get', reverse(name, kwargs=kwargs), None
+
+    return {
+        'index': lambda: get('posts:index'),
+        'group_posts': lambda: get(
+            'posts:group_list', slug=random.choice(ids['groups'])
+        ),
+        'profile': lambda: get(
+            'posts:profile', username=random.choice(ids['users'])
+        ),
+        'post_detail': lambda: get(
+            'posts:post_detail', post_id=random.choice(ids['posts'])
+        ),
+        'follow_index': lambda: get('posts:follow_index'),
+        'post_create': lambda: (
+            'post',
+            reverse('posts:post_create'),
+            {'text': 'Пост из бенчмарка'}
+        ),
+        'add_comment': lambda: (
+            'post',
+            reverse(
+                'posts:add_comment',
+                kwargs={'post_id': random.choice(ids['posts'])}
+            ),
+            {'text': 'Комментарий из бенчмарка'}
+        ),
+    }
+
+
+def measure(client, connection, request, count, warmup):
+    """Замеры одной страницы: миллисекунды, запросы и байты ответа."""
+    from django.test.utils import CaptureQueriesContext
+
+    timings, queries, sizes = [], [], []
+    for index in range(warmup + count):
+        method, url, data = request()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+        if index < warmup:
+            continue
+        timings.append(elapsed)
+        queries.append(len(context))
+        sizes.append(len(response.content))
+
+    return summarize(timings, queries, sizes)
+
+
+def compare(results, baseline, tolerance, query_tolerance):
+    """Регрессии относительно ``baseline``: список строк с описанием.
+
+    Время (p95) и байты могут вырасти не более чем на ``tolerance``
+    (доля), число запросов — не более чем на ``query_tolerance``.
+    """
+    regressions = []
+    for name, current in results['views'].items():
+        base = baseline['views'].get(name)
+        if base is None:
+            continue
+        limits = (
+            ('p95', base['p95'] * (1 + tolerance)),
+            ('bytes', base['bytes'] * (1 + tolerance)),
+            ('queries', base['queries'] + query_tolerance),
+        )
+        for metric, limit in limits:
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {current[metric]} '
+                    f'(было {base[metric]})'
+                )
+
+    return regressions
+
+
+def seed(options):
+    """Заполняет БД, возвращает имена и ключи для адресов страниц."""
+    from posts import bulk_import
+    from posts.models import Group, Post, User
+
+    importer = bulk_import.Importer()
+    rows = bulk_import.fake_rows(
+        users=options.users,
+        groups=options.groups,
+        posts=options.posts,
+        comments=options.comments,
+        follows_per_user=options.follows_per_user,
+        graph=options.graph,
+        celebrities=options.celebrities,
+        seed=options.seed
+    )
+    for name, model_rows in rows.items():
+        importer.load(name, model_rows)
+    bulk_import.finish(rows)
+
+    return {
+        'users': list(User.objects.values_list('username', flat=True)),
+        'groups': list(Group.objects.values_list('slug', flat=True)),
+        'posts': list(Post.objects.values_list('pk', flat=True)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=10000)
+    parser.add_argument('--follows-per-user', type=int, default=20)
+    parser.add_argument(
+        '--graph', choices=('uniform', 'powerlaw', 'celebrity'),
+        default='powerlaw'
+    )
+    parser.add_argument('--celebrities', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--views', nargs='+', metavar='VIEW')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Файл для результатов в JSON.')
+    parser.add_argument('--baseline', help='Результаты для сравнения.')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='Допустимый рост p95 и байтов, доля (0.2 — 20%%).'
+    )
+    parser.add_argument(
+        '--query-tolerance', type=int, default=0,
+        help='Допустимый рост числа запросов.'
+    )
+    options = parser.parse_args(argv)
+    random.seed(options.seed)
+    setup()
+    import django
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    with test_database() as connection:
+        ids = seed(options)
+        from posts.models import User
+
+        client = Client()
+        client.force_login(User.objects.get(username=ids['users'][0]))
+        pages = scenarios(ids)
+        results = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'options': vars(options),
+            },
+            'views': {},
+        }
+        for name in options.views or pages:
+            results['views'][name] = measure(
+                client, connection, pages[name],
+                options.requests, options.warmup
+            )
+    header = ('view', *(f'p{rank}' for rank in PERCENTILES), 'queries',
+              'bytes')
+    print('{:<14}'.format(header[0]) + ''.join(
+        f'{column:>10}' for column in header[1:]
+    ))
+    for name, result in results['views'].items():
+        print(f'{name:<14}' + ''.join(
+            f'{result[column]:>10}' for column in header[1:]
+        ))
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(
+            results, baseline, options.tolerance, options.query_tolerance
+        )
+        for regression in regressions:
+            print(f'Регрессия: {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .profiling import record_cache
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: локальный в процессе (L1) поверх общего (L2).
+
+    L1 хранит значения не дольше ``LOCAL_TIMEOUT`` секунд, поэтому
+    изменения из других процессов видны с этой задержкой. Ключи
+    с префиксами из ``LOCAL_EXCLUDE`` (например, версии содержимого)
+    всегда читаются из L2. ``get_or_set`` защищен от одновременного
+    пересчета одного значения несколькими процессами.
+
+    Параметры задаются в ``OPTIONS``:
+    ``SHARED`` — алиас общего кеша в ``CACHES``,
+    ``LOCAL_TIMEOUT``, ``LOCAL_MAX_ENTRIES``, ``LOCAL_EXCLUDE``,
+    ``LOCK_TIMEOUT`` — время жизни блокировки пересчета.
+    """
+
+    lock_poll_interval = 0.05
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.local_exclude = tuple(options.get('LOCAL_EXCLUDE', ()))
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self.local = LocMemCache(
+            'tiered-' + (location or self.shared_alias),
+            {'OPTIONS': {
+                'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000)
+            }}
+        )
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _is_local(self, key):
+        return self.local_timeout > 0 and not key.startswith(
+            self.local_exclude
+        )
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.local_timeout
+
+        return min(timeout, self.local_timeout)
+
+    def _set_local(self, key, value, timeout, version):
+        if not self._is_local(key):
+            return
+        local_timeout = self._local_timeout(timeout)
+        if local_timeout > 0:
+            self.local.set(key, value, local_timeout, version=version)
+        else:
+            self.local.delete(key, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._set_local(key, value, timeout, version)
+
+        return added
+
+    def get(self, key, default=None, version=None):
+        if self._is_local(key):
+            value = self.local.get(key, version=version)
+            if value is not None:
+                record_cache(1, 0)
+                return value
+        value = self.shared.get(key, version=version)
+        if value is None:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        self._set_local(key, value, DEFAULT_TIMEOUT, version)
+
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._set_local(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version=version)
+        self.shared.delete(key, version=version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = None
+            if self._is_local(key):
+                value = self.local.get(key, version=version)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key, value in shared.items():
+                self._set_local(key, value, DEFAULT_TIMEOUT, version)
+            found.update(shared)
+        record_cache(len(found), len(keys) - len(found))
+
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._set_local(key, value, timeout, version)
+
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.local.delete_many(keys, version=version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(key, version=version)
+
+        return self.shared.incr(key, delta, version=version)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """Возвращает значение, вычисляя его не более чем в одном процессе.
+
+        Процесс, взявший блокировку в общем кеше, считает значение,
+        остальные ждут его появления до ``LOCK_TIMEOUT`` секунд.
+        """
+        value = self.get(key, version=version)
+        if value is not None:
+            return value
+        lock_key = key + ':lock'
+        if self.shared.add(lock_key, 1, self.lock_timeout, version=version):
+            try:
+                return self._compute(key, default, timeout, version)
+            finally:
+                self.shared.delete(lock_key, version=version)
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.lock_poll_interval)
+            value = self.get(key, version=version)
+            if value is not None:
+                return value
+            if not self.shared.has_key(lock_key, version=version):
+                break
+
+        return self._compute(key, default, timeout, version)
+
+    def _compute(self, key, default, timeout, version):
+        value = default() if callable(default) else default
+        if value is not None:
+            self.set(key, value, timeout, version=version)
+
+        return value
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
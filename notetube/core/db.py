@@ -0,0 +1,23 @@
+"""Настройка соединений с базой.
+
+Для SQLite при каждом новом соединении выполняются PRAGMA профиля
+``SQLITE_PROFILE`` из ``SQLITE_PROFILES``. Профиль ``performance``
+включает WAL (читатели не ждут писателя), ``synchronous=NORMAL``,
+отображение файла в память, увеличенный кеш страниц и ожидание
+блокировки вместо немедленной ошибки «database is locked».
+"""
+from django.conf import settings
+
+
+def sqlite_pragmas():
+    """PRAGMA текущего профиля SQLite в порядке выполнения."""
+    return settings.SQLITE_PROFILES[settings.SQLITE_PROFILE]
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик ``connection_created``: выполняет PRAGMA профиля."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f'PRAGMA {name} = {value}')
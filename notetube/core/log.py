@@ -0,0 +1,22 @@
+import json
+import logging
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON.
+
+    Словарь из ``extra={'profile': ...}`` добавляется полями записи.
+    """
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(getattr(record, 'profile', {}))
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(data, ensure_ascii=False, default=str)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.replication import replicate
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Пауза между копированиями, секунды.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Скопировать один раз и завершиться.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            replicas = replicate()
+            if not replicas:
+                self.stderr.write('Реплики не настроены (DB_REPLICAS).')
+                return
+            if options['once']:
+                self.stdout.write(f'Скопировано в {", ".join(replicas)}')
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,242 @@
+"""Выборочное профилирование запросов.
+
+``ProfilingMiddleware`` для доли ``PROFILING_SAMPLE_RATE`` запросов
+записывает число и время SQL-запросов, повторяющиеся запросы
+(признак N+1), время отрисовки шаблонов и попадания в кеш. Замеры
+складываются в гистограммы по представлениям, которые отдает
+``core.views.profiling_stats``, и при ``PROFILING_LOG`` пишутся
+в лог ``core.profiling`` по записи на запрос.
+
+Время шаблонов измеряет бэкенд ``ProfilingTemplates``, попадания
+в кеш — ``core.cache.TieredCache``. Вне выбранных запросов они
+только проверяют, что замер не идет.
+
+Гистограммы хранятся в памяти процесса: у каждого процесса сервера
+они свои.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограмм; последняя корзина — все остальное.
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+# Сколько сигнатур повторяющихся запросов хранить на представление.
+TOP_DUPLICATES = 10
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+
+
+def signature(sql):
+    """Текст запроса без различий в длине списков ``IN (...)``."""
+    return _IN_LIST.sub('(...)', sql)
+
+
+class Recorder:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.queries = Counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.templates = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += (time.perf_counter() - start) * 1000
+            self.query_count += 1
+            self.queries[signature(sql)] += 1
+
+    def duplicates(self):
+        threshold = settings.PROFILING_DUPLICATE_THRESHOLD
+        return {
+            sql: count for sql, count in self.queries.items()
+            if count >= threshold
+        }
+
+
+def current():
+    """Замеры текущего запроса или ``None``, если он не выбран."""
+    return getattr(_local, 'recorder', None)
+
+
+def record_cache(hits, misses):
+    recorder = current()
+    if recorder is not None:
+        recorder.cache_hits += hits
+        recorder.cache_misses += misses
+
+
+def _histogram(bounds):
+    return {'count': 0, 'sum': 0, 'max': 0, 'buckets': [0] * (len(bounds) + 1)}
+
+
+def _observe(histogram, bounds, value):
+    histogram['count'] += 1
+    histogram['sum'] += value
+    histogram['max'] = max(histogram['max'], value)
+    index = next(
+        (index for index, bound in enumerate(bounds) if value <= bound),
+        len(bounds)
+    )
+    histogram['buckets'][index] += 1
+
+
+def add(view, record, duplicates):
+    """Добавляет замеры запроса к статистике представления."""
+    with _lock:
+        stats = _stats.setdefault(view, {
+            'requests': 0,
+            'duration': _histogram(TIME_BUCKETS),
+            'sql_time': _histogram(TIME_BUCKETS),
+            'template_time': _histogram(TIME_BUCKETS),
+            'queries': _histogram(QUERY_BUCKETS),
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'duplicates': Counter(),
+        })
+        stats['requests'] += 1
+        for metric in ('duration', 'sql_time', 'template_time'):
+            _observe(stats[metric], TIME_BUCKETS, record[metric])
+        _observe(stats['queries'], QUERY_BUCKETS, record['queries'])
+        stats['cache_hits'] += record['cache_hits']
+        stats['cache_misses'] += record['cache_misses']
+        stats['duplicates'].update(duplicates)
+        for sql, _ in stats['duplicates'].most_common()[TOP_DUPLICATES:]:
+            del stats['duplicates'][sql]
+
+
+def snapshot():
+    """Статистика всех представлений в виде, пригодном для JSON."""
+    with _lock:
+        return {
+            'time_buckets': TIME_BUCKETS,
+            'query_buckets': QUERY_BUCKETS,
+            'views': {
+                view: {
+                    **{
+                        key: (
+                            dict(value, buckets=list(value['buckets']))
+                            if isinstance(value, dict) else value
+                        )
+                        for key, value in stats.items()
+                        if key != 'duplicates'
+                    },
+                    'duplicates': [
+                        {'sql': sql, 'count': count}
+                        for sql, count in stats['duplicates'].most_common()
+                    ],
+                }
+                for view, stats in sorted(_stats.items())
+            },
+        }
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+class ProfilingMiddleware:
+    """Профилирует долю запросов, включается ``PROFILING_ENABLED``."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = _local.recorder = Recorder()
+        wrappers = [
+            connection.execute_wrapper(recorder)
+            for connection in connections.all()
+        ]
+        start = time.perf_counter()
+        try:
+            for wrapper in wrappers:
+                wrapper.__enter__()
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            _local.recorder = None
+        duration = (time.perf_counter() - start) * 1000
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        duplicates = recorder.duplicates()
+        record = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration': round(duration, 3),
+            'queries': recorder.query_count,
+            'sql_time': round(recorder.sql_time, 3),
+            'template_time': round(recorder.template_time, 3),
+            'templates': recorder.templates,
+            'cache_hits': recorder.cache_hits,
+            'cache_misses': recorder.cache_misses,
+            'duplicate_queries': sum(duplicates.values()),
+        }
+        add(view, record, duplicates)
+        if settings.PROFILING_LOG:
+            logger.info('request %s %s', view, record['status'], extra={
+                'profile': record
+            })
+        for sql, count in duplicates.items():
+            logger.debug('N+1 в %s (%s раз): %s', view, count, sql)
+
+        return response
+
+
+class Template(DjangoTemplate):
+    """Шаблон, замеряющий время отрисовки в выбранных запросах."""
+
+    def render(self, context=None, request=None):
+        recorder = current()
+        if recorder is None:
+            return super().render(context, request)
+        recorder.templates.append(self.origin.template_name)
+        # Шаблон, отрисованный внутри другого (например, тегом),
+        # уже входит во время внешнего.
+        if getattr(_local, 'rendering', False):
+            return super().render(context, request)
+        _local.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            recorder.template_time += (time.perf_counter() - start) * 1000
+            _local.rendering = False
+
+
+class ProfilingTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django с замером времени отрисовки."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,30 @@
+"""Замена репликации для локальной разработки на SQLite.
+
+Реплики — отдельные файлы SQLite, которые ``replicate`` целиком
+перезаписывает копией основной базы через online backup API SQLite.
+Копия согласована: запись в основную базу во время копирования
+не попадает в нее частично.
+"""
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+
+
+def copy(source, target):
+    """Копирует файл базы ``source`` в ``target``."""
+    with closing(sqlite3.connect(source)) as primary, \
+            closing(sqlite3.connect(target)) as replica:
+        primary.backup(replica)
+
+
+def replicate(source='default', replicas=None):
+    """Копирует основную базу в реплики, возвращает их алиасы."""
+    replicas = settings.DATABASE_REPLICAS if replicas is None else replicas
+    for alias in replicas:
+        copy(
+            settings.DATABASES[source]['NAME'],
+            settings.DATABASES[alias]['NAME']
+        )
+
+    return replicas
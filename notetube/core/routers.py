@@ -0,0 +1,95 @@
+"""Чтение с реплик базы.
+
+``ReplicaMiddleware`` разрешает чтение с реплик ``DATABASE_REPLICAS``
+только на время безопасных запросов (GET, HEAD, OPTIONS), и тогда
+``ReplicaRouter`` отправляет чтения на случайную реплику. Запись,
+запросы вне обработки HTTP (команды, воркеры) и чтение сессий всегда
+идут в основную базу ``default``.
+
+Запрос, который что-то записал, дальше читает основную базу, а сессия
+пользователя на ``REPLICA_PIN_SECONDS`` секунд закрепляется за ней:
+пользователь сразу видит свои изменения, даже если реплика отстает.
+Запись определяется по обращению к ``db_for_write``, поэтому
+закрепляют и изменяющие GET-запросы (подписка и отписка).
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PIN_KEY = '_db_pinned_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Приложения, которые всегда читаются из основной базы.
+PRIMARY_APPS = ('sessions',)
+
+_state = threading.local()
+
+
+def replica_reads_allowed():
+    return getattr(_state, 'replica', False)
+
+
+def request_wrote():
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    """Чтение — с реплики, если его разрешил запрос, запись — в основную."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas or not replica_reads_allowed()
+            or model._meta.app_label in PRIMARY_APPS
+        ):
+            return PRIMARY
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        """Основная база; после записи запрос читает только ее."""
+        _state.replica = False
+        _state.wrote = True
+
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик на время безопасного запроса
+    и закрепляет сессию за основной базой после записи.
+
+    Анонимный GET, который пересчитал данные (например, счетчики),
+    сессию не закрепляет, чтобы не заводить ее ради этого.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        safe = request.method in SAFE_METHODS
+        pinned = safe and request.session.get(PIN_KEY, 0) > time.time()
+        _state.replica = safe and not pinned
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            wrote = request_wrote()
+        finally:
+            _state.replica = _state.wrote = False
+        user = getattr(request, 'user', None)
+        if wrote and (not safe or user is not None and user.is_authenticated):
+            request.session[PIN_KEY] = (
+                time.time() + settings.REPLICA_PIN_SECONDS
+            )
+
+        return response
@@ -0,0 +1,56 @@
+"""Помощники тестов: бюджет SQL-запросов.
+
+``query_budget`` работает как контекстный менеджер и как декоратор::
+
+    with query_budget(5, label='posts:index'):
+        client.get('/')
+
+    @query_budget(5)
+    def test_index(self):
+        ...
+
+Если запросов больше бюджета, тест падает со списком выполненного SQL.
+"""
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Выполнено больше запросов, чем разрешено."""
+
+
+class query_budget(ContextDecorator):
+    """Не больше ``limit`` запросов к базе ``using`` внутри блока."""
+
+    def __init__(self, limit, using=DEFAULT_DB_ALIAS, label=''):
+        self.limit = limit
+        self.using = using
+        self.label = label
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.limit:
+            label = f'{self.label}: ' if self.label else ''
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(
+                    self.context.captured_queries, 1
+                )
+            )
+            raise QueryBudgetExceeded(
+                f'{label}{executed} запросов при бюджете {self.limit}:\n'
+                f'{queries}'
+            )
+
+        return False
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from ..cache import TieredCache
+
+
+class TieredCacheTests(SimpleTestCase):
+    """Тестирует двухуровневый кеш."""
+
+    def setUp(self):
+        self.cache = TieredCache('tests', {
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_TIMEOUT': 5,
+                'LOCAL_EXCLUDE': ('version:',),
+                'LOCK_TIMEOUT': 0.2,
+            }
+        })
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def test_local_layer_serves_recent_values(self):
+        """Недавние значения читаются из локального уровня."""
+        self.cache.set('key', 'value')
+        caches['shared'].delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_excluded_keys_read_from_shared(self):
+        """Исключенные ключи всегда читаются из общего кеша."""
+        self.cache.set('version:index', 1)
+        caches['shared'].set('version:index', 2)
+        self.assertEqual(self.cache.get('version:index'), 2)
+        self.assertEqual(self.cache.get_many(['version:index']), {
+            'version:index': 2
+        })
+
+    def test_get_or_set_computes_once(self):
+        """Значение вычисляется один раз и берется из кеша."""
+        compute = mock.Mock(return_value='value')
+        self.assertEqual(self.cache.get_or_set('key', compute), 'value')
+        self.assertEqual(self.cache.get_or_set('key', compute), 'value')
+        compute.assert_called_once_with()
+
+    def test_get_or_set_waits_for_lock_holder(self):
+        """Пока другой процесс держит блокировку, значение не считается."""
+        caches['shared'].add('key:lock', 1)
+        compute = mock.Mock(return_value='computed')
+
+        def holder_finishes(seconds):
+            caches['shared'].set('key', 'from holder')
+
+        with mock.patch('core.cache.time.sleep', holder_finishes):
+            value = self.cache.get_or_set('key', compute)
+        self.assertEqual(value, 'from holder')
+        compute.assert_not_called()
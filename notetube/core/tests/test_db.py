@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+
+class SqliteProfileTests(SimpleTestCase):
+    """Тестирует PRAGMA профиля SQLite для новых соединений."""
+
+    def pragmas(self, *names):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper(
+                {
+                    **connection.settings_dict,
+                    'NAME': os.path.join(directory, 'test.sqlite3'),
+                },
+                alias='pragmas'
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    values = []
+                    for name in names:
+                        cursor.execute(f'PRAGMA {name}')
+                        values.append(cursor.fetchone()[0])
+            finally:
+                wrapper.close()
+
+        return values
+
+    @override_settings(SQLITE_PROFILE='performance')
+    def test_performance_profile(self):
+        """Профиль performance включает WAL, ожидание блокировки
+        и отображение файла в память.
+        """
+        self.assertEqual(
+            self.pragmas('journal_mode', 'synchronous', 'busy_timeout'),
+            ['wal', 1, 5000]
+        )
+        self.assertGreater(self.pragmas('mmap_size')[0], 0)
+
+    @override_settings(SQLITE_PROFILE='default')
+    def test_default_profile(self):
+        """Профиль default оставляет настройки SQLite."""
+        self.assertEqual(self.pragmas('journal_mode'), ['delete'])
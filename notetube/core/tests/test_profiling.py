@@ -0,0 +1,91 @@
+import json
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from ..log import JsonFormatter
+from .. import profiling
+
+User = get_user_model()
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1)
+class ProfilingTests(TestCase):
+    """Тестирует выборочное профилирование запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.post = Post.objects.create(text='Пост', author=cls.admin)
+
+    def setUp(self):
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+
+    def test_request_is_profiled(self):
+        """Запрос добавляет в статистику SQL, шаблоны и кеш."""
+        self.client.get(reverse('posts:index'))
+        stats = profiling.snapshot()['views']['posts:index']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries']['sum'], 0)
+        self.assertEqual(stats['template_time']['count'], 1)
+        self.assertEqual(sum(stats['duration']['buckets']), 1)
+        self.assertGreater(stats['cache_hits'] + stats['cache_misses'], 0)
+
+    def test_duplicate_queries(self):
+        """Повторы одного запроса отмечаются как N+1,
+        списки IN разной длины считаются одним запросом.
+        """
+        recorder = profiling.Recorder()
+        with connection.execute_wrapper(recorder):
+            for pk in range(3):
+                Post.objects.filter(pk=pk).exists()
+            Post.objects.filter(pk__in=[1, 2]).exists()
+            Post.objects.filter(pk__in=[1, 2, 3]).exists()
+        self.assertEqual(recorder.query_count, 5)
+        self.assertEqual(list(recorder.duplicates().values()), [3])
+        self.assertEqual(len(recorder.queries), 2)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_sampling(self):
+        """Невыбранные запросы не профилируются."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(profiling.snapshot()['views'], {})
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """Выключенный профилировщик не подключается."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(profiling.snapshot()['views'], {})
+
+    def test_stats_endpoint(self):
+        """Статистику видит только персонал, POST ее сбрасывает."""
+        url = reverse('profiling_stats')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(ProfilingTests.admin)
+        self.client.get(
+            reverse('posts:post_detail', args=[ProfilingTests.post.pk])
+        )
+        views = self.client.get(url).json()['views']
+        self.assertEqual(views['posts:post_detail']['requests'], 1)
+        self.client.post(url)
+        self.assertEqual(list(profiling.snapshot()['views']), [
+            'profiling_stats'
+        ])
+
+    @override_settings(PROFILING_LOG=True)
+    def test_structured_log(self):
+        """Каждый замер пишется в лог одной строкой JSON."""
+        with self.assertLogs('core.profiling', logging.INFO) as logs:
+            self.client.get(reverse('posts:index'))
+        data = json.loads(JsonFormatter().format(logs.records[0]))
+        self.assertEqual(data['view'], 'posts:index')
+        self.assertEqual(data['status'], 200)
+        self.assertIn('posts/index.html', data['templates'])
@@ -0,0 +1,192 @@
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import reverse
+
+from core import routers
+from core.replication import copy
+from posts.models import Follow, Post, User, UserStats
+
+REPLICA = 'test_replica'
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Тестирует выбор базы для чтения и записи."""
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.addCleanup(setattr, routers._state, 'replica', False)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_read_from_replica_when_allowed(self):
+        """Чтение идет на реплику только внутри безопасного запроса."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        routers._state.replica = True
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_writes_and_sessions_use_primary(self):
+        """Запись и чтение сессий всегда идут в основную базу."""
+        routers._state.replica = True
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Без реплик все читается из основной базы."""
+        routers._state.replica = True
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    """Тестирует закрепление сессии за основной базой после записи."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+
+        def view(request):
+            if request.write:
+                routers.ReplicaRouter().db_for_write(Post)
+            self.seen.append(routers.replica_reads_allowed())
+            return HttpResponse()
+
+        self.middleware = routers.ReplicaMiddleware(view)
+
+    def request(self, method, session, write=False, user=None):
+        request = getattr(self.factory, method)('/')
+        request.session = session
+        request.user = user or AnonymousUser()
+        request.write = write
+        self.middleware(request)
+
+    def test_safe_request_reads_replica(self):
+        """GET читает с реплики, после запроса разрешение снимается."""
+        self.request('get', session={})
+        self.assertEqual(self.seen, [True])
+        self.assertFalse(routers.replica_reads_allowed())
+
+    def test_write_pins_session(self):
+        """После записи запрос читает основную базу, а следующие GET
+        той же сессии — пока не истечет REPLICA_PIN_SECONDS.
+        """
+        session = {}
+        self.request('post', session=session, write=True)
+        self.request('get', session=session)
+        session[routers.PIN_KEY] = time.time() - 1
+        self.request('get', session=session)
+        self.assertEqual(self.seen, [False, False, True])
+
+    def test_writing_get_pins_session(self):
+        """Изменяющий GET вошедшего пользователя закрепляет сессию,
+        GET и POST без записи — нет.
+        """
+        user = User(username='reader')
+        session = {}
+        self.request('post', session=session)
+        self.request('get', session=session, user=user)
+        self.assertEqual(session, {})
+        self.request('get', session=session, write=True, user=user)
+        self.assertIn(routers.PIN_KEY, session)
+
+    def test_anonymous_get_write_does_not_pin(self):
+        """Анонимный GET с пересчетом данных не заводит сессию."""
+        session = {}
+        self.request('get', session=session, write=True)
+        self.assertEqual(session, {})
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_disabled_without_replicas(self):
+        """Без реплик middleware не трогает сессию."""
+        session = {}
+        self.request('post', session=session, write=True)
+        self.assertEqual(session, {})
+
+
+class ReplicaReadTests(TestCase):
+    """Тестирует страницы с отдельной отстающей репликой."""
+
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика — отдельная база SQLite в памяти, которую тесты
+        # заполняют сами, а не зеркало основной.
+        cls.replicas = override_settings(DATABASE_REPLICAS=[REPLICA])
+        cls.replicas.enable()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'
+        }
+        connections[REPLICA].creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        cls.replicas.disable()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        for user in (self.author, self.reader):
+            user.save(using=REPLICA)
+
+    def test_profile_without_replicated_stats(self):
+        """Профиль пользователя, счетчиков которого еще нет на реплике,
+        открывается: пересчитанные счетчики читаются из основной базы.
+        """
+        UserStats.objects.all().delete()
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserStats.objects.using(REPLICA).exists())
+
+    def test_profile_after_follow(self):
+        """После подписки GET-ссылкой профиль читает основную базу
+        и показывает подписку.
+        """
+        self.client.force_login(self.reader)
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['stats'].followers_count, 1)
+        self.assertFalse(Follow.objects.using(REPLICA).exists())
+
+
+class ReplicateTests(SimpleTestCase):
+    """Тестирует копирование основной базы в реплики."""
+
+    def test_replicate_copies_primary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary = os.path.join(directory, 'primary.sqlite3')
+            replica = os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(primary)) as connection:
+                connection.execute('CREATE TABLE item (value TEXT)')
+                connection.execute("INSERT INTO item VALUES ('новое')")
+                connection.commit()
+            copy(primary, replica)
+            with closing(sqlite3.connect(replica)) as connection:
+                rows = connection.execute('SELECT value FROM item')
+                self.assertEqual(list(rows), [('новое',)])
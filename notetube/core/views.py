@@ -1,4 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_http_methods
+
+from . import profiling
 
 
 def page_not_found(request, exception):
@@ -11,3 +16,13 @@ def csrf_failure(request, reason=''):
     """403: ошибка проверки CSRF, запрос отклонён."""
 
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def profiling_stats(request):
+    """Гистограммы профилирования по представлениям; POST — сброс."""
+    if request.method == 'POST':
+        profiling.reset()
+
+    return JsonResponse(profiling.snapshot())
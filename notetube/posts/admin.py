@@ -1,10 +1,336 @@
-from django.contrib import admin
+import datetime
 
-from .models import Post, Group, Comment, Follow
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.exceptions import PermissionDenied
+from django.db.models import Max, Min
+from django.http import QueryDict, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import NoReverseMatch, path, reverse
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .constants import ADMIN_LIST_PER_PAGE, DATE_PROBE_LIMIT
+from .forms import ExportForm
+from .models import (
+    Comment,
+    Follow,
+    Group,
+    ModerationJob,
+    Post,
+    PostQuerySet,
+)
+from .search import index_backend, query_terms
+from . import export, moderation, sharding
+from .utils import EstimatedCountPaginator
+
+
+class SelectedRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле ввода ключа, подпись которого берется из уже загруженного
+    объекта ``selected`` вместо отдельного запроса на каждую строку.
+    """
+
+    selected = None
+
+    def label_and_url_for_value(self, value):
+        selected = self.selected
+        if selected is None or str(selected.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        try:
+            url = reverse(
+                f'{self.admin_site.name}:{selected._meta.app_label}_'
+                f'{selected._meta.model_name}_change',
+                args=(selected.pk,)
+            )
+        except NoReverseMatch:
+            url = ''
+
+        return Truncator(selected).words(14), url
+
+
+class SelectedRawIdForm(forms.ModelForm):
+    """Форма, передающая виджетам связанные объекты экземпляра,
+    если они уже загружены (например, через ``list_select_related``).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            if not isinstance(field.widget, SelectedRawIdWidget):
+                continue
+            model_field = self.instance._meta.get_field(name)
+            if model_field.is_cached(self.instance):
+                field.widget.selected = getattr(self.instance, name)
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Админка для больших таблиц.
+
+    Связанные объекты выбираются вводом ключа, количество строк
+    оценивается, а не считается на каждой странице.
+    """
+
+    form = SelectedRawIdForm
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = ADMIN_LIST_PER_PAGE
+    empty_value_display = '-пусто-'
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.raw_id_fields:
+            kwargs['widget'] = SelectedRawIdWidget(
+                db_field.remote_field,
+                self.admin_site,
+                using=kwargs.get('using')
+            )
+
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', self.form)
+
+        return super().get_changelist_form(request, **kwargs)
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Шард, объекты которого показывает список; по умолчанию первый.
+
+    Без ``POST_SHARDS`` фильтр не показывается.
+    """
+
+    title = 'шард'
+    parameter_name = 'database'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in settings.POST_SHARDS]
+
+    def queryset(self, request, queryset):
+        # Шард выбирает ShardAdminMixin.get_queryset.
+        return queryset
+
+    def choices(self, changelist):
+        selected = self.value() or settings.POST_SHARDS[0]
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == selected,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: alias}
+                ),
+                'display': title,
+            }
+
+
+class ShardAdminMixin:
+    """Админка постов или комментариев с шардами.
+
+    Список, формы и действия работают с одним шардом, выбранным
+    фильтром ``ShardFilter``; выбор сохраняется в ссылках списка.
+    Авторы и группы подгружаются из основной базы отдельными запросами.
+    """
+
+    def get_database(self, request):
+        """Выбранный шард или None без шардирования."""
+        if not sharding.enabled():
+            return None
+        alias = request.GET.get(
+            ShardFilter.parameter_name,
+            QueryDict(request.GET.get('_changelist_filters', '')).get(
+                ShardFilter.parameter_name
+            )
+        )
+
+        return alias if sharding.is_shard(alias) else (
+            settings.POST_SHARDS[0]
+        )
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not sharding.enabled():
+            return queryset
+
+        return sharding.with_related(
+            queryset.using(self.get_database(request)),
+            *self.list_select_related
+        )
+
+    def get_list_select_related(self, request):
+        # Пустой кортеж, а не False: иначе список сделает JOIN сам.
+        if sharding.enabled():
+            return ()
+
+        return super().get_list_select_related(request)
+
+    def get_list_filter(self, request):
+        return (ShardFilter, *super().get_list_filter(request))
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if sharding.enabled():
+            actions.pop('export_jsonl', None)
+            actions.pop('export_csv', None)
+
+        return actions
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.related_model in sharding.SHARDED_MODELS:
+            kwargs.setdefault('using', self.get_database(request))
+
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class DateHierarchyQuerySet(PostQuerySet):
+    """Посты списка в админке: иерархия дат без DISTINCT по таблице."""
+
+    def dates(self, field_name, kind, order='ASC'):
+        """Года, месяцы или дни с постами без DISTINCT по всей таблице.
+
+        Для ``pub_date`` каждый период между первой и последней датой
+        проверяется отдельным ``exists()`` по индексу даты. Если периодов
+        больше ``DATE_PROBE_LIMIT``, работает обычный ``dates()``.
+        Возвращается список дат: иерархия дат его только перебирает.
+        """
+        if field_name != 'pub_date' or kind not in ('year', 'month', 'day'):
+            return super().dates(field_name, kind, order)
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+        periods = list(_periods(
+            _local_date(bounds['first']), _local_date(bounds['last']), kind
+        ))
+        if len(periods) > DATE_PROBE_LIMIT:
+            return super().dates(field_name, kind, order)
+        found = [
+            start for start, end in periods
+            if self.filter(**{
+                f'{field_name}__gte': _start_of_day(start),
+                f'{field_name}__lt': _start_of_day(end),
+            }).exists()
+        ]
+
+        return found if order == 'ASC' else found[::-1]
+
+
+def _local_date(value):
+    if settings.USE_TZ:
+        value = timezone.localtime(value)
+
+    return value.date()
+
+
+def _start_of_day(date):
+    value = datetime.datetime.combine(date, datetime.time.min)
+    if settings.USE_TZ:
+        value = timezone.make_aware(value)
+
+    return value
+
+
+def _periods(first, last, kind):
+    """Пары (начало, начало следующего) периодов от first до last."""
+    if kind == 'year':
+        start = first.replace(month=1, day=1)
+    elif kind == 'month':
+        start = first.replace(day=1)
+    else:
+        start = first
+    while start <= last:
+        if kind == 'year':
+            end = start.replace(year=start.year + 1)
+        elif kind == 'month':
+            end = (start + datetime.timedelta(days=32)).replace(day=1)
+        else:
+            end = start + datetime.timedelta(days=1)
+        yield start, end
+        start = end
+
+
+class PostChangeList(ChangeList):
+    """Список постов, иерархия дат которого проверяет периоды
+    по индексу (``DateHierarchyQuerySet``).
+    """
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        dates = DateHierarchyQuerySet(
+            model=queryset.model,
+            query=queryset.query,
+            using=queryset._db,
+            hints=queryset._hints
+        )
+        dates._prefetch_related_lookups = queryset._prefetch_related_lookups
+
+        return dates
+
+
+def export_response(name, queryset, fmt):
+    """Потоковый ответ с выгрузкой ``name`` в формате ``fmt``."""
+    response = StreamingHttpResponse(
+        export.stream(name, queryset, fmt),
+        content_type=f'{export.FORMATS[fmt]}; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{export.filename(name, fmt)}"'
+    )
+
+    return response
+
+
+class ExportActionsMixin:
+    """Действия выгрузки выбранных объектов в JSONL и CSV."""
+
+    export_name = None
+
+    def export_jsonl(self, request, queryset):
+        return export_response(self.export_name, queryset, 'jsonl')
+
+    export_jsonl.short_description = 'Выгрузить выбранные в JSONL'
+    export_jsonl.allowed_permissions = ('view',)
+
+    def export_csv(self, request, queryset):
+        return export_response(self.export_name, queryset, 'csv')
+
+    export_csv.short_description = 'Выгрузить выбранные в CSV'
+    export_csv.allowed_permissions = ('view',)
+
+
+class ModerationActionForm(ActionForm):
+    """Форма действий с полем группы для переноса постов."""
+
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        required=False,
+        widget=forms.TextInput(attrs={'size': 8}),
+        label='Ключ группы'
+    )
+
+
+class ModerationAdmin(ScalableAdmin):
+    """Админка, массовые действия которой выполняются в фоне.
+
+    Вместо удаления в запросе действия ставят ``ModerationJob``
+    в очередь ``python manage.py moderation_worker``.
+    """
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+
+        return actions
+
+    def enqueue(self, request, action, queryset, group=None):
+        job = moderation.enqueue(action, queryset, request.user, group)
+        self.message_user(
+            request,
+            f'{job} поставлена в очередь, объектов: {job.total}.'
+        )
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ShardAdminMixin, ExportActionsMixin, ModerationAdmin):
     """Модель админа"""
 
     list_display = (
@@ -16,13 +342,174 @@ class PostAdmin(admin.ModelAdmin):
         'image',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    date_hierarchy = 'pub_date'
+    action_form = ModerationActionForm
+    actions = (
+        'delete_posts',
+        'move_posts',
+        'purge_images',
+        'export_jsonl',
+        'export_csv',
+    )
+    export_name = 'posts'
+
+    def get_changelist(self, request, **kwargs):
+        return PostChangeList
+
+    def get_object(self, request, object_id, from_field=None):
+        """С шардами пост читается из шарда его ключа."""
+        if not sharding.enabled() or from_field is not None:
+            return super().get_object(request, object_id, from_field)
+        try:
+            return self.get_queryset(request).using(
+                sharding.db_for_post(object_id)
+            ).get(pk=object_id)
+        except (Post.DoesNotExist, ValueError):
+            return None
+
+    def get_urls(self):
+        return [
+            path(
+                'export/',
+                self.admin_site.admin_view(self.export_view),
+                name='posts_export'
+            ),
+            *super().get_urls(),
+        ]
+
+    def export_view(self, request):
+        """Страница выгрузки данных с фильтрами; отправленная форма
+        отдает файл потоком.
+        """
+        form = ExportForm(request.GET if 'name' in request.GET else None)
+        if form.is_valid():
+            queryset = form.cleaned_data['queryset']
+            if not request.user.has_perm(
+                f'posts.view_{queryset.model._meta.model_name}'
+            ):
+                raise PermissionDenied
+            return export_response(
+                form.cleaned_data['name'], queryset,
+                form.cleaned_data['format']
+            )
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Выгрузка данных',
+            'opts': self.model._meta,
+            'form': form,
+        }
+
+        return TemplateResponse(request, 'admin/posts/export.html', context)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по поисковому индексу вместо LIKE по тексту."""
+        terms = query_terms(search_term)
+        if not terms:
+            return queryset, False
+
+        return index_backend().filter(queryset, terms), False
+
+    def delete_posts(self, request, queryset):
+        self.enqueue(request, ModerationJob.DELETE_POSTS, queryset)
+
+    delete_posts.short_description = 'Удалить выбранные посты (в фоне)'
+    delete_posts.allowed_permissions = ('delete',)
+
+    def move_posts(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        group = form.cleaned_data['group'] if form.is_valid() else None
+        if group is None:
+            self.message_user(
+                request, 'Укажите группу для переноса.', messages.ERROR
+            )
+            return
+        self.enqueue(request, ModerationJob.MOVE_POSTS, queryset, group)
+
+    move_posts.short_description = (
+        'Перенести выбранные посты в группу (в фоне)'
+    )
+    move_posts.allowed_permissions = ('change',)
+
+    def purge_images(self, request, queryset):
+        self.enqueue(request, ModerationJob.PURGE_IMAGES, queryset)
+
+    purge_images.short_description = (
+        'Удалить картинки выбранных постов (в фоне)'
+    )
+    purge_images.allowed_permissions = ('change',)
+
+
+@admin.register(Group)
+class GroupAdmin(ExportActionsMixin, admin.ModelAdmin):
+    """Админка групп."""
+
+    list_display = ('pk', 'title', 'slug')
+    actions = ('export_jsonl', 'export_csv')
+    export_name = 'groups'
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+@admin.register(Comment)
+class CommentAdmin(ShardAdminMixin, ExportActionsMixin, ModerationAdmin):
+    """Админка комментариев."""
+
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('author', 'post')
+    actions = ('delete_comments', 'export_jsonl', 'export_csv')
+    export_name = 'comments'
+
+    def delete_comments(self, request, queryset):
+        self.enqueue(request, ModerationJob.DELETE_COMMENTS, queryset)
+
+    delete_comments.short_description = (
+        'Удалить выбранные комментарии (в фоне)'
+    )
+    delete_comments.allowed_permissions = ('delete',)
+
+
+@admin.register(Follow)
+class FollowAdmin(ExportActionsMixin, ScalableAdmin):
+    """Админка подписок."""
+
+    list_display = ('pk', 'user', 'author')
+    actions = ('export_jsonl', 'export_csv')
+    export_name = 'follows'
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+
+
+@admin.register(ModerationJob)
+class ModerationJobAdmin(admin.ModelAdmin):
+    """Админка очереди модерации: только просмотр прогресса."""
+
+    list_display = (
+        'pk',
+        'action',
+        'status',
+        'progress_display',
+        'group',
+        'database',
+        'created_by',
+        'created',
+        'updated',
+    )
+    list_select_related = ('group', 'created_by')
+    list_filter = ('status', 'action')
 
+    def progress_display(self, job):
+        return f'{job.processed}/{job.total} ({job.progress}%)'
 
-admin.site.register(Group)
+    progress_display.short_description = 'Прогресс'
 
-admin.site.register(Comment)
+    def has_add_permission(self, request):
+        return False
 
-admin.site.register(Follow)
+    def has_change_permission(self, request, obj=None):
+        return False
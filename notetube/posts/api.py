@@ -0,0 +1,162 @@
+"""JSON API лент и постов.
+
+Ответы собираются из моделей без шаблонов и сериализуются компактно.
+Ленты и комментарии листаются курсором (параметр ``cursor``), ссылки
+на соседние страницы — в полях ``next`` и ``previous``.
+
+ETag и Last-Modified считаются по версиям областей кеша
+(``versions.conditional``) до обращения к базе, поэтому на запрос
+с неизменившимся ETag ответ 304 отдается без запросов к ней.
+Лента подписок читает из базы только список авторов.
+"""
+from django.http import JsonResponse
+from django.views.decorators.vary import vary_on_cookie
+
+from .constants import API_PAGE_SIZE, CURSOR_PARAM
+from .feed import FEED_ORDERING, follow_feed
+from .models import Follow, Group, User
+from .utils import CursorPaginator, comment_order, comment_page
+from . import sharding, versions
+
+
+def _response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
+
+
+def _not_found():
+    return _response({'detail': 'Не найдено.'}, status=404)
+
+
+def _unauthorized():
+    return _response({'detail': 'Нужна авторизация.'}, status=401)
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'comment_count': getattr(post, 'comment_count', None),
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def _page(request, post_list, ordering=('pub_date', 'pk')):
+    paginator = CursorPaginator(post_list, API_PAGE_SIZE, ordering=ordering)
+    page = paginator.cursor_page(request.GET.get(CURSOR_PARAM))
+
+    return _response({
+        'results': [serialize_post(post) for post in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@versions.conditional(lambda request: [versions.INDEX])
+def index(request):
+    """Лента всех постов."""
+    return _page(request, sharding.posts().for_listing())
+
+
+@versions.conditional(lambda request, slug: [versions.group_scope(slug)])
+def group_posts(request, slug):
+    """Лента группы."""
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return _not_found()
+
+    return _page(request, sharding.posts(group=group).for_listing())
+
+
+@versions.conditional(
+    lambda request, username: [versions.author_scope(username)]
+)
+def profile(request, username):
+    """Лента автора."""
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return _not_found()
+
+    return _page(request, author.posts.for_listing())
+
+
+def _follow_scopes(request):
+    """Профили пользователя и его авторов: подписки, отписки и новые
+    посты авторов меняют их версии.
+    """
+    if not request.user.is_authenticated:
+        return None
+    usernames = Follow.objects.filter(
+        user=request.user
+    ).values_list('author__username', flat=True)
+
+    return [
+        versions.author_scope(username)
+        for username in [request.user.username, *usernames]
+    ]
+
+
+@vary_on_cookie
+@versions.conditional(_follow_scopes)
+def follow_index(request):
+    """Лента подписок текущего пользователя."""
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    post_list = follow_feed(request.user).for_listing()
+
+    return _page(request, post_list, ordering=FEED_ORDERING)
+
+
+def _comments(request, post):
+    page = comment_page(post, request.GET.get(CURSOR_PARAM),
+                        comment_order(request))
+
+    return {
+        'results': [serialize_comment(comment) for comment in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+@versions.conditional(
+    lambda request, post_id: [versions.post_scope(post_id)]
+)
+def post_detail(request, post_id):
+    """Пост с первой страницей комментариев."""
+    post = sharding.for_post(post_id).for_listing().filter(
+        pk=post_id
+    ).first()
+    if post is None:
+        return _not_found()
+
+    return _response({
+        **serialize_post(post),
+        'comments': _comments(request, post),
+    })
+
+
+@versions.conditional(
+    lambda request, post_id: [versions.post_scope(post_id)]
+)
+def comments(request, post_id):
+    """Страница комментариев поста."""
+    post = sharding.for_post(post_id).filter(pk=post_id).first()
+    if post is None:
+        return _not_found()
+
+    return _response(_comments(request, post))
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'Посты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .sharding import configure_connection
+
+        connection_created.connect(
+            configure_connection,
+            dispatch_uid='posts.sharding.configure_connection'
+        )
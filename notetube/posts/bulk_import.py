@@ -0,0 +1,315 @@
+"""Массовая загрузка пользователей, групп, постов, комментариев и подписок.
+
+Строки (словари в формате выгрузки ``posts.export``) собираются
+в пачки и вставляются ``bulk_create`` по пачке на транзакцию.
+Авторы и группы ищутся по словарям «имя → ключ», загруженным один раз;
+недостающие создаются той же пачкой. ``bulk_create`` не вызывает
+сигналов, поэтому после загрузки ленты, счетчики и поисковый индекс
+перестраиваются целиком (``finish``).
+
+Синтетические данные для нагрузочных тестов дает ``fake_rows``.
+"""
+import csv
+import json
+import random
+import time
+from contextlib import contextmanager
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .constants import IMPORT_BATCH_SIZE, IMPORT_REPORT_EVERY
+from .models import Comment, Follow, Group, Post, User
+from . import feed, search, stats, thumbnails
+
+# Порядок загрузки: каждая таблица ссылается только на предыдущие.
+ORDER = ('users', 'groups', 'posts', 'comments', 'follows')
+MODELS = {
+    'users': User,
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+FOLLOW_GRAPHS = ('uniform', 'powerlaw', 'celebrity')
+
+
+def read_rows(file, fmt):
+    """Словари строк файла JSONL или CSV."""
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _datetime(value):
+    if not value:
+        return timezone.now()
+    value = parse_datetime(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+
+    return value
+
+
+@contextmanager
+def deferred_indexes(models):
+    """Удаляет индексы ``Meta.indexes`` на время загрузки.
+
+    Уникальные ограничения и индексы внешних ключей остаются.
+    """
+    dropped = [
+        (model, index) for model in models for index in model._meta.indexes
+    ]
+    with connection.schema_editor() as editor:
+        for model, index in dropped:
+            editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.add_index(model, index)
+
+
+class Importer:
+    """Загружает строки пачками по ``batch_size`` в транзакциях."""
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE,
+                 report_every=IMPORT_REPORT_EVERY, report=None):
+        self.batch_size = batch_size
+        self.report_every = report_every
+        self.report = report
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.skipped = 0
+        self.images = 0
+
+    def _resolve_users(self, usernames):
+        missing = set(usernames) - set(self.users) - {None, ''}
+        if missing:
+            User.objects.bulk_create(
+                (
+                    User(username=username, password=make_password(None))
+                    for username in missing
+                ),
+                batch_size=self.batch_size
+            )
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+
+    def _resolve_groups(self, slugs):
+        missing = set(slugs) - set(self.groups) - {None, ''}
+        if missing:
+            Group.objects.bulk_create(
+                (
+                    Group(title=slug, slug=slug, description='')
+                    for slug in missing
+                ),
+                batch_size=self.batch_size
+            )
+            self.groups.update(Group.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'pk'))
+
+    def _pk(self, row):
+        return {'pk': int(row['id'])} if row.get('id') else {}
+
+    def build_users(self, rows):
+        self._resolve_users(row['username'] for row in rows)
+
+        return []
+
+    def build_groups(self, rows):
+        groups = {
+            row['slug']: Group(
+                title=row['title'],
+                slug=row['slug'],
+                description=row.get('description') or ''
+            )
+            for row in rows if row['slug'] not in self.groups
+        }
+        Group.objects.bulk_create(groups.values())
+        self.groups.update(Group.objects.filter(
+            slug__in=groups
+        ).values_list('slug', 'pk'))
+
+        return []
+
+    def build_posts(self, rows):
+        self._resolve_users(row['author__username'] for row in rows)
+        self._resolve_groups(row.get('group__slug') for row in rows)
+        posts = []
+        for row in rows:
+            posts.append(Post(
+                text=row['text'],
+                pub_date=_datetime(row.get('pub_date')),
+                author_id=self.users[row['author__username']],
+                group_id=self.groups.get(row.get('group__slug') or None),
+                image=row.get('image') or '',
+                **self._pk(row)
+            ))
+            self.images += bool(row.get('image'))
+
+        return posts
+
+    def build_comments(self, rows):
+        self._resolve_users(row['author__username'] for row in rows)
+        post_ids = set(Post.objects.filter(
+            pk__in={int(row['post_id']) for row in rows}
+        ).values_list('pk', flat=True))
+        comments = [
+            Comment(
+                text=row['text'],
+                created=_datetime(row.get('created')),
+                post_id=int(row['post_id']),
+                author_id=self.users[row['author__username']],
+                **self._pk(row)
+            )
+            for row in rows if int(row['post_id']) in post_ids
+        ]
+        self.skipped += len(rows) - len(comments)
+
+        return comments
+
+    def build_follows(self, rows):
+        self._resolve_users(
+            username for row in rows
+            for username in (row['user__username'], row['author__username'])
+        )
+
+        return [
+            Follow(
+                user_id=self.users[row['user__username']],
+                author_id=self.users[row['author__username']]
+            )
+            for row in rows
+            if row['user__username'] != row['author__username']
+        ]
+
+    def load(self, name, rows):
+        """Загружает строки ``name``, возвращает их количество."""
+        model = MODELS[name]
+        build = getattr(self, f'build_{name}')
+        rows = iter(rows)
+        total = 0
+        reported = 0
+        start = time.perf_counter()
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    build(batch),
+                    batch_size=self.batch_size,
+                    ignore_conflicts=name == 'follows'
+                )
+            total += len(batch)
+            if self.report and total - reported >= self.report_every:
+                reported = total
+                self.report(name, total, time.perf_counter() - start)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                cursor.execute(sql)
+        if self.report:
+            self.report(name, total, time.perf_counter() - start)
+
+        return total
+
+
+def finish(names, images=0):
+    """Перестраивает то, что при загрузке обновляли бы сигналы."""
+    if {'posts', 'follows'} & set(names):
+        feed.rebuild()
+    stats.rebuild()
+    if 'posts' in names:
+        search.rebuild()
+        if images:
+            thumbnails.enqueue_missing()
+    cache.clear()
+
+
+def _weights(count, graph):
+    """Накопленные веса выбора автора для формы графа подписок."""
+    if graph == 'powerlaw':
+        return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+    return None
+
+
+def fake_rows(users=100, groups=10, posts=1000, comments=2000,
+              follows_per_user=10, graph='uniform', celebrities=0, seed=None):
+    """Синтетические строки для каждой таблицы в порядке ``ORDER``.
+
+    ``graph`` задает форму графа подписок: ``uniform`` — авторы
+    выбираются равновероятно, ``powerlaw`` — вероятность автора
+    обратно пропорциональна его номеру, ``celebrity`` — на первых
+    ``celebrities`` авторов подписаны все, остальные подписки
+    равновероятны.
+    """
+    from faker import Faker
+
+    faker = Faker('ru_RU')
+    faker.seed_instance(seed)
+    rng = random.Random(seed)
+    usernames = [f'{faker.user_name()}_{index}' for index in range(users)]
+    slugs = [f'{faker.slug()}-{index}' for index in range(groups)]
+    first_post = (Post.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0) + 1
+
+    def post_rows():
+        for index in range(posts):
+            yield {
+                'id': first_post + index,
+                'text': faker.text(max_nb_chars=300),
+                'pub_date': faker.date_time_between(
+                    '-1y', tzinfo=timezone.utc
+                ).isoformat(),
+                'author__username': rng.choice(usernames),
+                'group__slug': rng.choice(slugs) if slugs else None,
+            }
+
+    def comment_rows():
+        for _ in range(comments if posts else 0):
+            yield {
+                'post_id': first_post + rng.randrange(posts),
+                'author__username': rng.choice(usernames),
+                'text': faker.sentence(),
+                'created': timezone.now().isoformat(),
+            }
+
+    def follow_rows():
+        weights = _weights(users, graph)
+        stars = usernames[:celebrities] if graph == 'celebrity' else []
+        for username in usernames:
+            authors = set(stars)
+            want = min(follows_per_user + len(stars), users - 1)
+            while len(authors - {username}) < want:
+                authors.update(rng.choices(
+                    usernames,
+                    cum_weights=weights,
+                    k=want - len(authors - {username})
+                ))
+            for author in authors - {username}:
+                yield {'user__username': username, 'author__username': author}
+
+    return {
+        'users': ({'username': username} for username in usernames),
+        'groups': (
+            {'title': slug.replace('-', ' '), 'slug': slug}
+            for slug in slugs
+        ),
+        'posts': post_rows(),
+        'comments': comment_rows(),
+        'follows': follow_rows(),
+    }
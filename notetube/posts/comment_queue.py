@@ -0,0 +1,271 @@
+"""Отложенная запись комментариев.
+
+При ``COMMENT_QUEUE_ENABLED`` проверенный комментарий не пишется
+в основную базу в запросе, а добавляется в журнал — отдельный файл
+SQLite ``COMMENT_QUEUE_PATH`` в режиме WAL. Запись в журнал не берет
+блокировку основной базы, поэтому всплески комментариев к популярному
+посту не упираются в «database is locked».
+
+Воркер ``python manage.py comment_queue_worker`` переносит журнал
+в базу (с ``POST_SHARDS`` — в шарды постов) пачками
+по ``COMMENT_QUEUE_BATCH_SIZE``: одна пачка — один ``bulk_create``
+на шард в общей транзакции, затем счетчики авторов и версии
+кеша обновляются разом. Строки удаляются из журнала после фиксации
+пачки; если процесс упадет между этими шагами, пачка запишется
+повторно (доставка «хотя бы один раз»). Комментарии к удаленным
+постам и от удаленных пользователей пропускаются. Если пачка все же
+не записалась из-за ошибки данных, строки записываются по одной,
+а не записавшиеся переносятся в таблицу ``dead_comment`` журнала,
+чтобы не останавливать очередь.
+
+Автор видит свои еще не записанные комментарии сразу (``pending``).
+"""
+import json
+import logging
+import sqlite3
+import time
+from collections import Counter
+from contextlib import closing
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .constants import COMMENT_QUEUE_BATCH_SIZE
+from .models import Comment, Post, User
+from . import sharding, stats, versions
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, которые вызывает сама строка журнала, а не состояние базы:
+# пачка с такой строкой записывается по одной строке.
+ROW_ERRORS = (DataError, IntegrityError, ValueError)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS comment ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'post_id INTEGER NOT NULL, '
+    'author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, '
+    'created TEXT NOT NULL, '
+    'enqueued REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS comment_post_author '
+    'ON comment (post_id, author_id)',
+    'CREATE TABLE IF NOT EXISTS dead_comment ('
+    'id INTEGER PRIMARY KEY, '
+    'post_id INTEGER NOT NULL, '
+    'author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, '
+    'created TEXT NOT NULL, '
+    'enqueued REAL NOT NULL, '
+    'error TEXT NOT NULL, '
+    'failed REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS metric ('
+    'name TEXT PRIMARY KEY, value TEXT NOT NULL)',
+)
+
+
+def enabled():
+    return settings.COMMENT_QUEUE_ENABLED
+
+
+def connect():
+    """Соединение с журналом; таблицы создаются при первом обращении."""
+    connection = sqlite3.connect(
+        settings.COMMENT_QUEUE_PATH, timeout=30, isolation_level=None
+    )
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    for statement in SCHEMA:
+        connection.execute(statement)
+
+    return connection
+
+
+def enqueue(post_id, author_id, text):
+    """Добавляет комментарий в журнал, возвращает номер записи."""
+    with closing(connect()) as connection:
+        cursor = connection.execute(
+            'INSERT INTO comment (post_id, author_id, text, created, '
+            'enqueued) VALUES (?, ?, ?, ?, ?)',
+            (
+                post_id, author_id, text, timezone.now().isoformat(),
+                time.time()
+            )
+        )
+
+        return cursor.lastrowid
+
+
+def _comment(row):
+    post_id, author_id, text, created = row[1:5]
+
+    return Comment(
+        post_id=post_id,
+        author_id=author_id,
+        text=text,
+        created=parse_datetime(created)
+    )
+
+
+def pending(post_id, author_id):
+    """Еще не записанные комментарии автора к посту, старые первыми."""
+    if not enabled():
+        return []
+    with closing(connect()) as connection:
+        rows = connection.execute(
+            'SELECT id, post_id, author_id, text, created FROM comment '
+            'WHERE post_id = ? AND author_id = ? ORDER BY id',
+            (post_id, author_id)
+        ).fetchall()
+
+    return [_comment(row) for row in rows]
+
+
+def _save(rows):
+    """Записывает строки журнала в базу одной транзакцией.
+
+    С шардами комментарии группируются по шардам постов: проверка
+    поста и ``bulk_create`` идут в шард поста. Комментарии к удаленным
+    постам и от удаленных пользователей пропускаются. Возвращает число
+    записанных комментариев.
+    """
+    comments = [_comment(row) for row in rows]
+    existing = set()
+    for alias, post_ids in sharding.by_post_shard(
+        {comment.post_id for comment in comments}
+    ).items():
+        existing.update(Post.objects.using(alias).filter(
+            pk__in=post_ids
+        ).values_list('pk', flat=True))
+    authors = set(User.objects.filter(
+        pk__in={comment.author_id for comment in comments}
+    ).values_list('pk', flat=True))
+    comments = [
+        comment for comment in comments
+        if comment.post_id in existing and comment.author_id in authors
+    ]
+    with transaction.atomic():
+        for alias, post_ids in sharding.by_post_shard(
+            {comment.post_id for comment in comments}
+        ).items():
+            with transaction.atomic(using=alias):
+                Comment.objects.using(alias).bulk_create([
+                    comment for comment in comments
+                    if comment.post_id in post_ids
+                ])
+        for author_id, count in Counter(
+            comment.author_id for comment in comments
+        ).items():
+            stats.change(author_id, comments_count=count)
+    versions.bump(*versions.bulk_post_scopes(
+        {comment.post_id for comment in comments}
+    ))
+
+    return len(comments)
+
+
+def _save_each(rows):
+    """Записывает строки по одной. Возвращает число записанных
+    комментариев и строки для ``dead_comment``.
+    """
+    saved, dead = 0, []
+    for row in rows:
+        try:
+            saved += _save([row])
+        except ROW_ERRORS as error:
+            logger.error(
+                'Комментарий %s журнала не записан: %s', row[0], error
+            )
+            dead.append((*row, str(error), time.time()))
+
+    return saved, dead
+
+
+def flush(batch_size=COMMENT_QUEUE_BATCH_SIZE):
+    """Переносит в базу самую старую пачку журнала.
+
+    Возвращает число обработанных строк журнала.
+    """
+    start = time.perf_counter()
+    with closing(connect()) as connection:
+        rows = connection.execute(
+            'SELECT id, post_id, author_id, text, created, enqueued '
+            'FROM comment ORDER BY id LIMIT ?',
+            (batch_size,)
+        ).fetchall()
+        if not rows:
+            return 0
+        try:
+            saved, dead = _save(rows), []
+        except ROW_ERRORS:
+            saved, dead = _save_each(rows)
+        connection.execute('BEGIN IMMEDIATE')
+        connection.executemany(
+            'INSERT OR REPLACE INTO dead_comment (id, post_id, author_id, '
+            'text, created, enqueued, error, failed) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            dead
+        )
+        connection.execute(
+            'DELETE FROM comment WHERE id <= ?', (rows[-1][0],)
+        )
+        _record(connection, {
+            'last_flush_at': time.time(),
+            'last_flush_seconds': time.perf_counter() - start,
+            'last_flush_rows': len(rows),
+            'last_flush_max_wait': time.time() - rows[0][5],
+        }, saved)
+        connection.execute('COMMIT')
+
+    return len(rows)
+
+
+def _record(connection, values, saved):
+    row = connection.execute(
+        "SELECT value FROM metric WHERE name = 'flushed_total'"
+    ).fetchone()
+    values['flushed_total'] = (json.loads(row[0]) if row else 0) + saved
+    connection.executemany(
+        'INSERT OR REPLACE INTO metric (name, value) VALUES (?, ?)',
+        [(name, json.dumps(value)) for name, value in values.items()]
+    )
+
+
+def metrics():
+    """Глубина журнала, возраст самой старой записи, число
+    не записавшихся строк и данные последнего переноса: когда,
+    сколько строк, за сколько секунд и сколько ждала в журнале самая
+    старая из них.
+    """
+    with closing(connect()) as connection:
+        depth, oldest = connection.execute(
+            'SELECT COUNT(*), MIN(enqueued) FROM comment'
+        ).fetchone()
+        dead = connection.execute(
+            'SELECT COUNT(*) FROM dead_comment'
+        ).fetchone()[0]
+        result = {
+            name: json.loads(value)
+            for name, value in connection.execute(
+                'SELECT name, value FROM metric'
+            )
+        }
+    result.update(
+        depth=depth,
+        dead=dead,
+        oldest_age=round(time.time() - oldest, 3) if oldest else 0,
+    )
+
+    return result
+
+
+def drain(batch_size=COMMENT_QUEUE_BATCH_SIZE):
+    """Переносит весь журнал, возвращает число строк."""
+    total = 0
+    while True:
+        count = flush(batch_size)
+        if not count:
+            return total
+        total += count
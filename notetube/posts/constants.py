@@ -1,3 +1,56 @@
 NUMBER_OF_POSTS = 10
 NUMBER_OF_CHAR = 15
 NUMBER_OF_POSTS_TEST = 13
+COUNT_CACHE_TIMEOUT = 60
+CURSOR_PARAM = 'cursor'
+FEED_FANOUT_LIMIT = 1000
+FEED_BATCH_SIZE = 500
+LISTING_DEFERRED_FIELDS = (
+    'group__description',
+    'author__password',
+    'author__email',
+    'author__last_login',
+    'author__date_joined',
+    'author__is_superuser',
+    'author__is_staff',
+    'author__is_active',
+)
+STATS_BATCH_SIZE = 500
+PAGE_CACHE_TIMEOUT = 300
+RESPONSIVE_WIDTHS = (400, 800, 1200)
+RESPONSIVE_FORMATS = ('WEBP', 'JPEG')
+RESPONSIVE_CARD_SIZES = '(min-width: 1200px) 1140px, 100vw'
+RESPONSIVE_DETAIL_SIZES = (
+    '(min-width: 1200px) 855px, (min-width: 768px) 75vw, 100vw'
+)
+THUMBNAIL_GEOMETRIES = tuple(
+    (f'{width}x{width // 2}', {
+        'crop': 'center', 'upscale': True, 'format': image_format
+    })
+    for image_format in RESPONSIVE_FORMATS
+    for width in RESPONSIVE_WIDTHS
+)
+THUMBNAIL_BATCH_SIZE = 20
+THUMBNAIL_MAX_ATTEMPTS = 3
+THUMBNAIL_JOB_TIMEOUT = 300
+IMAGE_UPLOAD_TO = 'posts/'
+IMAGE_FORMAT = 'WEBP'
+IMAGE_MAX_SIZE = 2048
+IMAGE_QUALITY = 82
+SEARCH_PARAM = 'q'
+SEARCH_TERM_MAX_LENGTH = 64
+SEARCH_MAX_TERMS = 10
+SEARCH_BATCH_SIZE = 500
+DATE_PROBE_LIMIT = 100
+ESTIMATED_COUNT_THRESHOLD = 10000
+ADMIN_LIST_PER_PAGE = 50
+MODERATION_BATCH_SIZE = 100
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 500
+IMPORT_REPORT_EVERY = 10000
+API_PAGE_SIZE = 20
+HTML_CACHE_MAX_AGE = 60
+COMMENTS_PER_PAGE = 20
+COMMENT_ORDER_PARAM = 'order'
+COMMENT_ORDERS = ('oldest', 'newest')
+COMMENT_QUEUE_BATCH_SIZE = 200
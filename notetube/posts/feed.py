@@ -0,0 +1,138 @@
+"""Лента подписок с раскладкой постов при записи (fan-out-on-write).
+
+Новый пост сразу раскладывается в ``FeedItem`` всех подписчиков автора,
+поэтому чтение ленты — один диапазон по индексу ``(user, pub_date)``.
+Посты авторов, у которых подписчиков не меньше ``FEED_FANOUT_LIMIT``,
+не раскладываются: такие авторы подмешиваются в ленту при чтении.
+
+С шардами (``posts.sharding``) посты не раскладываются: лента
+собирается при чтении из шардов авторов, на которых подписан
+пользователь.
+"""
+from itertools import islice
+
+from django.db.models import F, Q
+
+from .constants import FEED_BATCH_SIZE, FEED_FANOUT_LIMIT
+from .models import FeedItem, Follow, Post, UserStats
+from . import sharding
+
+
+FEED_ORDERING = ('feed_date', 'feed_post')
+
+
+def _bulk_insert(items):
+    """Вставляет записи ленты пачками, пропуская уже существующие."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, FEED_BATCH_SIZE))
+        if not batch:
+            break
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def followers_count(author_id):
+    """Количество подписчиков автора (по счетчикам пользователя)."""
+    followers = UserStats.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first()
+    if followers is None:
+        return Follow.objects.filter(author_id=author_id).count()
+
+    return followers
+
+
+def is_celebrity(author_id):
+    """Автор слишком популярен для раскладки при записи."""
+    return followers_count(author_id) >= FEED_FANOUT_LIMIT
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if sharding.enabled() or is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedItem(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту подписчика постами автора после подписки."""
+    if sharding.enabled() or is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    _bulk_insert(
+        FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def clean(user_id, author_id):
+    """Убирает посты автора из ленты после отписки.
+
+    Если автор перестал быть «популярным», его посты раскладываются
+    по лентам оставшихся подписчиков.
+    """
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+    if followers_count(author_id) == FEED_FANOUT_LIMIT - 1:
+        rebuild_author(author_id)
+
+
+def rebuild_author(author_id):
+    """Заново раскладывает все посты автора по лентам подписчиков."""
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in follower_ids.iterator():
+        backfill(user_id, author_id)
+
+
+def rebuild():
+    """Полностью перестраивает ленты подписок."""
+    FeedItem.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
+
+
+def celebrities_followed(user):
+    """Подзапрос популярных авторов, на которых подписан пользователь."""
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gte=FEED_FANOUT_LIMIT
+    ).values('author')
+
+
+def follow_feed(user):
+    """Посты ленты подписок пользователя.
+
+    Упорядочены по полям ``FEED_ORDERING``: для обычной ленты это поля
+    ``FeedItem``, и страница читается прямо по индексу ленты.
+    """
+    if sharding.enabled():
+        author_ids = Follow.objects.filter(
+            user=user
+        ).values_list('author_id', flat=True)
+        post_list = sharding.posts_by_authors(list(author_ids)).annotate(
+            feed_date=F('pub_date'), feed_post=F('pk')
+        )
+    elif not celebrities_followed(user).exists():
+        post_list = Post.objects.filter(feed_items__user=user).annotate(
+            feed_date=F('feed_items__pub_date'),
+            feed_post=F('feed_items__post')
+        )
+    else:
+        post_list = Post.objects.filter(
+            Q(pk__in=FeedItem.objects.filter(user=user).values('post'))
+            | Q(author__in=celebrities_followed(user))
+        ).annotate(feed_date=F('pub_date'), feed_post=F('pk'))
+
+    return post_list.order_by(*('-' + field for field in FEED_ORDERING))
@@ -1,5 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .export import EXPORTS, FORMATS, get_queryset
+from .images import normalize_image
 from .models import Post, Comment
 
 
@@ -10,6 +13,14 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Нормализует новую картинку перед сохранением."""
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+
+        return image
+
 
 class CommentForm(forms.ModelForm):
     """Форма создания комментария."""
@@ -17,3 +28,38 @@ class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class ExportForm(forms.Form):
+    """Форма выгрузки данных в админке."""
+
+    name = forms.ChoiceField(
+        choices=[(name, name) for name in EXPORTS],
+        label='Что выгрузить'
+    )
+    format = forms.ChoiceField(
+        choices=[(fmt, fmt.upper()) for fmt in FORMATS],
+        label='Формат'
+    )
+    author = forms.CharField(required=False, label='Автор (имя пользователя)')
+    group = forms.CharField(required=False, label='Группа (slug)')
+    since = forms.DateField(required=False, label='С даты')
+    until = forms.DateField(required=False, label='По дату')
+
+    def clean(self):
+        """Проверяет, что выбранные фильтры есть у выгрузки."""
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        try:
+            cleaned_data['queryset'] = get_queryset(
+                cleaned_data['name'],
+                author=cleaned_data['author'] or None,
+                group=cleaned_data['group'] or None,
+                since=cleaned_data['since'],
+                until=cleaned_data['until']
+            )
+        except ValueError as error:
+            raise forms.ValidationError(str(error))
+
+        return cleaned_data
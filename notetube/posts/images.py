@@ -0,0 +1,72 @@
+import hashlib
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .constants import (
+    IMAGE_FORMAT,
+    IMAGE_MAX_SIZE,
+    IMAGE_QUALITY,
+    IMAGE_UPLOAD_TO,
+)
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def output_format():
+    """WebP, если Pillow собран с его поддержкой, иначе JPEG."""
+    if IMAGE_FORMAT == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+
+    return IMAGE_FORMAT
+
+
+def content_hash(upload):
+    """SHA-256 загруженного файла, прочитанного по частям."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def normalize_image(upload):
+    """Приводит загруженную картинку к формату хранения.
+
+    Картинка уменьшается до ``IMAGE_MAX_SIZE`` по большей стороне,
+    поворачивается по EXIF и перекодируется без метаданных.
+    Имя файла — хеш исходного содержимого, поэтому повторная загрузка
+    той же картинки возвращает имя уже сохраненного файла (строку)
+    вместо нового файла.
+    """
+    image_format = output_format()
+    name = '{}.{}'.format(content_hash(upload), EXTENSIONS[image_format])
+    stored_name = IMAGE_UPLOAD_TO + name
+    if default_storage.exists(stored_name):
+        return stored_name
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        image.draft('RGB', (IMAGE_MAX_SIZE, IMAGE_MAX_SIZE))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((IMAGE_MAX_SIZE, IMAGE_MAX_SIZE), Image.LANCZOS)
+    except (OSError, Image.DecompressionBombError) as error:
+        raise ValidationError(
+            'Не удалось обработать картинку.', code='invalid_image'
+        ) from error
+    if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB' if image_format == 'JPEG' else 'RGBA')
+    output = tempfile.TemporaryFile()
+    image.save(
+        output,
+        image_format,
+        quality=IMAGE_QUALITY,
+        optimize=True,
+        progressive=True,
+    )
+    output.seek(0)
+
+    return File(output, name=name)
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import comment_queue
+from posts.constants import COMMENT_QUEUE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Переносит комментарии из журнала отложенной записи в базу.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=COMMENT_QUEUE_BATCH_SIZE,
+            help='Сколько комментариев записывать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.5,
+            help='Пауза между опросами пустого журнала, секунды.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Перенести журнал и завершиться.'
+        )
+        parser.add_argument(
+            '--metrics',
+            action='store_true',
+            help='Показать глубину журнала и данные переноса в JSON.'
+        )
+
+    def handle(self, *args, **options):
+        if options['metrics']:
+            self.stdout.write(json.dumps(comment_queue.metrics()))
+            return
+        while True:
+            count = comment_queue.flush(options['batch_size'])
+            if count:
+                metrics = comment_queue.metrics()
+                self.stdout.write(
+                    f'Записано {count}, в журнале {metrics["depth"]}, '
+                    f'не записано {metrics["dead"]}, '
+                    f'{metrics["last_flush_seconds"]:.3f} с'
+                )
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,64 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.constants import EXPORT_CHUNK_SIZE
+
+
+def date(value):
+    return datetime.date.fromisoformat(value)
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты, комментарии, подписки или группы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=tuple(export.EXPORTS))
+        parser.add_argument(
+            '--format',
+            choices=tuple(export.FORMATS),
+            default='jsonl',
+            help='Формат выгрузки.'
+        )
+        parser.add_argument('--author', help='Имя пользователя автора.')
+        parser.add_argument('--group', help='Адрес (slug) группы.')
+        parser.add_argument(
+            '--since', type=date, help='Начальная дата, ГГГГ-ММ-ДД.'
+        )
+        parser.add_argument(
+            '--until', type=date, help='Конечная дата (включительно).'
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки (по умолчанию — stdout).'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export.get_queryset(
+                options['name'],
+                author=options['author'],
+                group=options['group'],
+                since=options['since'],
+                until=options['until']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        lines = export.stream(
+            options['name'],
+            queryset,
+            options['format'],
+            options['chunk_size']
+        )
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+            f.writelines(lines)
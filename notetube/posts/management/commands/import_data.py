@@ -0,0 +1,157 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bulk_import, sharding
+from posts.constants import IMPORT_BATCH_SIZE, IMPORT_REPORT_EVERY
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово загружает данные из файлов JSONL/CSV (формат export_data) '
+        'или генерирует синтетические данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files',
+            nargs='*',
+            metavar='ИМЯ=ФАЙЛ',
+            help=(
+                'Что и откуда загружать, например posts=posts.jsonl '
+                '(users, groups, posts, comments, follows; - — stdin).'
+            )
+        )
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'csv'),
+            help='Формат файлов (по умолчанию — по расширению).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Строк в одной вставке и транзакции.'
+        )
+        parser.add_argument(
+            '--report-every',
+            type=int,
+            default=IMPORT_REPORT_EVERY,
+            help='Как часто печатать скорость загрузки, строк.'
+        )
+        parser.add_argument(
+            '--defer-indexes',
+            action='store_true',
+            help='Удалить индексы таблиц на время загрузки.'
+        )
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Не перестраивать ленты, счетчики и поиск после загрузки.'
+        )
+        fake = parser.add_argument_group('синтетические данные')
+        fake.add_argument(
+            '--fake',
+            action='store_true',
+            help='Сгенерировать данные вместо загрузки файлов.'
+        )
+        fake.add_argument('--users', type=int, default=100)
+        fake.add_argument('--groups', type=int, default=10)
+        fake.add_argument('--posts', type=int, default=1000)
+        fake.add_argument('--comments', type=int, default=2000)
+        fake.add_argument(
+            '--follows-per-user',
+            type=int,
+            default=10,
+            help='Сколько авторов читает каждый пользователь.'
+        )
+        fake.add_argument(
+            '--graph',
+            choices=bulk_import.FOLLOW_GRAPHS,
+            default='uniform',
+            help='Форма графа подписок.'
+        )
+        fake.add_argument(
+            '--celebrities',
+            type=int,
+            default=0,
+            help='Авторы, на которых подписаны все (для --graph celebrity).'
+        )
+        fake.add_argument('--seed', type=int, help='Зерно генератора.')
+
+    def handle(self, *args, **options):
+        sources = self.sources(options)
+        if sharding.enabled() and {'posts', 'comments'} & set(sources):
+            raise CommandError(
+                'С шардами посты и комментарии не загружаются.'
+            )
+        importer = bulk_import.Importer(
+            options['batch_size'], options['report_every'], self.report
+        )
+        models = [bulk_import.MODELS[name] for name in sources]
+        if options['defer_indexes']:
+            with bulk_import.deferred_indexes(models):
+                self.load(importer, sources, options)
+        else:
+            self.load(importer, sources, options)
+        if importer.skipped:
+            self.stdout.write(
+                f'Пропущено строк без связанных объектов: {importer.skipped}'
+            )
+        if not options['no_rebuild']:
+            self.stdout.write('Перестройка лент, счетчиков и поиска...')
+            bulk_import.finish(sources, importer.images)
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена.'))
+
+    def sources(self, options):
+        """Словарь «таблица → строки» в порядке загрузки."""
+        if options['fake']:
+            if options['files']:
+                raise CommandError('С --fake файлы не указываются.')
+            try:
+                return bulk_import.fake_rows(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    follows_per_user=options['follows_per_user'],
+                    graph=options['graph'],
+                    celebrities=options['celebrities'],
+                    seed=options['seed']
+                )
+            except ImportError:
+                raise CommandError('Для --fake нужен пакет Faker.')
+        if not options['files']:
+            raise CommandError('Укажите файлы или --fake.')
+        files = {}
+        for source in options['files']:
+            name, _, path = source.partition('=')
+            if name not in bulk_import.MODELS or not path:
+                raise CommandError(f'Непонятный источник: {source}')
+            files[name] = path
+
+        return {
+            name: self.read(files[name], options['format'])
+            for name in bulk_import.ORDER if name in files
+        }
+
+    def read(self, path, fmt):
+        fmt = fmt or ('csv' if path.endswith('.csv') else 'jsonl')
+        if path == '-':
+            yield from bulk_import.read_rows(sys.stdin, fmt)
+            return
+        if not os.path.exists(path):
+            raise CommandError(f'Нет файла {path}')
+        with open(path, encoding='utf-8', newline='') as file:
+            yield from bulk_import.read_rows(file, fmt)
+
+    def load(self, importer, sources, options):
+        for name, rows in sources.items():
+            importer.load(name, rows)
+
+    def report(self, name, total, elapsed):
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{name}: {total} строк за {elapsed:.1f} с ({rate:.0f} строк/с)'
+        )
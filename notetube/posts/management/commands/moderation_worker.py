@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import moderation
+from posts.constants import MODERATION_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи массовой модерации из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MODERATION_BATCH_SIZE,
+            help='Сколько объектов обрабатывать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза между опросами пустой очереди, секунды.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить очередь и завершиться.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = moderation.next_job()
+            if job is not None:
+                self.stdout.write(f'{job}: {job.processed}/{job.total}')
+                try:
+                    moderation.run(job, options['batch_size'], self.report)
+                except Exception as error:
+                    self.stderr.write(f'{job}: ошибка {error}')
+                    continue
+                self.stdout.write(self.style.SUCCESS(f'{job}: готово'))
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+    def report(self, job):
+        self.stdout.write(
+            f'{job}: {job.processed}/{job.total} ({job.progress}%)'
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, подписок и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user_ids',
+            nargs='*',
+            type=int,
+            help='Пользователи для пересчета (по умолчанию все).'
+        )
+
+    def handle(self, *args, **options):
+        stats.rebuild(options['user_ids'] or None)
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
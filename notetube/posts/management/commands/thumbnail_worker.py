@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.constants import THUMBNAIL_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Генерирует миниатюры картинок постов из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=2,
+            help='Размер пула процессов (0 — в текущем процессе).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=THUMBNAIL_BATCH_SIZE,
+            help='Сколько задач забирать из очереди за раз.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза между опросами пустой очереди, секунды.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь и завершиться.'
+        )
+        parser.add_argument(
+            '--enqueue-missing',
+            action='store_true',
+            help='Сначала поставить в очередь картинки без миниатюр.'
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue_missing']:
+            count = thumbnails.enqueue_missing()
+            self.stdout.write(f'В очередь поставлено картинок: {count}')
+        executor = None
+        if options['processes'] > 0:
+            executor = thumbnails.make_executor(options['processes'])
+        try:
+            self.run(executor, options)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def run(self, executor, options):
+        processed = 0
+        while True:
+            thumbnails.requeue_stale()
+            jobs = thumbnails.claim(options['batch_size'])
+            if jobs:
+                thumbnails.process_batch(jobs, executor)
+                processed += len(jobs)
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано задач: {processed}')
+        )
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 11:42
+
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+
+
+def create_fts_table(apps, schema_editor):
+    from posts.search import Fts5Backend
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        Fts5Backend.create_table(schema_editor.connection)
+    except OperationalError:
+        # SQLite собран без FTS5: остается индекс SearchTerm.
+        pass
+
+
+def drop_fts_table(apps, schema_editor):
+    from posts.search import Fts5Backend
+    if schema_editor.connection.vendor == 'sqlite':
+        Fts5Backend.drop_table(schema_editor.connection)
+
+
+def fill_index(apps, schema_editor):
+    from posts.search import get_backend
+    Post = apps.get_model('posts', 'Post')
+    get_backend(
+        schema_editor.connection.alias,
+        apps.get_model('posts', 'SearchTerm')
+    ).index(Post.objects.values_list('pk', 'text').iterator())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_thumbnailjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('weight', models.FloatField(verbose_name='Вес слова в посте')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'слово поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
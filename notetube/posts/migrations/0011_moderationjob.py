@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 11:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0010_searchterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('delete_posts', 'Удаление постов'), ('move_posts', 'Перенос постов в группу'), ('purge_images', 'Удаление картинок постов'), ('delete_comments', 'Удаление комментариев')], max_length=32, verbose_name='Действие')),
+                ('object_ids', models.TextField(verbose_name='Ключи объектов (JSON)')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего объектов')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Обработано объектов')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки в очередь')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Модератор')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group', verbose_name='Новая группа')),
+            ],
+            options={
+                'verbose_name': 'задача модерации',
+                'verbose_name_plural': 'Очередь модерации',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='moderationjob',
+            index=models.Index(fields=['status', 'created'], name='moderation_job_status_idx'),
+        ),
+    ]
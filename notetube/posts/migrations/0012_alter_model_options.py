@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 11:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_moderationjob'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'verbose_name': 'комментарий', 'verbose_name_plural': 'Комментарии'},
+        ),
+        migrations.AlterModelOptions(
+            name='follow',
+            options={'verbose_name': 'подписчик', 'verbose_name_plural': 'Подписчики'},
+        ),
+        migrations.AlterModelOptions(
+            name='group',
+            options={'verbose_name': 'группа', 'verbose_name_plural': 'Группы'},
+        ),
+    ]
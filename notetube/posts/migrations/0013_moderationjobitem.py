@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:34
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_items(apps, schema_editor):
+    ModerationJob = apps.get_model('posts', 'ModerationJob')
+    ModerationJobItem = apps.get_model('posts', 'ModerationJobItem')
+    db_alias = schema_editor.connection.alias
+    jobs = ModerationJob.objects.using(db_alias).filter(
+        status__in=('pending', 'processing')
+    )
+    for job in jobs:
+        ModerationJobItem.objects.using(db_alias).bulk_create(
+            (
+                ModerationJobItem(job=job, object_id=object_id)
+                for object_id in json.loads(job.object_ids)[job.processed:]
+            ),
+            batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_alter_model_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationJobItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Ключ объекта')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='posts.ModerationJob', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'объект задачи модерации',
+                'verbose_name_plural': 'Объекты задач модерации',
+            },
+        ),
+        migrations.RunPython(fill_items, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='moderationjob',
+            name='object_ids',
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_moderationjobitem'),
+    ]
+
+    # Схема не меняется: значение по умолчанию задается в Python.
+    # Обычный AlterField в SQLite пересоздал бы таблицы постов
+    # и комментариев вместе со счетчиком AUTOINCREMENT.
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='comment',
+                name='created',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата публикации комментария'),
+            ),
+            migrations.AlterField(
+                model_name='post',
+                name='pub_date',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата публикации поста'),
+            ),
+        ]),
+    ]
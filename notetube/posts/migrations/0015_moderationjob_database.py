@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_explicit_dates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationjob',
+            name='database',
+            field=models.CharField(blank=True, help_text='Пусто — основная база.', max_length=64, verbose_name='Шард объектов'),
+        ),
+    ]
@@ -1,7 +1,15 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
-from .constants import NUMBER_OF_CHAR
+from .constants import (
+    IMAGE_UPLOAD_TO,
+    LISTING_DEFERRED_FIELDS,
+    NUMBER_OF_CHAR,
+    SEARCH_TERM_MAX_LENGTH,
+)
 
 
 User = get_user_model()
@@ -31,6 +39,47 @@ class Group(models.Model):
         return self.title
 
 
+class RoutedQuerySet(models.QuerySet):
+    """Запросы моделей, база которых зависит от самого объекта."""
+
+    def create(self, **kwargs):
+        """Без явного ``using`` база нового объекта выбирается роутером
+        по объекту (для шардов — по автору поста), а не по модели.
+        """
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+
+        return obj
+
+
+class PostQuerySet(RoutedQuerySet):
+    """Запросы постов."""
+
+    def for_listing(self):
+        """Посты для лент: автор и группа одним запросом,
+        без лишних колонок, с количеством комментариев.
+
+        В шарде (``posts.sharding``) авторов и групп нет, они
+        подгружаются отдельными запросами к основной базе.
+        """
+        comment_count = Comment.objects.filter(
+            post=models.OuterRef('pk')
+        ).order_by().values('post').annotate(
+            total=models.Count('pk')
+        ).values('total')
+        if self.db in settings.POST_SHARDS:
+            queryset = self.prefetch_related('author', 'group')
+        else:
+            queryset = self.select_related('author', 'group').defer(
+                *LISTING_DEFERRED_FIELDS
+            )
+
+        return queryset.annotate(
+            comment_count=Coalesce(models.Subquery(comment_count), 0)
+        )
+
+
 class Post(models.Model):
     """Модель постов."""
 
@@ -39,7 +88,8 @@ class Post(models.Model):
         help_text='Введите текст поста'
     )
     pub_date = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name='Дата публикации поста'
     )
     author = models.ForeignKey(
@@ -60,15 +110,31 @@ class Post(models.Model):
     )
     image = models.ImageField(
         verbose_name='Картинка поста',
-        upload_to='posts/',
+        upload_to=IMAGE_UPLOAD_TO,
         blank=True,
         help_text='Выберете картинку для поста'
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:NUMBER_OF_CHAR]
@@ -82,7 +148,8 @@ class Comment(models.Model):
         help_text='Введите текст комментария'
     )
     created = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name='Дата публикации комментария'
     )
     post = models.ForeignKey(
@@ -98,9 +165,17 @@ class Comment(models.Model):
         verbose_name='Автор комментария'
     )
 
+    objects = RoutedQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:NUMBER_OF_CHAR]
@@ -125,6 +200,297 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'подписчик'
         verbose_name_plural = 'Подписчики'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow'
+            ),
+        )
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class FeedItem(models.Model):
+    """Модель ленты подписок (заранее разложенные посты)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Читатель ленты'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста'
+    )
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_item'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_user_pub_date_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class UserStats(models.Model):
+    """Модель счетчиков пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество комментариев'
+    )
+
+    class Meta:
+        verbose_name = 'счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self):
+        return f'Счетчики {self.user}'
+
+
+class ThumbnailJob(models.Model):
+    """Модель очереди генерации миниатюр картинок постов."""
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnail_jobs',
+        verbose_name='Пост'
+    )
+    image = models.CharField(
+        max_length=255,
+        verbose_name='Картинка'
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата постановки в очередь'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'задача миниатюр'
+        verbose_name_plural = 'Очередь миниатюр'
+        indexes = (
+            models.Index(
+                fields=('status', 'created'),
+                name='thumbnail_job_status_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.image}: {self.get_status_display()}'
+
+
+class SearchTerm(models.Model):
+    """Модель обратного индекса поиска (если нет FTS5)."""
+
+    term = models.CharField(
+        max_length=SEARCH_TERM_MAX_LENGTH,
+        verbose_name='Основа слова'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост'
+    )
+    weight = models.FloatField(
+        verbose_name='Вес слова в посте'
+    )
+
+    class Meta:
+        verbose_name = 'слово поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('term', 'post'),
+                name='unique_search_term'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.term} в {self.post_id}'
+
+
+class ModerationJob(models.Model):
+    """Модель фоновой задачи массовой модерации."""
+
+    DELETE_POSTS = 'delete_posts'
+    MOVE_POSTS = 'move_posts'
+    PURGE_IMAGES = 'purge_images'
+    DELETE_COMMENTS = 'delete_comments'
+    ACTIONS = (
+        (DELETE_POSTS, 'Удаление постов'),
+        (MOVE_POSTS, 'Перенос постов в группу'),
+        (PURGE_IMAGES, 'Удаление картинок постов'),
+        (DELETE_COMMENTS, 'Удаление комментариев'),
+    )
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    action = models.CharField(
+        max_length=32,
+        choices=ACTIONS,
+        verbose_name='Действие'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True,
+        verbose_name='Новая группа'
+    )
+    database = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Шард объектов',
+        help_text='Пусто — основная база.'
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Всего объектов'
+    )
+    processed = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Обработано объектов'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка'
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True,
+        verbose_name='Модератор'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата постановки в очередь'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'задача модерации'
+        verbose_name_plural = 'Очередь модерации'
+        indexes = (
+            models.Index(
+                fields=('status', 'created'),
+                name='moderation_job_status_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.get_action_display()} №{self.pk}'
+
+    @property
+    def progress(self):
+        """Доля обработанных объектов в процентах."""
+        if not self.total:
+            return 100
+
+        return self.processed * 100 // self.total
+
+
+class ModerationJobItem(models.Model):
+    """Объект задачи модерации, еще не обработанный воркером."""
+
+    job = models.ForeignKey(
+        ModerationJob,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name='Задача'
+    )
+    object_id = models.PositiveIntegerField(
+        verbose_name='Ключ объекта'
+    )
+
+    class Meta:
+        verbose_name = 'объект задачи модерации'
+        verbose_name_plural = 'Объекты задач модерации'
@@ -0,0 +1,170 @@
+"""Массовая модерация фоновыми задачами.
+
+Действия админки не трогают объекты в запросе: они только записывают
+ключи выбранных объектов строками ``ModerationJobItem`` задачи
+``ModerationJob``. Воркер ``python manage.py moderation_worker``
+выполняет задачу пачками по ``MODERATION_BATCH_SIZE`` объектов:
+пачка читает только свои строки и удаляет их в своей транзакции
+вместе с отметкой прогресса, поэтому прерванная задача продолжается
+с первой необработанной пачки. Файлы и версии кеша
+обрабатываются после транзакции пачки.
+
+С ``POST_SHARDS`` задача запоминает шард выбранных объектов
+(``database``) и меняет объекты в нем; сама очередь лежит
+в основной базе.
+
+Воркер рассчитан на запуск в одном экземпляре.
+"""
+import logging
+from itertools import islice
+
+from django.db import transaction
+from sorl.thumbnail import delete as delete_image
+
+from .constants import MODERATION_BATCH_SIZE
+from .models import Comment, ModerationJob, ModerationJobItem, Post
+from . import sharding, versions
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(action, queryset, user=None, group=None):
+    """Ставит в очередь действие над объектами ``queryset``."""
+    object_ids = queryset.order_by('pk').values_list('pk', flat=True)
+    with transaction.atomic():
+        job = ModerationJob.objects.create(
+            action=action,
+            group=group,
+            created_by=user,
+            database=queryset.db if sharding.is_shard(queryset.db) else ''
+        )
+        items = (
+            ModerationJobItem(job=job, object_id=object_id)
+            for object_id in object_ids.iterator()
+        )
+        while True:
+            batch = list(islice(items, MODERATION_BATCH_SIZE))
+            if not batch:
+                break
+            ModerationJobItem.objects.bulk_create(batch)
+            job.total += len(batch)
+        job.save(update_fields=('total',))
+
+    return job
+
+
+def _purge_files(names):
+    """Удаляет картинки и их миниатюры, если на них больше нет ссылок.
+
+    Одинаковые загрузки хранятся одним файлом, поэтому файл,
+    на который ссылается другой пост (в любом шарде), остается.
+    """
+    names = set(filter(None, names))
+    used = sharding.distinct(Post, 'image', image__in=names)
+    for name in names - used:
+        try:
+            delete_image(name)
+        except OSError as error:
+            logger.warning('Картинка %s не удалена: %s', name, error)
+
+
+def _objects(job, model):
+    """Объекты ``model`` в базе задачи."""
+    return model.objects.using(job.database or None)
+
+
+def _images(job, post_ids):
+    return list(_objects(job, Post).filter(pk__in=post_ids).exclude(
+        image=''
+    ).values_list('image', flat=True))
+
+
+# Обработчик действия меняет базу и может вернуть функцию,
+# которую нужно вызвать после фиксации транзакции пачки.
+
+def delete_posts(job, post_ids):
+    """Удаляет посты вместе с комментариями и ненужными картинками."""
+    images = _images(job, post_ids)
+    _objects(job, Post).filter(pk__in=post_ids).delete()
+
+    return lambda: _purge_files(images)
+
+
+def move_posts(job, post_ids):
+    """Переносит посты в группу задачи (без группы, если ее удалили)."""
+    slug = job.group.slug if job.group is not None else None
+    scopes = versions.bulk_post_scopes(post_ids, *filter(None, [slug]))
+    _objects(job, Post).filter(pk__in=post_ids).update(group=job.group)
+
+    return lambda: versions.bump(*scopes)
+
+
+def purge_images(job, post_ids):
+    """Убирает картинки у постов."""
+    images = _images(job, post_ids)
+    scopes = versions.bulk_post_scopes(post_ids)
+    _objects(job, Post).filter(pk__in=post_ids).update(image='')
+
+    def after():
+        _purge_files(images)
+        versions.bump(*scopes)
+
+    return after
+
+
+def delete_comments(job, comment_ids):
+    """Удаляет комментарии."""
+    _objects(job, Comment).filter(pk__in=comment_ids).delete()
+
+
+HANDLERS = {
+    ModerationJob.DELETE_POSTS: delete_posts,
+    ModerationJob.MOVE_POSTS: move_posts,
+    ModerationJob.PURGE_IMAGES: purge_images,
+    ModerationJob.DELETE_COMMENTS: delete_comments,
+}
+
+
+def next_job():
+    """Самая старая незавершенная задача."""
+    return ModerationJob.objects.filter(
+        status__in=(ModerationJob.PENDING, ModerationJob.PROCESSING)
+    ).select_related('group').order_by('created', 'pk').first()
+
+
+def process_batch(job, batch_size=MODERATION_BATCH_SIZE):
+    """Выполняет следующую пачку задачи, возвращает число объектов."""
+    items = list(
+        job.items.order_by('pk').values_list('pk', 'object_id')[:batch_size]
+    )
+    batch = [object_id for _, object_id in items]
+    try:
+        with transaction.atomic(), \
+                transaction.atomic(using=job.database or None):
+            after = HANDLERS[job.action](job, batch)
+            if items:
+                job.items.filter(pk__lte=items[-1][0]).delete()
+            job.processed += len(batch)
+            job.status = (
+                ModerationJob.DONE if job.processed >= job.total
+                else ModerationJob.PROCESSING
+            )
+            job.save(update_fields=('processed', 'status', 'updated'))
+    except Exception as error:
+        logger.exception('Задача модерации %s не выполнена', job.pk)
+        job.status = ModerationJob.FAILED
+        job.error = str(error)
+        job.save(update_fields=('status', 'error', 'updated'))
+        raise
+    if after is not None:
+        after()
+
+    return len(batch)
+
+
+def run(job, batch_size=MODERATION_BATCH_SIZE, report=None):
+    """Выполняет задачу до конца, после каждой пачки вызывает ``report``."""
+    while job.status in (ModerationJob.PENDING, ModerationJob.PROCESSING):
+        process_batch(job, batch_size)
+        if report is not None:
+            report(job)
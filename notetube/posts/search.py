@@ -0,0 +1,479 @@
+"""Полнотекстовый поиск по постам.
+
+Текст поста разбивается на слова, слова приводятся к основе
+русским стеммером Портера, и основы попадают в обратный индекс.
+На SQLite индекс — виртуальная таблица FTS5 ``posts_search``
+с ранжированием bm25, на остальных базах (или при ``SEARCH_BACKEND =
+'python'``) — таблица ``SearchTerm`` с весами слов, ранг считает
+сам запрос. Индекс обновляется сигналами при изменении постов
+и перестраивается командой ``python manage.py rebuild_search_index``.
+
+С ``POST_SHARDS`` у каждого шарда свой индекс его постов
+(``ShardedBackend``): поиск читает каждый шард и сливает
+упорядоченные результаты, ранг считается по словам своего шарда.
+
+Результаты упорядочены по рангу (меньше — лучше) и листаются
+курсором по паре (ранг, пост).
+"""
+import heapq
+import math
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+
+from .constants import (
+    NUMBER_OF_POSTS,
+    SEARCH_BATCH_SIZE,
+    SEARCH_MAX_TERMS,
+    SEARCH_TERM_MAX_LENGTH,
+)
+from .models import Post, SearchTerm
+from . import sharding
+from .utils import CursorPage, decode_cursor, encode_cursor
+
+FTS_TABLE = 'posts_search'
+
+WORD = re.compile(r'[^\W_]+')
+CYRILLIC = re.compile(r'^[а-я]+$')
+RVRE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому'
+    r'|их|ых|ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием'
+    r'|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+# Насыщение частоты слова в BM25.
+K1 = 1.2
+
+
+def stem(word):
+    """Основа слова по русскому стеммеру Портера.
+
+    Слова не из кириллицы только приводятся к нижнему регистру.
+    """
+    word = word.lower().replace('ё', 'е')
+    match = RVRE.match(word)
+    if not CYRILLIC.match(word) or match is None:
+        return word
+    prefix, rv = match.groups()
+    temp = PERFECTIVE_GERUND.sub('', rv, 1)
+    if temp == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        temp = ADJECTIVE.sub('', rv, 1)
+        if temp != rv:
+            rv = PARTICIPLE.sub('', temp, 1)
+        else:
+            temp = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub('', rv, 1)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+
+    return prefix + rv
+
+
+def terms(text):
+    """Основы слов текста в порядке появления (с повторами)."""
+    return [
+        stem(word)[:SEARCH_TERM_MAX_LENGTH]
+        for word in WORD.findall(text or '')
+    ]
+
+
+def query_terms(query):
+    """Различные основы слов поискового запроса."""
+    return list(dict.fromkeys(terms(query)))[:SEARCH_MAX_TERMS]
+
+
+def _batches(items):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, SEARCH_BATCH_SIZE))
+        if not batch:
+            break
+        yield batch
+
+
+class Fts5Backend:
+    """Индекс в виртуальной таблице SQLite FTS5.
+
+    В таблице хранятся уже приведенные к основам слова,
+    ``rowid`` строки равен ключу поста.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+
+    @staticmethod
+    def create_table(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                "USING fts5(body, tokenize = 'unicode61')"
+            )
+
+    @staticmethod
+    def drop_table(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def index(self, entries):
+        """Заменяет записи индекса для пар (пост, текст)."""
+        for batch in _batches(entries):
+            self.remove([post_id for post_id, text in batch])
+            with self.connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                    [
+                        (post_id, ' '.join(terms(text)))
+                        for post_id, text in batch
+                    ]
+                )
+
+    def remove(self, post_ids):
+        """Убирает посты из индекса."""
+        for batch in _batches(post_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                    batch
+                )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    @staticmethod
+    def _match(query_terms):
+        return ' '.join(f'"{term}"' for term in query_terms)
+
+    def filter(self, queryset, query_terms):
+        """Оставляет в запросе постов только посты со всеми словами."""
+        table = queryset.model._meta.db_table
+
+        return queryset.extra(
+            where=[
+                f'{table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s)'
+            ],
+            params=[self._match(query_terms)]
+        )
+
+    def search(self, query_terms, key=None, forward=True, limit=None):
+        """Пары (ранг, пост) для постов со всеми словами запроса."""
+        params = [self._match(query_terms)]
+        where = ''
+        if key is not None:
+            score, pk = key
+            lookup = '>' if forward else '<'
+            reverse = '<' if forward else '>'
+            where = (
+                f'WHERE score {lookup} %s '
+                f'OR (score = %s AND post_id {reverse} %s)'
+            )
+            params += [score, score, pk]
+        order = 'score, post_id DESC' if forward else 'score DESC, post_id'
+        params.append(-1 if limit is None else limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT score, post_id FROM ('
+                f'SELECT bm25({FTS_TABLE}) AS score, rowid AS post_id '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+                f') {where} ORDER BY {order} LIMIT %s',
+                params
+            )
+
+            return cursor.fetchall()
+
+
+class InvertedIndexBackend:
+    """Обратный индекс в обычной таблице ``SearchTerm``.
+
+    Вес слова в посте — насыщенная частота BM25 без нормировки
+    на длину, ранг поста — сумма весов слов запроса, умноженных
+    на их обратную документную частоту, со знаком минус.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, model=SearchTerm):
+        self.using = using
+        self.model = model
+
+    @property
+    def objects(self):
+        return self.model.objects.using(self.using)
+
+    def index(self, entries):
+        """Заменяет записи индекса для пар (пост, текст)."""
+        for batch in _batches(entries):
+            self.remove([post_id for post_id, text in batch])
+            rows = []
+            for post_id, text in batch:
+                counts = {}
+                for term in terms(text):
+                    counts[term] = counts.get(term, 0) + 1
+                rows.extend(
+                    self.model(
+                        term=term,
+                        post_id=post_id,
+                        weight=count * (K1 + 1) / (count + K1)
+                    )
+                    for term, count in counts.items()
+                )
+            self.objects.bulk_create(rows, batch_size=SEARCH_BATCH_SIZE)
+
+    def remove(self, post_ids):
+        """Убирает посты из индекса."""
+        for batch in _batches(post_ids):
+            self.objects.filter(post_id__in=batch).delete()
+
+    def clear(self):
+        self.objects.all().delete()
+
+    def _matches(self, query_terms):
+        return self.objects.filter(term__in=query_terms).order_by().values(
+            'post'
+        ).annotate(matched=Count('term')).filter(matched=len(query_terms))
+
+    def filter(self, queryset, query_terms):
+        """Оставляет в запросе постов только посты со всеми словами."""
+        return queryset.filter(
+            pk__in=self._matches(query_terms).values('post')
+        )
+
+    def search(self, query_terms, key=None, forward=True, limit=None):
+        """Пары (ранг, пост) для постов со всеми словами запроса."""
+        frequencies = dict(
+            self.objects.filter(term__in=query_terms).order_by().values(
+                'term'
+            ).annotate(posts=Count('post')).values_list('term', 'posts')
+        )
+        if len(frequencies) < len(query_terms):
+            return []
+        total = self.objects.values('post').distinct().count()
+        score = Case(
+            *(
+                When(term=term, then=F('weight') * Value(
+                    math.log(1 + (total - posts + 0.5) / (posts + 0.5)),
+                    output_field=FloatField()
+                ))
+                for term, posts in frequencies.items()
+            ),
+            output_field=FloatField()
+        )
+        results = self._matches(query_terms).annotate(score=-Sum(score))
+        if key is not None:
+            score, pk = key
+            lookup = 'gt' if forward else 'lt'
+            reverse = 'lt' if forward else 'gt'
+            results = results.filter(
+                Q(**{f'score__{lookup}': score})
+                | Q(score=score, **{f'post__{reverse}': pk})
+            )
+        results = results.order_by(
+            *(('score', '-post') if forward else ('-score', 'post'))
+        ).values_list('score', 'post')
+        if limit is not None:
+            results = results[:limit]
+
+        return list(results)
+
+
+def fts5_enabled(connection):
+    """В базе есть таблица FTS5 поискового индекса."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM sqlite_master WHERE name = %s', [FTS_TABLE]
+        )
+
+        return cursor.fetchone() is not None
+
+
+def get_backend(using=DEFAULT_DB_ALIAS, model=SearchTerm):
+    """Бэкенд индекса по настройке ``SEARCH_BACKEND``.
+
+    ``auto`` выбирает FTS5, если таблица индекса есть в базе.
+    """
+    name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if name == 'fts5' or (
+        name == 'auto' and fts5_enabled(connections[using])
+    ):
+        return Fts5Backend(using)
+
+    return InvertedIndexBackend(using, model)
+
+
+class ShardedBackend:
+    """Индексы постов всех шардов.
+
+    Записи индекса пишутся в шард поста. Поиск читает из каждого
+    шарда первые ``limit`` результатов после курсора и сливает их
+    (k-way merge) в порядке (ранг, пост).
+    """
+
+    def __init__(self, model=SearchTerm):
+        self.model = model
+        self.backends = {}
+
+    def backend(self, alias):
+        if alias not in self.backends:
+            self.backends[alias] = get_backend(alias, self.model)
+
+        return self.backends[alias]
+
+    def index(self, entries):
+        """Заменяет записи индекса для пар (пост, текст)."""
+        by_shard = {}
+        for post_id, text in entries:
+            by_shard.setdefault(sharding.db_for_post(post_id), []).append(
+                (post_id, text)
+            )
+        for alias, shard_entries in by_shard.items():
+            self.backend(alias).index(shard_entries)
+
+    def remove(self, post_ids):
+        """Убирает посты из индекса."""
+        for alias, ids in sharding.by_post_shard(post_ids).items():
+            self.backend(alias).remove(list(ids))
+
+    def clear(self):
+        for alias in settings.POST_SHARDS:
+            self.backend(alias).clear()
+
+    def filter(self, queryset, query_terms):
+        """Оставляет в запросе постов шарда только посты со всеми
+        словами.
+        """
+        return self.backend(queryset.db).filter(queryset, query_terms)
+
+    def search(self, query_terms, key=None, forward=True, limit=None):
+        """Пары (ранг, пост) для постов со всеми словами запроса."""
+        results = heapq.merge(
+            *(
+                self.backend(alias).search(query_terms, key, forward, limit)
+                for alias in settings.POST_SHARDS
+            ),
+            key=lambda result: (result[0], -result[1]),
+            reverse=not forward
+        )
+
+        return list(islice(results, limit))
+
+
+def index_backend():
+    """Бэкенд индекса всех постов: с шардами — ``ShardedBackend``."""
+    if sharding.enabled():
+        return ShardedBackend()
+
+    return get_backend()
+
+
+def index_post(post):
+    """Обновляет пост в индексе."""
+    index_backend().index([(post.pk, post.text)])
+
+
+def remove_post(post_id):
+    """Убирает пост из индекса."""
+    index_backend().remove([post_id])
+
+
+def rebuild():
+    """Полностью перестраивает индекс, возвращает число постов."""
+    count = 0
+    for alias in sharding.databases():
+        backend = get_backend(alias or DEFAULT_DB_ALIAS)
+        backend.clear()
+        posts = Post.objects.using(alias).order_by().values_list(
+            'pk', 'text'
+        )
+        backend.index(posts.iterator())
+        count += posts.count()
+
+    return count
+
+
+def _parse_score(value):
+    score = float(value)
+
+    return score if math.isfinite(score) else None
+
+
+class SearchPaginator:
+    """Курсорная пагинация результатов поиска по ключу (ранг, пост)."""
+
+    def __init__(self, query, per_page=NUMBER_OF_POSTS, backend=None):
+        self.query = query
+        self.terms = query_terms(query)
+        self.per_page = per_page
+        self.backend = backend or index_backend()
+
+    def cursor_page(self, cursor):
+        """Страница после/перед курсором; битый курсор — первая страница."""
+        if not self.terms:
+            return CursorPage([], self, None, None)
+        decoded = decode_cursor(cursor, _parse_score) if cursor else None
+        key = None
+        forward = True
+        if decoded is not None:
+            direction, score, pk = decoded
+            forward = direction == 'next'
+            key = (score, pk)
+        results = self.backend.search(
+            self.terms, key, forward, self.per_page + 1
+        )
+        has_more = len(results) > self.per_page
+        results = results[:self.per_page]
+        if not forward:
+            results.reverse()
+        posts = {}
+        for alias, ids in sharding.by_post_shard(
+            [post_id for score, post_id in results]
+        ).items():
+            posts.update(
+                Post.objects.using(alias).for_listing().in_bulk(ids)
+            )
+        objects = []
+        for score, post_id in results:
+            if post_id in posts:
+                posts[post_id].search_score = score
+                objects.append(posts[post_id])
+        has_next = has_more if forward else decoded is not None
+        has_previous = decoded is not None if forward else has_more
+        next_cursor = previous_cursor = None
+        if results and has_next:
+            next_cursor = encode_cursor('next', *results[-1])
+        if results and has_previous:
+            previous_cursor = encode_cursor('prev', *results[0])
+
+        return CursorPage(objects, self, next_cursor, previous_cursor)
@@ -0,0 +1,309 @@
+"""Шардирование постов и комментариев по автору.
+
+С ``POST_SHARDS`` посты автора хранятся в шарде по хешу его id,
+комментарии — в шарде поста. Номер шарда зашит в первичный ключ поста
+(``pk % len(POST_SHARDS)``), поэтому пост и его комментарии по адресу
+находятся одним запросом к одному шарду, как и профиль автора.
+Ленты всех постов, групп и подписок читают каждый шард по индексу
+даты и сливают упорядоченные куски (``ShardedQuerySet``).
+
+Задачи миниатюр и поисковый индекс поста лежат в шарде поста,
+воркер миниатюр и поиск обходят все шарды. Отложенная запись
+комментариев пишет каждую пачку в шарды ее постов. Админка постов
+и комментариев показывает один шард (фильтр «шард»), задача
+модерации запоминает шард выбранных объектов.
+
+Пользователи, группы, подписки, счетчики и очередь модерации
+остаются в основной базе: внешние ключи из шарда на них
+не проверяются, а авторы и группы постов шарда подгружаются
+отдельным запросом к основной базе. Выгрузка и импорт с шардами
+не запускаются.
+
+Без ``POST_SHARDS`` все хранится в основной базе, как раньше.
+"""
+import heapq
+import zlib
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import prefetch_related_objects
+
+from .models import Comment, Post, SearchTerm, ThumbnailJob, User
+
+# Модели, строки которых лежат в шарде поста.
+SHARDED_MODELS = (Post, Comment, SearchTerm, ThumbnailJob)
+
+
+def enabled():
+    return bool(settings.POST_SHARDS)
+
+
+def is_shard(alias):
+    return alias in settings.POST_SHARDS
+
+
+def databases():
+    """Базы с постами: шарды или None (основная база, ее выберет
+    роутер) без шардирования.
+    """
+    return list(settings.POST_SHARDS) or [None]
+
+
+def db_for_author(author_id):
+    """Шард постов автора или None без шардирования."""
+    if not enabled():
+        return None
+    shards = settings.POST_SHARDS
+
+    return shards[zlib.crc32(str(author_id).encode()) % len(shards)]
+
+
+def db_for_post(post_id):
+    """Шард поста по его первичному ключу или None без шардирования."""
+    if not enabled():
+        return None
+    shards = settings.POST_SHARDS
+
+    return shards[int(post_id) % len(shards)]
+
+
+def by_post_shard(post_ids):
+    """Ключи постов по шардам: ``{шард: {ключи}}``, без шардирования
+    все ключи под None.
+    """
+    by_shard = {}
+    for post_id in post_ids:
+        by_shard.setdefault(db_for_post(post_id), set()).add(post_id)
+
+    return by_shard
+
+
+def next_post_id(alias):
+    """Первичный ключ нового поста шарда ``alias``.
+
+    Ключ берется из счетчика AUTOINCREMENT таблицы постов шарда
+    (``sqlite_sequence``): он больше всех когда-либо выданных ключей,
+    в том числе удаленных постов, и дает номер шарда в остатке
+    от деления на число шардов. Счетчик сдвигается одним UPDATE
+    в транзакции записи, поэтому параллельные посты одного шарда
+    получают разные ключи.
+    """
+    shards = settings.POST_SHARDS
+    count, index = len(shards), shards.index(alias)
+    table = Post._meta.db_table
+    with transaction.atomic(using=alias), \
+            connections[alias].cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO sqlite_sequence (name, seq) SELECT %s, 0 '
+            'WHERE NOT EXISTS '
+            '(SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+            [table, table]
+        )
+        cursor.execute(
+            'UPDATE sqlite_sequence SET seq = seq - seq %% %s + %s + '
+            'CASE WHEN seq %% %s < %s THEN 0 ELSE %s END WHERE name = %s',
+            [count, index, count, index, count, table]
+        )
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', [table]
+        )
+
+        return cursor.fetchone()[0]
+
+
+def for_post(post_id):
+    """Посты шарда, в котором лежит пост ``post_id``."""
+    return Post.objects.using(db_for_post(post_id))
+
+
+def with_related(queryset, *fields):
+    """``select_related`` для основной базы, ``prefetch_related`` для
+    шарда: связанные пользователи и группы лежат в основной базе.
+    """
+    if is_shard(queryset.db):
+        return queryset.prefetch_related(*fields)
+
+    return queryset.select_related(*fields)
+
+
+def author_username(post_id):
+    """Имя автора поста или None, если поста нет."""
+    posts = for_post(post_id).filter(pk=post_id)
+    if not enabled():
+        return posts.values_list('author__username', flat=True).first()
+    author_id = posts.values_list('author_id', flat=True).first()
+
+    return User.objects.filter(pk=author_id).values_list(
+        'username', flat=True
+    ).first()
+
+
+def posts(**filters):
+    """Посты с фильтром ``filters`` из всех шардов."""
+    if not enabled():
+        return Post.objects.filter(**filters)
+
+    return ShardedQuerySet([
+        Post.objects.using(alias).filter(**filters)
+        for alias in settings.POST_SHARDS
+    ])
+
+
+def distinct(model, field, **filters):
+    """Различные значения ``field`` постов или комментариев ``model``
+    с фильтром ``filters`` из всех шардов.
+    """
+    values = set()
+    for alias in databases():
+        values.update(model.objects.using(alias).filter(
+            **filters
+        ).order_by().values_list(field, flat=True).distinct())
+
+    return values
+
+
+def posts_by_authors(author_ids):
+    """Посты авторов ``author_ids``: каждый шард читается только
+    по своим авторам, шарды без них не читаются.
+    """
+    if not enabled():
+        return Post.objects.filter(author_id__in=author_ids)
+    by_shard = {}
+    for author_id in author_ids:
+        by_shard.setdefault(db_for_author(author_id), []).append(author_id)
+
+    return ShardedQuerySet([
+        Post.objects.using(alias).filter(author_id__in=ids)
+        for alias, ids in by_shard.items()
+    ])
+
+
+class ShardedQuerySet:
+    """Один запрос к нескольким шардам.
+
+    Фильтры, сортировка и аннотации применяются к запросу каждого шарда.
+    Срез ``[start:stop]`` читает из каждого шарда первые ``stop``
+    объектов в порядке ``order_by`` и сливает их (k-way merge), поэтому
+    с курсорной пагинацией каждый шард отдает не больше страницы.
+    ``prefetch_related`` выполняется один раз для итоговой страницы.
+    """
+
+    CHAINED = (
+        'annotate',
+        'defer',
+        'exclude',
+        'filter',
+        'for_listing',
+        'only',
+        'order_by',
+        'prefetch_related',
+        'select_related',
+    )
+
+    def __init__(self, querysets):
+        self.querysets = querysets
+
+    def __getattr__(self, name):
+        if name not in self.CHAINED:
+            raise AttributeError(name)
+
+        def chained(*args, **kwargs):
+            return ShardedQuerySet([
+                getattr(queryset, name)(*args, **kwargs)
+                for queryset in self.querysets
+            ])
+
+        return chained
+
+    def __repr__(self):
+        return f'<ShardedQuerySet {self.querysets!r}>'
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def _merge(self, stop):
+        if not self.querysets:
+            return []
+        first = self.querysets[0]
+        ordering = first.query.order_by or first.model._meta.ordering
+        fields = [field.lstrip('-') for field in ordering]
+        lookups = first._prefetch_related_lookups
+        objects = list(islice(
+            heapq.merge(
+                *(
+                    queryset.prefetch_related(None)[:stop]
+                    for queryset in self.querysets
+                ),
+                key=lambda obj: [getattr(obj, field) for field in fields],
+                reverse=ordering[0].startswith('-')
+            ),
+            stop
+        ))
+        prefetch_related_objects(objects, *lookups)
+
+        return objects
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._merge(index.stop)[index.start:index.stop]
+
+        return self._merge(index + 1)[index]
+
+    def __iter__(self):
+        return iter(self._merge(None))
+
+
+class ShardRouter:
+    """Направляет посты, комментарии, задачи миниатюр и поисковый
+    индекс в шард автора поста.
+
+    Шард определяется по объекту из подсказки ``instance``: посту,
+    строке поста или автору (``author.posts``). Запросы без подсказки
+    и остальные модели решает следующий роутер.
+    """
+
+    def _shard(self, model, instance):
+        if not enabled() or instance is None:
+            return None
+        if model not in SHARDED_MODELS:
+            return None
+        if is_shard(instance._state.db):
+            return instance._state.db
+        if isinstance(instance, Post) and instance.author_id is not None:
+            return db_for_author(instance.author_id)
+        if isinstance(instance, SHARDED_MODELS[1:]) and (
+            instance.post_id is not None
+        ):
+            return db_for_post(instance.post_id)
+        if model is Post and isinstance(instance, User):
+            return db_for_author(instance.pk)
+
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Связи шарда с основной базой разрешены, между шардами — нет."""
+        shards = {
+            obj._state.db for obj in (obj1, obj2) if is_shard(obj._state.db)
+        }
+        if not shards:
+            return None
+
+        return len(shards) == 1
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик ``connection_created``: в шардах не проверяются
+    внешние ключи на пользователей и группы основной базы.
+    """
+    if connection.vendor == 'sqlite' and is_shard(connection.alias):
+        connection.disable_constraint_checking()
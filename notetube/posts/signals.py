@@ -0,0 +1,163 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import feed, search, sharding, stats, thumbnails, versions
+from .models import Comment, Follow, Group, Post, User
+
+# Поля, которые показываются на страницах.
+GROUP_FIELDS = ('slug', 'title', 'description')
+USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, using=None, **kwargs):
+    """Запоминает группу, картинку и текст редактируемого поста
+    до изменения. Новому посту шарда выдает первичный ключ.
+    """
+    instance._previous_group_slug = instance._previous_image = None
+    instance._previous_text = None
+    if instance.pk is not None and not raw:
+        previous = Post.objects.using(using).filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image', 'text').first()
+        if previous is not None:
+            (
+                group_id,
+                instance._previous_image,
+                instance._previous_text
+            ) = previous
+            if group_id is not None and group_id != instance.group_id:
+                instance._previous_group_slug = Group.objects.filter(
+                    pk=group_id
+                ).values_list('slug', flat=True).first()
+    if instance.pk is None and sharding.is_shard(using):
+        instance.pk = sharding.next_post_id(using)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, using=None,
+               **kwargs):
+    """Раскладывает новый пост по лентам подписчиков, обновляет
+    счетчик постов автора, поисковый индекс, очередь миниатюр
+    и версии кеша. Индекс и задача миниатюр пишутся в базу поста.
+    """
+    if raw:
+        return
+    if created:
+        feed.fan_out(instance)
+        stats.change(instance.author_id, posts_count=1)
+    if instance.text != getattr(instance, '_previous_text', None):
+        search.index_post(instance)
+    if instance.image.name != getattr(instance, '_previous_image', None):
+        thumbnails.enqueue(instance)
+    previous = getattr(instance, '_previous_group_slug', None)
+    versions.bump(*versions.post_scopes(
+        instance, *([previous] if previous else [])
+    ))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчик постов автора и убирает пост из поиска."""
+    stats.change(instance.author_id, posts_count=-1)
+    search.remove_post(instance.pk)
+    versions.bump(*versions.post_scopes(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    """Заполняет ленту постами автора после подписки
+    и обновляет счетчики подписок.
+    """
+    if created and not raw:
+        stats.change(instance.author_id, followers_count=1)
+        stats.change(instance.user_id, following_count=1)
+        feed.backfill(instance.user_id, instance.author_id)
+        versions.bump(*versions.follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Чистит ленту после отписки и обновляет счетчики подписок."""
+    stats.change(instance.author_id, followers_count=-1)
+    stats.change(instance.user_id, following_count=-1)
+    feed.clean(instance.user_id, instance.author_id)
+    versions.bump(*versions.follow_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    """Увеличивает счетчик комментариев автора."""
+    if created and not raw:
+        stats.change(instance.author_id, comments_count=1)
+        versions.bump(*versions.comment_scopes(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчик комментариев автора."""
+    stats.change(instance.author_id, comments_count=-1)
+    versions.bump(*versions.comment_scopes(instance))
+
+
+def _previous(instance, fields, update_fields):
+    """Значения полей ``fields`` объекта до сохранения или None,
+    если объект новый или эти поля не сохраняются.
+    """
+    if instance.pk is None or (
+        update_fields is not None and not set(fields) & set(update_fields)
+    ):
+        return None
+
+    return type(instance).objects.filter(pk=instance.pk).values_list(
+        *fields
+    ).first()
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, raw=False, update_fields=None,
+                 **kwargs):
+    """Запоминает адрес, название и описание группы до изменения."""
+    instance._previous_fields = None if raw else _previous(
+        instance, GROUP_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    """Обновляет версии страниц новой или измененной группы."""
+    if raw:
+        return
+    if created:
+        versions.bump(versions.group_scope(instance.slug))
+        return
+    previous = instance._previous_fields
+    if previous is not None and previous != tuple(
+        getattr(instance, field) for field in GROUP_FIELDS
+    ):
+        versions.bump(*versions.group_scopes(instance, previous[0]))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Запоминает имя пользователя до изменения."""
+    instance._previous_fields = None if raw else _previous(
+        instance, USER_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    """Обновляет версии страниц нового пользователя или страниц
+    с его измененным именем.
+    """
+    if raw:
+        return
+    if created:
+        versions.bump(versions.author_scope(instance.username))
+        return
+    previous = instance._previous_fields
+    if previous is not None and previous != tuple(
+        getattr(instance, field) for field in USER_FIELDS
+    ):
+        versions.bump(*versions.user_scopes(instance, previous[0]))
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .constants import STATS_BATCH_SIZE
+from .models import Comment, Follow, Post, User, UserStats
+from . import sharding
+
+
+def _count(model, field):
+    """Подзапрос количества строк ``model`` пользователя по полю ``field``."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def rebuild(user_ids=None):
+    """Пересчитывает счетчики пользователей по данным таблиц."""
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    users = users.order_by('pk').annotate(
+        posts_total=_count(Post, 'author'),
+        followers_total=_count(Follow, 'author'),
+        following_total=_count(Follow, 'user'),
+        comments_total=_count(Comment, 'author'),
+    ).values_list(
+        'pk',
+        'posts_total',
+        'followers_total',
+        'following_total',
+        'comments_total'
+    )
+    batch = []
+    for row in users.iterator():
+        batch.append(UserStats(
+            user_id=row[0],
+            posts_count=row[1],
+            followers_count=row[2],
+            following_count=row[3],
+            comments_count=row[4],
+        ))
+        if len(batch) >= STATS_BATCH_SIZE:
+            _replace(batch)
+            batch = []
+    if batch:
+        _replace(batch)
+
+
+def _add_shard_counts(batch):
+    """Добавляет к счетчикам посты и комментарии из шардов."""
+    by_user = {stats.user_id: stats for stats in batch}
+    for alias in settings.POST_SHARDS:
+        for model, field in (
+            (Post, 'posts_count'), (Comment, 'comments_count')
+        ):
+            totals = model.objects.using(alias).filter(
+                author_id__in=by_user
+            ).order_by().values('author').annotate(
+                total=Count('pk')
+            ).values_list('author', 'total')
+            for user_id, total in totals:
+                stats = by_user[user_id]
+                setattr(stats, field, getattr(stats, field) + total)
+
+
+def _replace(batch):
+    if sharding.enabled():
+        _add_shard_counts(batch)
+    with transaction.atomic():
+        UserStats.objects.filter(
+            pk__in=[stats.user_id for stats in batch]
+        ).delete()
+        UserStats.objects.bulk_create(batch)
+
+
+def change(user_id, **deltas):
+    """Изменяет счетчики пользователя на ``deltas``.
+
+    Отсутствующая строка счетчиков при увеличении пересчитывается
+    целиком, при уменьшении (например, каскадное удаление
+    пользователя) — пропускается.
+    """
+    with transaction.atomic():
+        updated = UserStats.objects.filter(user_id=user_id).update(**{
+            field: Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items()
+        })
+        if not updated and all(delta > 0 for delta in deltas.values()):
+            rebuild([user_id])
+
+
+def user_stats(user):
+    """Счетчики пользователя, при отсутствии — пересчитанные."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild([user.pk])
+
+        # Только что записанная строка может еще не дойти до реплики.
+        return UserStats.objects.using(DEFAULT_DB_ALIAS).get(user=user)
@@ -0,0 +1,57 @@
+from django import template
+
+from ..constants import (
+    RESPONSIVE_CARD_SIZES,
+    RESPONSIVE_DETAIL_SIZES,
+    RESPONSIVE_FORMATS,
+    RESPONSIVE_WIDTHS,
+)
+from ..thumbnails import backend
+
+register = template.Library()
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+@register.inclusion_tag('posts/includes/responsive_image.html')
+def responsive_image(image, detail=False):
+    """Картинка поста с ``srcset`` из готовых миниатюр всех ширин.
+
+    Браузер выбирает ширину по ``sizes`` и плотности экрана, WebP
+    отдается в ``<source>``, JPEG — в ``<img>`` как запасной вариант.
+    Картинка страницы поста (``detail``) грузится сразу, карточки
+    лент — лениво. Пока миниатюр нет, выводится заглушка.
+    """
+    sources = []
+    for image_format in RESPONSIVE_FORMATS:
+        candidates = []
+        for width in RESPONSIVE_WIDTHS:
+            thumbnail = backend.get_ready_thumbnail(
+                image,
+                f'{width}x{width // 2}',
+                crop='center',
+                upscale=True,
+                format=image_format
+            )
+            if thumbnail:
+                candidates.append((width, thumbnail))
+        if candidates:
+            sources.append({
+                'type': MIME_TYPES[image_format],
+                'srcset': ', '.join(
+                    f'{thumbnail.url} {width}w'
+                    for width, thumbnail in candidates
+                ),
+                'fallback': candidates[-1][1],
+            })
+    fallback = sources.pop() if sources else None
+
+    return {
+        'image': image,
+        'sources': sources,
+        'fallback': fallback,
+        'sizes': RESPONSIVE_DETAIL_SIZES if detail else RESPONSIVE_CARD_SIZES,
+        'loading': 'eager' if detail else 'lazy',
+        'width': RESPONSIVE_WIDTHS[-1],
+        'height': RESPONSIVE_WIDTHS[-1] // 2,
+    }
@@ -0,0 +1,130 @@
+import datetime
+from http import HTTPStatus
+from unittest import mock
+
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..admin import (
+    CommentAdmin,
+    DateHierarchyQuerySet,
+    FollowAdmin,
+    PostAdmin,
+)
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import EstimatedCountPaginator
+
+
+class AdminChangelistTests(TestCase):
+    """Тестирует списки объектов в админке."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.users = [
+            User.objects.create_user(username=f'user{index}')
+            for index in range(5)
+        ]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {index}',
+                slug=f'group-{index}',
+                description='Описание'
+            )
+            for index in range(3)
+        ]
+        Post.objects.bulk_create(
+            Post(
+                text=f'Пост {index}',
+                author=cls.users[index % 5],
+                group=cls.groups[index % 3]
+            )
+            for index in range(30)
+        )
+        Comment.objects.bulk_create(
+            Comment(text='Комментарий', post=post, author=cls.users[0])
+            for post in Post.objects.all()
+        )
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author)
+            for user in cls.users for author in cls.users if user != author
+        )
+
+    def setUp(self):
+        self.client.force_login(AdminChangelistTests.admin)
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        return len(queries)
+
+    def test_changelists_query_count(self):
+        """Число запросов списка не зависит от числа строк на странице."""
+        for admin_class, model in (
+            (PostAdmin, 'post'),
+            (CommentAdmin, 'comment'),
+            (FollowAdmin, 'follow'),
+        ):
+            with self.subTest(model=model):
+                url = reverse(f'admin:posts_{model}_changelist')
+                self.count_queries(url)
+                with mock.patch.object(admin_class, 'list_per_page', 2):
+                    few = self.count_queries(url)
+                with mock.patch.object(admin_class, 'list_per_page', 20):
+                    many = self.count_queries(url)
+                self.assertEqual(few, many)
+
+    def test_editable_group_is_raw_id(self):
+        """Редактируемая группа — поле ключа, а не список всех групп."""
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertNotContains(response, '<select name="form-0-group"')
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+        self.assertContains(response, AdminChangelistTests.groups[0].title)
+
+    def test_date_hierarchy(self):
+        """Иерархия дат показывает только периоды с постами."""
+        Post.objects.filter(pk__in=Post.objects.values('pk')[:5]).update(
+            pub_date=timezone.make_aware(datetime.datetime(2020, 3, 15))
+        )
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, '?pub_date__year=2020')
+        self.assertNotContains(response, '?pub_date__year=2021')
+        queryset = response.context['cl'].queryset
+        self.assertIsInstance(queryset, DateHierarchyQuerySet)
+        self.assertEqual(
+            list(queryset.filter(pub_date__year=2020).dates(
+                'pub_date', 'day'
+            )),
+            [datetime.date(2020, 3, 15)]
+        )
+        self.assertEqual(
+            queryset.dates('pub_date', 'year', order='DESC')[-1],
+            datetime.date(2020, 1, 1)
+        )
+
+    def test_model_dates_is_queryset(self):
+        """``Post.objects.dates()`` остается обычным QuerySet."""
+        dates = Post.objects.dates('pub_date', 'year')
+        self.assertIsInstance(dates, QuerySet)
+        self.assertEqual(dates.count(), 1)
+        self.assertEqual(dates.using('default').count(), 1)
+
+    def test_estimated_count(self):
+        """Без фильтров количество берется из статистики таблицы."""
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        with mock.patch('posts.utils.estimate_count', return_value=10 ** 6):
+            self.assertEqual(paginator.count, 10 ** 6)
+        filtered = EstimatedCountPaginator(
+            Post.objects.filter(group=AdminChangelistTests.groups[0]), 10
+        )
+        with mock.patch('posts.utils.estimate_count', return_value=10 ** 6):
+            self.assertEqual(filtered.count, 10)
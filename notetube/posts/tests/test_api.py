@@ -0,0 +1,115 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..constants import API_PAGE_SIZE
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    """Тестирует JSON API лент и постов."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {index}', author=self.author, group=self.group
+            )
+            for index in range(API_PAGE_SIZE + 1)
+        ]
+        self.post = self.posts[-1]
+        Comment.objects.create(
+            text='Ответ', post=self.post, author=self.reader
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_feeds(self):
+        """Ленты отдают страницу постов и курсор следующей."""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.author.username]),
+            reverse('posts:api_follow'),
+        )
+        self.client.force_login(self.reader)
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), API_PAGE_SIZE)
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.pk,
+                    'text': self.post.text,
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': 'author',
+                    'group': 'group',
+                    'image': None,
+                    'comment_count': 1,
+                })
+                self.assertIsNone(data['previous'])
+                data = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [self.posts[0].pk]
+                )
+
+    def test_post_detail(self):
+        """Пост отдается с комментариями."""
+        data = self.client.get(
+            reverse('posts:api_post', args=[self.post.pk])
+        ).json()
+        self.assertEqual(data['comment_count'], 1)
+        self.assertEqual(data['comments']['results'][0]['author'], 'reader')
+        self.assertIsNone(data['comments']['next'])
+
+    def test_not_found(self):
+        """Несуществующие объекты и анонимная лента подписок — JSON-ошибки."""
+        urls = (
+            (reverse('posts:api_post', args=[0]), 404),
+            (reverse('posts:api_group', args=['missing']), 404),
+            (reverse('posts:api_profile', args=['missing']), 404),
+            (reverse('posts:api_follow'), 401),
+        )
+        for url, status in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_not_modified_without_database(self):
+        """Неизменившаяся страница — 304 без запросов к базе;
+        новый комментарий меняет ETag.
+        """
+        url = reverse('posts:api_post', args=[self.post.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(text='Еще', post=self.post, author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_follow_etag_follows_authors(self):
+        """ETag ленты подписок меняется с постами авторов и подписками."""
+        self.client.force_login(self.reader)
+        url = reverse('posts:api_follow')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        Post.objects.create(text='Новый', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+        etag = response['ETag']
+        Follow.objects.all().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['results'], [])
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+from contextlib import closing
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+from ..stats import user_stats
+from .. import comment_queue
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    COMMENT_QUEUE_ENABLED=True,
+    COMMENT_QUEUE_PATH=os.path.join(TEMP_DIR, 'queue.sqlite3')
+)
+class CommentQueueTests(TestCase):
+    """Тестирует отложенную запись комментариев."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.addCleanup(self.remove_queue, settings.COMMENT_QUEUE_PATH)
+        self.client.force_login(self.reader)
+
+    def remove_queue(self, path):
+        for name in (path, path + '-wal', path + '-shm'):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def comment(self, text, post_id=None):
+        return self.client.post(
+            reverse('posts:add_comment', args=[post_id or self.post.pk]),
+            {'text': text}
+        )
+
+    def test_comment_is_queued(self):
+        """Комментарий попадает в журнал, а не в базу,
+        и сразу виден своему автору.
+        """
+        response = self.comment('Отложенный')
+        self.assertRedirects(
+            response, reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(comment_queue.metrics()['depth'], 1)
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertContains(self.client.get(url), 'Отложенный')
+        self.client.force_login(self.author)
+        self.assertNotContains(self.client.get(url), 'Отложенный')
+
+    def test_invalid_comment_not_queued(self):
+        """Пустой комментарий не попадает в журнал."""
+        self.comment('')
+        self.assertEqual(comment_queue.metrics()['depth'], 0)
+
+    def test_flush_in_batches(self):
+        """Воркер переносит журнал пачками, обновляет счетчики,
+        пропускает комментарии к несуществующим постам.
+        """
+        for index in range(5):
+            self.comment(f'Комментарий {index}')
+        self.comment('Потерянный', post_id=self.post.pk + 100)
+        created = comment_queue.pending(self.post.pk, self.reader.pk)[0]
+        self.assertEqual(comment_queue.flush(batch_size=2), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        call_command(
+            'comment_queue_worker', once=True, batch_size=2,
+            stdout=StringIO()
+        )
+        self.assertEqual(
+            list(Comment.objects.order_by('pk').values_list(
+                'text', flat=True
+            )),
+            [f'Комментарий {index}' for index in range(5)]
+        )
+        self.assertEqual(
+            Comment.objects.order_by('pk').first().created, created.created
+        )
+        self.assertEqual(user_stats(self.reader).comments_count, 5)
+        metrics = comment_queue.metrics()
+        self.assertEqual(metrics['depth'], 0)
+        self.assertEqual(metrics['flushed_total'], 5)
+        self.assertEqual(metrics['last_flush_rows'], 2)
+        self.assertIn('last_flush_seconds', metrics)
+
+    def test_deleted_author_skipped(self):
+        """Комментарий удаленного пользователя пропускается и не
+        задерживает остальные комментарии пачки.
+        """
+        other = User.objects.create_user(username='other')
+        comment_queue.enqueue(self.post.pk, other.pk, 'Удаленный')
+        self.comment('Обычный')
+        other.delete()
+        self.assertEqual(comment_queue.flush(), 2)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)), ['Обычный']
+        )
+        self.assertEqual(comment_queue.metrics()['depth'], 0)
+
+    def test_bad_row_moved_to_dead_letters(self):
+        """Строка, которую не удалось записать, переносится
+        в ``dead_comment``, остальные строки пачки записываются.
+        """
+        self.comment('Первый')
+        with closing(comment_queue.connect()) as connection:
+            connection.execute(
+                "INSERT INTO comment (post_id, author_id, text, created, "
+                "enqueued) VALUES (?, ?, 'Битый', 'не дата', 0)",
+                (self.post.pk, self.reader.pk)
+            )
+        self.comment('Последний')
+        with self.assertLogs('posts.comment_queue', 'ERROR'):
+            self.assertEqual(comment_queue.flush(), 3)
+        self.assertEqual(
+            list(Comment.objects.order_by('pk').values_list(
+                'text', flat=True
+            )),
+            ['Первый', 'Последний']
+        )
+        metrics = comment_queue.metrics()
+        self.assertEqual(
+            (metrics['depth'], metrics['dead'], metrics['flushed_total']),
+            (0, 1, 2)
+        )
+        with closing(comment_queue.connect()) as connection:
+            text, error = connection.execute(
+                'SELECT text, error FROM dead_comment'
+            ).fetchone()
+        self.assertEqual(text, 'Битый')
+        self.assertIn('NOT NULL', error)
+
+    def test_flushed_comment_shown_once(self):
+        """После переноса комментарий показывается один раз."""
+        self.comment('Единственный')
+        comment_queue.drain()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, 'Единственный', count=1)
+
+    @override_settings(COMMENT_QUEUE_ENABLED=False)
+    def test_disabled(self):
+        """Без отложенной записи комментарий пишется сразу."""
+        self.comment('Сразу')
+        self.assertTrue(Comment.objects.filter(text='Сразу').exists())
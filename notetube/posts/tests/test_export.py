@@ -0,0 +1,113 @@
+import csv
+import datetime
+import json
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExportTests(TestCase):
+    """Тестирует потоковую выгрузку данных."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author
+        )
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=timezone.make_aware(datetime.datetime(2020, 1, 1))
+        )
+        cls.post = Post.objects.create(
+            text='Пост, "в кавычках"', author=cls.author, group=cls.group
+        )
+        Post.objects.create(text='Чужой пост', author=cls.admin)
+        Comment.objects.create(text='Ответ', post=cls.post, author=cls.admin)
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def export(self, *args, **options):
+        stdout = StringIO()
+        call_command('export_data', *args, stdout=stdout, **options)
+
+        return stdout.getvalue()
+
+    def test_jsonl_filters(self):
+        """Выгрузка JSONL отбирает по автору, группе и датам."""
+        rows = [
+            json.loads(line)
+            for line in self.export('posts', author='author').splitlines()
+        ]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [ExportTests.old_post.pk, ExportTests.post.pk]
+        )
+        self.assertEqual(rows[1]['group__slug'], 'group')
+        self.assertEqual(rows[1]['text'], 'Пост, "в кавычках"')
+        self.assertEqual(
+            len(self.export('posts', group='group').splitlines()), 1
+        )
+        since = self.export(
+            'posts', since=datetime.date(2020, 1, 2), author='author'
+        )
+        self.assertEqual(json.loads(since)['id'], ExportTests.post.pk)
+        until = self.export('posts', until=datetime.date(2020, 1, 1))
+        self.assertEqual(json.loads(until)['id'], ExportTests.old_post.pk)
+
+    def test_csv(self):
+        """CSV начинается с заголовка и экранирует значения."""
+        output = self.export('comments', format='csv')
+        rows = list(csv.reader(StringIO(output)))
+        self.assertEqual(
+            rows[0], ['id', 'post_id', 'author__username', 'text', 'created']
+        )
+        self.assertEqual(rows[1][2:4], ['admin', 'Ответ'])
+        follows = self.export('follows', format='csv').splitlines()
+        self.assertEqual(follows[1].split(',')[1:], ['admin', 'author'])
+
+    def test_unsupported_filter(self):
+        """Фильтр, которого нет у выгрузки, — ошибка команды."""
+        with self.assertRaises(CommandError):
+            self.export('follows', group='group')
+
+    def test_admin_export_view(self):
+        """Страница выгрузки в админке отдает файл потоком."""
+        self.client.force_login(ExportTests.admin)
+        url = reverse('admin:posts_export')
+        self.assertContains(self.client.get(url), 'Выгрузить')
+        self.assertContains(
+            self.client.get(reverse('admin:posts_post_changelist')), url
+        )
+        response = self.client.get(
+            url, {'name': 'groups', 'format': 'jsonl', 'group': 'group'}
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(json.loads(content)['slug'], 'group')
+        response = self.client.get(
+            url, {'name': 'follows', 'format': 'csv', 'group': 'group'}
+        )
+        self.assertContains(response, 'нельзя отбирать')
+
+    def test_admin_export_action(self):
+        """Действие выгружает выбранные объекты."""
+        self.client.force_login(ExportTests.admin)
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'export_csv', '_selected_action': [ExportTests.post.pk]}
+        )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{ExportTests.post.pk},'))
@@ -1,11 +1,14 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.urls import reverse
 from django.conf import settings
 from django.test import TestCase, Client, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
+from ..constants import IMAGE_MAX_SIZE
 from ..models import Post, Group, User, Comment
 
 
@@ -176,3 +179,37 @@ class FormsTests(TestCase):
             data=form_data
         )
         self.assertEqual(Comment.objects.count(), comments_count)
+
+    def upload_jpeg(self, size, exif=None):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(
+            buffer, 'JPEG', **({'exif': exif} if exif else {})
+        )
+        uploaded = SimpleUploadedFile(
+            name='photo.jpg',
+            content=buffer.getvalue(),
+            content_type='image/jpeg'
+        )
+        self.auth_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с фото', 'image': uploaded}
+        )
+
+        return Post.objects.filter(text='Пост с фото').latest('pk')
+
+    def test_uploaded_image_normalized(self):
+        """Картинка уменьшается, перекодируется и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        post = self.upload_jpeg((IMAGE_MAX_SIZE * 2, IMAGE_MAX_SIZE), exif)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(max(image.size), IMAGE_MAX_SIZE)
+            self.assertIn(image.format, ('WEBP', 'JPEG'))
+            self.assertFalse(image.getexif())
+
+    def test_duplicate_image_stored_once(self):
+        """Повторная загрузка той же картинки не создает новый файл."""
+        first = self.upload_jpeg((64, 32))
+        second = self.upload_jpeg((64, 32))
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(first.image.name, second.image.name)
@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from ..models import Comment, FeedItem, Follow, Group, Post, User
+from ..search import SearchPaginator
+from ..stats import user_stats
+from .. import bulk_import
+
+
+class ImportTests(TestCase):
+    """Тестирует массовую загрузку данных."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def write(self, name, rows):
+        path = os.path.join(ImportTests.directory, f'{name}.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+        return f'{name}={path}'
+
+    def load(self, *args, **options):
+        stdout = StringIO()
+        call_command(
+            'import_data', *args, stdout=stdout, report_every=1, **options
+        )
+
+        return stdout.getvalue()
+
+    def test_export_round_trip(self):
+        """Выгрузка загружается обратно с ключами и датами;
+        ленты, счетчики и поиск перестраиваются.
+        """
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        post = Post.objects.create(
+            text='Загружаемые тексты', author=author, group=group
+        )
+        Comment.objects.create(text='Ответ', post=post, author=reader)
+        Follow.objects.create(user=reader, author=author)
+        dumps = {}
+        for name in ('groups', 'posts', 'comments', 'follows'):
+            output = StringIO()
+            call_command('export_data', name, stdout=output)
+            dumps[name] = [
+                json.loads(line) for line in output.getvalue().splitlines()
+            ]
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        group.delete()
+        self.assertFalse(FeedItem.objects.exists())
+
+        output = self.load(
+            *(self.write(name, rows) for name, rows in dumps.items()),
+            batch_size=1
+        )
+        self.assertIn('posts: 1 строк', output)
+        imported = Post.objects.get()
+        self.assertEqual(imported.pk, post.pk)
+        self.assertEqual(imported.pub_date, post.pub_date)
+        self.assertEqual(imported.group.description, 'Описание')
+        self.assertEqual(imported.comments.get().created,
+                         Comment.objects.get().created)
+        self.assertTrue(Follow.objects.filter(
+            user=reader, author=author
+        ).exists())
+        self.assertTrue(FeedItem.objects.filter(
+            user=reader, post=imported
+        ).exists())
+        self.assertEqual(user_stats(author).posts_count, 1)
+        self.assertEqual(user_stats(reader).comments_count, 1)
+        page = SearchPaginator('тексты', 10).cursor_page(None)
+        self.assertEqual([item.pk for item in page], [post.pk])
+
+    def test_missing_references(self):
+        """Недостающие авторы создаются, комментарии к несуществующим
+        постам пропускаются, повторные подписки не мешают.
+        """
+        output = self.load(
+            self.write('posts', [
+                {'text': 'Пост', 'author__username': 'new'},
+            ]),
+            self.write('comments', [
+                {'post_id': 999, 'author__username': 'new', 'text': 'Нет'},
+            ]),
+            self.write('follows', [
+                {'user__username': 'new', 'author__username': 'other'},
+                {'user__username': 'new', 'author__username': 'other'},
+                {'user__username': 'new', 'author__username': 'new'},
+            ]),
+        )
+        self.assertIn('Пропущено строк без связанных объектов: 1', output)
+        self.assertEqual(Post.objects.get().author.username, 'new')
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertFalse(
+            User.objects.get(username='new').has_usable_password()
+        )
+
+    def test_bad_source(self):
+        """Неизвестная таблица или отсутствующий файл — ошибка команды."""
+        for source in ('likes=file.jsonl', 'posts=missing.jsonl', 'posts'):
+            with self.subTest(source=source):
+                with self.assertRaises(CommandError):
+                    self.load(source)
+        with self.assertRaises(CommandError):
+            self.load()
+
+    def test_fake(self):
+        """Синтетические данные создаются в заданном объеме."""
+        output = self.load(
+            fake=True, users=20, groups=3, posts=50, comments=40,
+            follows_per_user=4, seed=1
+        )
+        self.assertIn('строк/с', output)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), 80)
+        self.assertTrue(FeedItem.objects.exists())
+
+    def test_follow_graphs(self):
+        """Форма графа подписок задается параметрами генератора."""
+        def followers(**options):
+            rows = bulk_import.fake_rows(
+                users=50, groups=0, posts=0, comments=0,
+                follows_per_user=3, seed=2, **options
+            )
+            usernames = [row['username'] for row in rows['users']]
+            counts = Counter(
+                row['author__username'] for row in rows['follows']
+            )
+
+            return [counts[username] for username in usernames]
+
+        celebrity = followers(graph='celebrity', celebrities=2)
+        self.assertEqual(celebrity[:2], [49, 49])
+        self.assertEqual(sum(celebrity), 50 * (3 + 2))
+        powerlaw = followers(graph='powerlaw')
+        uniform = followers(graph='uniform')
+        self.assertEqual(sum(powerlaw), sum(uniform))
+        self.assertGreater(sum(powerlaw[:5]), sum(uniform[:5]))
+
+
+class DeferredIndexesTests(TransactionTestCase):
+    """Индексы удаляются на время загрузки и создаются заново."""
+
+    def indexes(self):
+        with connection.cursor() as cursor:
+            return set(
+                connection.introspection.get_constraints(
+                    cursor, Post._meta.db_table
+                )
+            )
+
+    def test_defer_indexes(self):
+        before = self.indexes()
+        names = {index.name for index in Post._meta.indexes}
+        with bulk_import.deferred_indexes([Post]):
+            self.assertFalse(names & self.indexes())
+            bulk_import.Importer().load('posts', [
+                {'text': 'Пост', 'author__username': 'author'},
+            ])
+        self.assertEqual(self.indexes(), before)
+        self.assertEqual(Post.objects.count(), 1)
@@ -1,6 +1,12 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.utils import timezone
 
-from ..models import Post, Group, User, Comment
+from ..models import Post, Group, User, Comment, Follow, UserStats
 from ..constants import NUMBER_OF_CHAR
 
 
@@ -104,3 +110,86 @@ class ModelsTests(TestCase):
                         expected
                     )
                 )
+
+    def test_dates_default_to_now_and_keep_explicit(self):
+        """Дата поста и комментария по умолчанию — текущая,
+        явно переданная дата сохраняется.
+        """
+        date = timezone.make_aware(datetime.datetime(2020, 1, 1))
+        before = timezone.now()
+        post = Post.objects.create(author=ModelsTests.user, text='Новый')
+        self.assertGreaterEqual(post.pub_date, before)
+        Post.objects.bulk_create([
+            Post(author=ModelsTests.user, text='Старый', pub_date=date)
+        ])
+        Comment.objects.bulk_create([
+            Comment(
+                post=post, author=ModelsTests.user, text='Старый',
+                created=date
+            )
+        ])
+        self.assertEqual(Post.objects.get(text='Старый').pub_date, date)
+        self.assertEqual(Comment.objects.get(text='Старый').created, date)
+
+
+class UserStatsTests(TestCase):
+    """Тестирует счетчики пользователей."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.user2 = User.objects.create_user(username='auth2')
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются при создании и удалении
+        постов, подписок и комментариев.
+        """
+        post = Post.objects.create(author=UserStatsTests.user, text='Пост')
+        Comment.objects.create(
+            text='Комментарий', post=post, author=UserStatsTests.user2
+        )
+        Follow.objects.create(
+            user=UserStatsTests.user2, author=UserStatsTests.user
+        )
+        self.assertStats(
+            UserStatsTests.user, posts_count=1, followers_count=1
+        )
+        self.assertStats(
+            UserStatsTests.user2, following_count=1, comments_count=1
+        )
+        post.delete()
+        Follow.objects.all().delete()
+        self.assertStats(
+            UserStatsTests.user, posts_count=0, followers_count=0
+        )
+        self.assertStats(
+            UserStatsTests.user2, following_count=0, comments_count=0
+        )
+
+    def test_rebuild_stats_command(self):
+        """Команда rebuild_stats восстанавливает счетчики."""
+        Post.objects.bulk_create([
+            Post(author=UserStatsTests.user, text='Пост') for _ in range(3)
+        ])
+        UserStats.objects.all().delete()
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertStats(UserStatsTests.user, posts_count=3)
+        self.assertStats(UserStatsTests.user2, posts_count=0)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на автора запрещена на уровне БД."""
+        Follow.objects.create(
+            user=UserStatsTests.user2, author=UserStatsTests.user
+        )
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Follow.objects.create(
+                    user=UserStatsTests.user2, author=UserStatsTests.user
+                )
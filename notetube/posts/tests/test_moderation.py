@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, ModerationJob, Post, User
+from ..stats import user_stats
+from .. import moderation
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ModerationTests(TestCase):
+    """Тестирует фоновую массовую модерацию."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.image = default_storage.save(
+            'posts/shared.gif', ContentFile(SMALL_GIF)
+        )
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {index}', author=self.author, image=self.image
+            )
+            for index in range(5)
+        ]
+        for post in self.posts:
+            Comment.objects.create(text='Ответ', post=post, author=self.admin)
+        self.client.force_login(self.admin)
+
+    def run_action(self, url, action, objects, **data):
+        response = self.client.post(url, {
+            'action': action,
+            '_selected_action': [obj.pk for obj in objects],
+            **data
+        })
+        self.assertEqual(response.status_code, 302)
+
+        return ModerationJob.objects.latest('pk')
+
+    def work(self, batch_size=2):
+        call_command(
+            'moderation_worker', once=True, batch_size=batch_size,
+            stdout=StringIO()
+        )
+
+    def test_delete_action_is_deferred(self):
+        """Удаление ставится в очередь и выполняется воркером пачками;
+        общий файл картинки удаляется вместе с последним постом.
+        """
+        url = reverse('admin:posts_post_changelist')
+        job = self.run_action(url, 'delete_posts', self.posts[:3])
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual((job.total, job.status), (3, ModerationJob.PENDING))
+        self.work()
+        job.refresh_from_db()
+        self.assertEqual((job.processed, job.status), (3, ModerationJob.DONE))
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(user_stats(self.author).posts_count, 2)
+        self.assertTrue(default_storage.exists(self.image))
+        self.run_action(url, 'delete_posts', self.posts[3:])
+        self.work()
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(default_storage.exists(self.image))
+
+    def test_default_delete_action_removed(self):
+        """Стандартное удаление в запросе недоступно."""
+        for model in ('post', 'comment'):
+            with self.subTest(model=model):
+                response = self.client.get(
+                    reverse(f'admin:posts_{model}_changelist')
+                )
+                self.assertNotContains(response, 'value="delete_selected"')
+
+    def test_move_posts(self):
+        """Посты переносятся в группу из формы действия."""
+        job = self.run_action(
+            reverse('admin:posts_post_changelist'), 'move_posts', self.posts,
+            group=self.group.pk
+        )
+        self.assertEqual(job.group, self.group)
+        self.work()
+        self.assertEqual(self.group.posts.count(), 5)
+
+    def test_move_posts_without_group(self):
+        """Без группы или с неверным ключом перенос не ставится
+        в очередь.
+        """
+        url = reverse('admin:posts_post_changelist')
+        for group in ('', '0'):
+            with self.subTest(group=group):
+                self.client.post(url, {
+                    'action': 'move_posts',
+                    '_selected_action': [post.pk for post in self.posts],
+                    'group': group,
+                })
+                self.assertFalse(ModerationJob.objects.exists())
+        response = self.client.post(url, {
+            'action': 'move_posts',
+            '_selected_action': [post.pk for post in self.posts],
+        }, follow=True)
+        self.assertContains(response, 'Укажите группу для переноса.')
+
+    def test_purge_images(self):
+        """Картинки убираются у постов, файл удаляется."""
+        self.run_action(
+            reverse('admin:posts_post_changelist'), 'purge_images', self.posts
+        )
+        self.work()
+        self.assertFalse(Post.objects.exclude(image='').exists())
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_MEDIA_ROOT, self.image))
+        )
+
+    def test_delete_comments(self):
+        """Комментарии удаляются в фоне, счетчики обновляются."""
+        comments = Comment.objects.all()[:4]
+        self.run_action(
+            reverse('admin:posts_comment_changelist'), 'delete_comments',
+            comments
+        )
+        self.work(batch_size=3)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(user_stats(self.admin).comments_count, 1)
+
+    def test_progress_and_resume(self):
+        """Задача выполняется по пачкам и продолжается с места остановки."""
+        job = moderation.enqueue(
+            ModerationJob.DELETE_POSTS, Post.objects.all()
+        )
+        self.assertEqual(job.items.count(), 5)
+        self.assertEqual(moderation.process_batch(job, 2), 2)
+        job = moderation.next_job()
+        self.assertEqual(
+            (job.status, job.processed, job.progress),
+            (ModerationJob.PROCESSING, 2, 40)
+        )
+        self.assertEqual(
+            list(job.items.values_list('object_id', flat=True)),
+            [post.pk for post in self.posts[2:]]
+        )
+        reports = []
+        moderation.run(job, 2, lambda job: reports.append(job.progress))
+        self.assertEqual(reports, [80, 100])
+        self.assertFalse(job.items.exists())
+        self.assertIsNone(moderation.next_job())
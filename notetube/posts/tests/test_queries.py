@@ -0,0 +1,160 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetExceeded, query_budget
+from ..constants import NUMBER_OF_POSTS, SEARCH_PARAM
+from ..models import Comment, Follow, Group, Post, User
+from .. import urls
+
+# Бюджет запросов на страницу при холодном кеше. Он один для страницы
+# из одного поста и для полной страницы: число запросов не должно
+# расти с числом постов и комментариев.
+BUDGETS = {
+    'index': 1,
+    'search': 3,
+    'group_list': 2,
+    'profile': 6,
+    'post_detail': 4,
+    'post_create': 15,
+    'post_edit': 12,
+    'add_comment': 12,
+    'follow_index': 4,
+    'profile_follow': 24,
+    'profile_unfollow': 16,
+    'api_index': 1,
+    'api_post': 2,
+    'api_group': 2,
+    'api_profile': 2,
+    'api_follow': 5,
+    'comments': 2,
+    'api_comments': 2,
+}
+
+
+class QueryBudgetTests(TestCase):
+    """Проверяет бюджеты SQL-запросов страниц приложения posts."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.newcomer = User.objects.create_user(username='newcomer')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.add_posts(1)
+
+    def add_posts(self, count):
+        for index in range(count):
+            post = Post.objects.create(
+                text=f'Пост {index}', author=self.author, group=self.group
+            )
+            Comment.objects.create(text='Ответ', post=post, author=self.reader)
+        for index in range(count):
+            Comment.objects.create(text='Еще', post=post, author=self.author)
+        self.post = post
+
+    def requests(self):
+        """Для каждой страницы: метод, адрес, данные и пользователь."""
+        author = {'username': self.author.username}
+        post = {'post_id': self.post.pk}
+        return {
+            'index': ('get', reverse('posts:index'), None, None),
+            'search': (
+                'get', reverse('posts:search'), {SEARCH_PARAM: 'пост'}, None
+            ),
+            'group_list': (
+                'get',
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                None,
+                None
+            ),
+            'profile': (
+                'get', reverse('posts:profile', kwargs=author), None,
+                self.reader
+            ),
+            'post_detail': (
+                'get', reverse('posts:post_detail', kwargs=post), None,
+                self.reader
+            ),
+            'post_create': (
+                'post', reverse('posts:post_create'), {'text': 'Новый'},
+                self.author
+            ),
+            'post_edit': (
+                'post', reverse('posts:post_edit', kwargs=post),
+                {'text': 'Исправленный', 'group': self.group.pk}, self.author
+            ),
+            'add_comment': (
+                'post', reverse('posts:add_comment', kwargs=post),
+                {'text': 'Еще ответ'}, self.reader
+            ),
+            'follow_index': (
+                'get', reverse('posts:follow_index'), None, self.reader
+            ),
+            'profile_follow': (
+                'get', reverse('posts:profile_follow', kwargs=author), None,
+                self.newcomer
+            ),
+            'profile_unfollow': (
+                'get', reverse('posts:profile_unfollow', kwargs=author),
+                None, self.reader
+            ),
+            'api_index': ('get', reverse('posts:api_index'), None, None),
+            'api_post': (
+                'get', reverse('posts:api_post', kwargs=post), None, None
+            ),
+            'api_group': (
+                'get',
+                reverse('posts:api_group', kwargs={'slug': self.group.slug}),
+                None,
+                None
+            ),
+            'api_profile': (
+                'get', reverse('posts:api_profile', kwargs=author), None,
+                None
+            ),
+            'api_follow': (
+                'get', reverse('posts:api_follow'), None, self.reader
+            ),
+            'comments': (
+                'get', reverse('posts:comments', kwargs=post), None, None
+            ),
+            'api_comments': (
+                'get', reverse('posts:api_comments', kwargs=post), None, None
+            ),
+        }
+
+    def check_budgets(self):
+        for name, (method, url, data, user) in self.requests().items():
+            with self.subTest(view=name):
+                if user is None:
+                    self.client.logout()
+                else:
+                    self.client.force_login(user)
+                cache.clear()
+                with query_budget(BUDGETS[name], label=name):
+                    response = getattr(self.client, method)(url, data)
+                self.assertLess(response.status_code, 400)
+
+    def test_every_url_has_budget(self):
+        """У каждого адреса posts.urls есть бюджет."""
+        self.assertEqual(
+            {pattern.name for pattern in urls.urlpatterns}, set(BUDGETS)
+        )
+
+    def test_single_post(self):
+        """Страницы с одним постом укладываются в бюджет."""
+        self.check_budgets()
+
+    def test_full_page(self):
+        """Полные страницы укладываются в тот же бюджет."""
+        self.add_posts(NUMBER_OF_POSTS)
+        self.check_budgets()
+
+    def test_failure_lists_queries(self):
+        """Превышение бюджета показывает выполненный SQL."""
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'posts_post'):
+            with query_budget(0, label='test'):
+                Post.objects.count()
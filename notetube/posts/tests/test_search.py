@@ -0,0 +1,143 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, SearchTerm, User
+from .. import search
+
+
+class StemTests(TestCase):
+    """Тестирует стеммер."""
+
+    def test_word_forms_share_stem(self):
+        """Формы одного слова приводятся к одной основе."""
+        forms = (
+            ('котик', 'котики', 'котиков', 'котикам'),
+            ('красивый', 'красивая', 'красивые', 'красивого'),
+            ('читать', 'читала', 'читаю', 'читают'),
+            ('ёлка', 'елки', 'Ёлкой'),
+        )
+        for words in forms:
+            with self.subTest(words=words):
+                stems = {search.stem(word) for word in words}
+                self.assertEqual(len(stems), 1)
+
+    def test_terms(self):
+        """Латиница и числа не стеммируются, знаки препинания убираются."""
+        self.assertEqual(
+            search.terms('Django_2, котики!'),
+            ['django', '2', search.stem('котики')]
+        )
+
+
+class SearchTests(TestCase):
+    """Тестирует поиск постов."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.cats = Post.objects.create(
+            text='Котики любят спать на солнце', author=self.user
+        )
+        self.many_cats = Post.objects.create(
+            text='Котик, котики и еще раз котиков', author=self.user
+        )
+        self.dogs = Post.objects.create(
+            text='Собаки любят гулять', author=self.user
+        )
+
+    def found(self, query):
+        return [
+            post.pk for post in
+            search.SearchPaginator(query).cursor_page(None)
+        ]
+
+    def test_search_word_forms(self):
+        """Поиск находит другие формы слов, все слова обязательны."""
+        self.assertCountEqual(
+            self.found('котик'), [self.cats.pk, self.many_cats.pk]
+        )
+        self.assertEqual(self.found('любит котик спать'), [self.cats.pk])
+        self.assertEqual(self.found('котики гулять'), [])
+        self.assertEqual(self.found('!!!'), [])
+
+    def test_ranking(self):
+        """Пост с большим числом вхождений слова выше."""
+        self.assertEqual(
+            self.found('котики'), [self.many_cats.pk, self.cats.pk]
+        )
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.dogs.text = 'Котики не любят гулять'
+        self.dogs.save()
+        self.assertIn(self.dogs.pk, self.found('котик'))
+        self.assertEqual(self.found('собака'), [])
+        self.dogs.delete()
+        self.assertNotIn(self.dogs.pk, self.found('котик'))
+
+    def test_keyset_pages(self):
+        """Курсоры обходят все результаты без повторов в обе стороны."""
+        Post.objects.bulk_create(
+            Post(text='котик ' * (index % 3 + 1), author=self.user)
+            for index in range(7)
+        )
+        search.rebuild()
+        paginator = search.SearchPaginator('котик', per_page=3)
+        expected = [pk for score, pk in paginator.backend.search(['котик'])]
+        pages = [paginator.cursor_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.cursor_page(pages[-1].next_cursor))
+        self.assertEqual(
+            [post.pk for page in pages for post in page], expected
+        )
+        self.assertEqual(len(expected), 9)
+        previous = paginator.cursor_page(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[-2]))
+
+    @override_settings(SEARCH_BACKEND='python')
+    def test_inverted_index_backend(self):
+        """Запасной индекс ищет и ранжирует так же."""
+        self.assertEqual(search.rebuild(), 3)
+        self.assertTrue(SearchTerm.objects.exists())
+        self.assertEqual(
+            self.found('котики'), [self.many_cats.pk, self.cats.pk]
+        )
+        paginator = search.SearchPaginator('котики', per_page=1)
+        page = paginator.cursor_page(None)
+        self.assertEqual(
+            list(paginator.cursor_page(page.next_cursor)), [self.cats]
+        )
+        self.dogs.delete()
+        self.assertEqual(self.found('собака'), [])
+
+    def test_rebuild_command(self):
+        """Команда перестраивает индекс."""
+        search.get_backend().clear()
+        self.assertEqual(self.found('собака'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('собака'), [self.dogs.pk])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты
+        и сохраняет запрос в ссылках пагинации.
+        """
+        Post.objects.bulk_create(
+            Post(text='Котики', author=self.user) for _ in range(10)
+        )
+        search.rebuild()
+        response = self.client.get(reverse('posts:search'), {'q': 'котик'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(
+            response, f'q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA&amp;cursor='
+            f'{page_obj.next_cursor}'
+        )
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'котик', 'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+        response = self.client.get(reverse('posts:search'), {'q': 'кролик'})
+        self.assertContains(response, 'ничего не найдено')
@@ -0,0 +1,367 @@
+import datetime
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..constants import NUMBER_OF_POSTS
+from ..models import (
+    Comment,
+    Follow,
+    Group,
+    ModerationJob,
+    Post,
+    ThumbnailJob,
+    User,
+    UserStats,
+)
+from .. import comment_queue, sharding, stats
+
+SHARDS = ('test_shard0', 'test_shard1')
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+class ShardingTests(TestCase):
+    """Тестирует посты и комментарии в шардах по автору."""
+
+    databases = {'default', *SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        # Шарды — отдельные базы SQLite в памяти со схемой проекта.
+        cls.shards = override_settings(POST_SHARDS=list(SHARDS))
+        cls.shards.enable()
+        for alias in SHARDS:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'
+            }
+            connections[alias].creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            # migrate снова включает проверку внешних ключей.
+            connections[alias].disable_constraint_checking()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in SHARDS:
+            del connections[alias]
+            del connections.databases[alias]
+        cls.shards.disable()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = {}
+        number = 0
+        while len(cls.authors) < len(SHARDS):
+            author = User.objects.create_user(username=f'author{number}')
+            cls.authors.setdefault(sharding.db_for_author(author.pk), author)
+            number += 1
+        start = timezone.now() - datetime.timedelta(days=1)
+        cls.posts = []
+        for number in range(NUMBER_OF_POSTS + 3):
+            author = cls.authors[SHARDS[number % len(SHARDS)]]
+            post = Post.objects.create(
+                text=f'Пост {number}', author=author, group=cls.group
+            )
+            Post.objects.using(post._state.db).filter(pk=post.pk).update(
+                pub_date=start + datetime.timedelta(minutes=number)
+            )
+            cls.posts.append(post)
+        Follow.objects.create(
+            user=cls.reader, author=cls.authors[SHARDS[0]]
+        )
+
+    def _should_check_constraints(self, connection):
+        # Внешние ключи шарда ссылаются на основную базу.
+        return not sharding.is_shard(connection.alias) and (
+            super()._should_check_constraints(connection)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_posts_stored_in_author_shard(self):
+        """Пост лежит в шарде автора, номер шарда — остаток ключа."""
+        for post in self.posts:
+            with self.subTest(post=post.text):
+                alias = sharding.db_for_author(post.author_id)
+                self.assertEqual(post._state.db, alias)
+                self.assertEqual(sharding.db_for_post(post.pk), alias)
+                self.assertTrue(
+                    Post.objects.using(alias).filter(pk=post.pk).exists()
+                )
+        self.assertFalse(Post.objects.using('default').exists())
+
+    def test_post_ids_never_reused(self):
+        """Ключи шарда только растут: ключ удаленного последнего поста
+        не выдается снова, номер шарда остается в остатке ключа.
+        """
+        author = self.authors[SHARDS[1]]
+        deleted = Post.objects.create(text='Последний', author=author).pk
+        Post.objects.using(SHARDS[1]).filter(pk=deleted).delete()
+        reserved = [sharding.next_post_id(SHARDS[1]) for _ in range(2)]
+        new = Post.objects.create(text='Новый', author=author)
+        self.assertEqual(
+            sorted({deleted, *reserved, new.pk}),
+            [deleted, *reserved, new.pk]
+        )
+        for pk in (*reserved, new.pk):
+            self.assertEqual(sharding.db_for_post(pk), SHARDS[1])
+
+    def test_comments_stored_in_post_shard(self):
+        """Комментарий лежит в шарде поста, а не комментатора."""
+        post = self.posts[0]
+        self.client.force_login(self.reader)
+        self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Ответ'}
+        )
+        comment = Comment.objects.using(post._state.db).get()
+        self.assertEqual(
+            (comment.post_id, comment.author_id), (post.pk, self.reader.pk)
+        )
+
+    def test_comment_queue_writes_to_post_shard(self):
+        """Воркер журнала пишет комментарии в шарды их постов
+        и пропускает комментарии к несуществующим постам.
+        """
+        first, second = self.posts[0], self.posts[1]
+        missing = sharding.next_post_id(first._state.db)
+        with tempfile.TemporaryDirectory(dir=settings.BASE_DIR) as path:
+            with override_settings(
+                COMMENT_QUEUE_ENABLED=True,
+                COMMENT_QUEUE_PATH=os.path.join(path, 'queue.sqlite3')
+            ):
+                for post_id in (first.pk, second.pk, missing):
+                    comment_queue.enqueue(post_id, self.reader.pk, 'Ответ')
+                self.assertEqual(comment_queue.drain(), 3)
+                self.assertEqual(comment_queue.metrics()['depth'], 0)
+        for post in (first, second):
+            with self.subTest(post=post.text):
+                self.assertEqual(
+                    list(Comment.objects.using(post._state.db).values_list(
+                        'post_id', flat=True
+                    )),
+                    [post.pk]
+                )
+        self.assertFalse(Comment.objects.using('default').exists())
+        self.assertEqual(stats.user_stats(self.reader).comments_count, 2)
+
+    def test_feeds_merge_shards(self):
+        """Главная и группа сливают шарды по дате, курсор листает
+        общую ленту.
+        """
+        expected = [post.pk for post in reversed(self.posts)]
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                page = response.context['page_obj']
+                pks = [post.pk for post in page]
+                response = self.client.get(
+                    url, {'cursor': page.next_cursor}
+                )
+                pks += [post.pk for post in response.context['page_obj']]
+                self.assertEqual(pks, expected)
+                self.assertEqual(
+                    response.context['page_obj'][0].author,
+                    self.posts[2].author
+                )
+
+    def test_profile_and_post_detail_read_one_shard(self):
+        """Профиль и страница поста читают только шард автора."""
+        post = self.posts[0]
+        other = SHARDS[1] if post._state.db == SHARDS[0] else SHARDS[0]
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        urls = (
+            reverse('posts:profile', args=[post.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connections[other]) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(queries), 0)
+        self.assertContains(response, 'Ответ')
+        self.assertContains(response, 'reader')
+
+    def test_follow_index_reads_followed_shards(self):
+        """Лента подписок собирается из шардов авторов подписок."""
+        author = self.authors[SHARDS[0]]
+        self.client.force_login(self.reader)
+        with CaptureQueriesContext(connections[SHARDS[1]]) as queries:
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [
+                post.pk for post in reversed(self.posts)
+                if post.author_id == author.pk
+            ]
+        )
+        self.assertEqual(len(queries), 0)
+
+    def test_create_and_edit_post(self):
+        """Новый пост попадает в шард автора и редактируется там же."""
+        author = self.authors[SHARDS[1]]
+        self.client.force_login(author)
+        self.client.post(reverse('posts:post_create'), {'text': 'Новый'})
+        post = Post.objects.using(SHARDS[1]).get(text='Новый')
+        self.assertEqual(sharding.db_for_post(post.pk), SHARDS[1])
+        self.client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': 'Исправленный', 'group': self.group.pk}
+        )
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.text, post.group_id), ('Исправленный', self.group.pk)
+        )
+        index = self.client.get(reverse('posts:index'))
+        self.assertEqual(index.context['page_obj'][0].pk, post.pk)
+
+    def test_stats_rebuild_counts_shards(self):
+        """Пересчет счетчиков учитывает посты и комментарии шардов."""
+        Comment.objects.create(
+            post=self.posts[1], author=self.reader, text='Ответ'
+        )
+        UserStats.objects.all().delete()
+        stats.rebuild()
+        author = self.authors[SHARDS[0]]
+        self.assertEqual(
+            UserStats.objects.get(user=author).posts_count,
+            sum(post.author_id == author.pk for post in self.posts)
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).comments_count, 1
+        )
+
+    def test_thumbnails_and_search_in_shards(self):
+        """Задача миниатюр и поисковый индекс поста лежат в его шарде:
+        воркер делает миниатюры, поиск находит посты всех шардов
+        и забывает удаленный пост.
+        """
+        author = self.authors[SHARDS[1]]
+        other = Post.objects.create(
+            text='Котики в другом шарде', author=self.authors[SHARDS[0]]
+        )
+        with tempfile.TemporaryDirectory(dir=settings.BASE_DIR) as path:
+            with override_settings(MEDIA_ROOT=path):
+                post = Post.objects.create(
+                    text='Пост про котиков',
+                    author=author,
+                    image=SimpleUploadedFile(
+                        'cat.gif', SMALL_GIF, content_type='image/gif'
+                    )
+                )
+                job = ThumbnailJob.objects.using(SHARDS[1]).get()
+                self.assertEqual(job.post_id, post.pk)
+                self.assertFalse(ThumbnailJob.objects.using(
+                    'default'
+                ).exists())
+                url = reverse('posts:post_detail', args=[post.pk])
+                self.assertContains(
+                    self.client.get(url), 'Картинка обрабатывается'
+                )
+                call_command(
+                    'thumbnail_worker', once=True, processes=0,
+                    stdout=StringIO()
+                )
+                job.refresh_from_db()
+                self.assertEqual(job.status, ThumbnailJob.DONE)
+                response = self.client.get(url)
+                self.assertNotContains(response, 'Картинка обрабатывается')
+                self.assertContains(response, 'cache/')
+        search = reverse('posts:search')
+        response = self.client.get(search, {'q': 'котик'})
+        self.assertEqual(
+            {found.pk for found in response.context['page_obj']},
+            {post.pk, other.pk}
+        )
+        Post.objects.using(SHARDS[1]).filter(pk=post.pk).delete()
+        response = self.client.get(search, {'q': 'котик'})
+        self.assertEqual(
+            [found.pk for found in response.context['page_obj']],
+            [other.pk]
+        )
+
+    def test_admin_and_moderation_use_shard(self):
+        """Админка показывает выбранный шард, задача модерации
+        удаляет посты в нем.
+        """
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        url = reverse('admin:posts_post_changelist')
+        shard_posts = [
+            post for post in self.posts if post._state.db == SHARDS[1]
+        ]
+        response = self.client.get(url, {'database': SHARDS[1]})
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [post.pk for post in reversed(shard_posts)]
+        )
+        response = self.client.get(url, {'database': SHARDS[1], 'q': '1'})
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.posts[1].pk]
+        )
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=[shard_posts[0].pk])
+        )
+        self.assertContains(response, shard_posts[0].text)
+        response = self.client.post(f'{url}?database={SHARDS[1]}', {
+            'action': 'delete_posts',
+            '_selected_action': [post.pk for post in shard_posts[:2]],
+        })
+        self.assertEqual(response.status_code, 302)
+        job = ModerationJob.objects.get()
+        self.assertEqual((job.database, job.total), (SHARDS[1], 2))
+        call_command('moderation_worker', once=True, stdout=StringIO())
+        self.assertEqual(
+            Post.objects.using(SHARDS[1]).count(), len(shard_posts) - 2
+        )
+
+    def test_export_and_import_refused(self):
+        """Выгрузка и загрузка постов с шардами не запускаются."""
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'posts', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_data', 'posts=-', '--no-rebuild', stdout=StringIO()
+            )
+        output = StringIO()
+        call_command('export_data', 'groups', stdout=output)
+        self.assertIn('"slug": "group"', output.getvalue())
+
+    @override_settings(POST_SHARDS=[])
+    def test_disabled(self):
+        """Без шардов роутер не выбирает базу для постов."""
+        router = sharding.ShardRouter()
+        self.assertIsNone(
+            router.db_for_write(Post, instance=Post(author=self.reader))
+        )
+        self.assertIsNone(sharding.db_for_post(1))
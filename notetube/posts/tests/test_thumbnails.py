@@ -0,0 +1,106 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..constants import RESPONSIVE_DETAIL_SIZES, RESPONSIVE_WIDTHS
+from ..models import Post, User, ThumbnailJob
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailJobTests(TestCase):
+    """Тестирует фоновую генерацию миниатюр."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00'
+            b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+            b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+            b'\x00\x00\x01\x00\x01\x00\x00\x02'
+            b'\x02\x4c\x01\x00\x3b'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text='Тестовый текст поста',
+            author=ThumbnailJobTests.user,
+            image=SimpleUploadedFile(
+                name='gif.gif',
+                content=ThumbnailJobTests.gif,
+                content_type='image/gif'
+            )
+        )
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def test_post_with_image_enqueues_job(self):
+        """Пост с картинкой ставит задачу, правка текста — нет."""
+        self.assertEqual(
+            ThumbnailJob.objects.filter(post=self.post).count(), 1
+        )
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertEqual(
+            ThumbnailJob.objects.filter(post=self.post).count(), 1
+        )
+
+    def test_placeholder_until_worker_runs(self):
+        """До работы воркера показывается заглушка, после — миниатюра."""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Картинка обрабатывается')
+        self.assertNotContains(response, 'cache/')
+        call_command(
+            'thumbnail_worker', once=True, processes=0, stdout=StringIO()
+        )
+        self.assertEqual(
+            ThumbnailJob.objects.get(post=self.post).status,
+            ThumbnailJob.DONE
+        )
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Картинка обрабатывается')
+        self.assertContains(response, 'cache/')
+
+    def test_responsive_image_markup(self):
+        """Готовая картинка выводится со srcset, sizes и размерами."""
+        call_command(
+            'thumbnail_worker', once=True, processes=0, stdout=StringIO()
+        )
+        response = self.client.get(self.url)
+        for width in RESPONSIVE_WIDTHS:
+            with self.subTest(width=width):
+                self.assertContains(response, f' {width}w', count=2)
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(
+            response, f'sizes="{RESPONSIVE_DETAIL_SIZES}"', count=2
+        )
+        self.assertContains(response, 'width="1200"')
+        self.assertContains(response, 'height="600"')
+        self.assertContains(response, 'loading="eager"')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_broken_image_fails_after_attempts(self):
+        """Битая картинка помечается ошибкой после всех попыток."""
+        ThumbnailJob.objects.update(image='posts/missing.gif')
+        call_command(
+            'thumbnail_worker', once=True, processes=0, stdout=StringIO()
+        )
+        job = ThumbnailJob.objects.get(post=self.post)
+        self.assertEqual(job.status, ThumbnailJob.FAILED)
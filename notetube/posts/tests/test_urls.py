@@ -32,14 +32,15 @@ class URLTests(TestCase):
         self.auth_client2.force_login(URLTests.user2)
 
     def test_anonymous_pages_urls(self):
-        """Страницы index, group_list, profile, post_detail
+        """Страницы index, group_list, profile, post_detail, search
         доступны любому пользователю.
         """
         urls = (
             '/',
             f'/group/{URLTests.group.slug}/',
             f'/profile/{URLTests.user.username}/',
-            f'/posts/{URLTests.post.pk}/'
+            f'/posts/{URLTests.post.pk}/',
+            '/search/?q=текст'
         )
         for url in urls:
             with self.subTest():
@@ -1,15 +1,23 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
+from django.contrib.auth.models import update_last_login
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Post, Group, User, Comment, Follow
-from ..constants import NUMBER_OF_POSTS, NUMBER_OF_POSTS_TEST
+from ..models import Post, Group, User, Comment, Follow, FeedItem
+from ..constants import (
+    COMMENTS_PER_PAGE,
+    NUMBER_OF_POSTS,
+    NUMBER_OF_POSTS_TEST,
+)
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -246,17 +254,46 @@ class ViewsTests(TestCase):
         self.assertNotIn(new_post, wrong_group_objects)
 
     def test_cache_index_page(self):
-        """Проверка кеширования страницы index."""
+        """Страница index кешируется и сбрасывается при удалении поста."""
         response = self.auth_client.get(reverse('posts:index'))
         page_content = response.content
-        Post.objects.first().delete()
+        Post.objects.filter(pk=ViewsTests.post.pk).update(text='Без сигналов')
         response = self.auth_client.get(reverse('posts:index'))
         cached_page_content = response.content
-        cache.clear()
+        Post.objects.first().delete()
         response = self.auth_client.get(reverse('posts:index'))
         self.assertEqual(page_content, cached_page_content)
         self.assertNotEqual(page_content, response.content)
-        self.assertNotEqual(cached_page_content, response.content)
+
+    def test_cache_post_edit_invalidates_pages(self):
+        """Редактирование поста сбрасывает кеш страниц с этим постом."""
+        urls = [
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list', kwargs={'slug': ViewsTests.group.slug}
+            ),
+            reverse(
+                'posts:profile', kwargs={'username': ViewsTests.user.username}
+            ),
+            reverse(
+                'posts:post_detail', kwargs={'post_id': ViewsTests.post.pk}
+            ),
+        ]
+        for url in urls:
+            self.client.get(url)
+        self.auth_client.post(
+            reverse(
+                'posts:post_edit', kwargs={'post_id': ViewsTests.post.pk}
+            ),
+            data={
+                'text': 'Отредактированный текст',
+                'group': ViewsTests.group.pk
+            }
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Отредактированный текст')
 
     def test_auth_user_follow(self):
         """Авторизованный пользователь может подписываться
@@ -324,6 +361,41 @@ class ViewsTests(TestCase):
         response = self.auth_client.get(reverse('posts:follow_index'))
         self.assertNotIn(new_post, response.context['page_obj'][:])
 
+    def test_new_post_fanned_out_to_follower_feed(self):
+        """Новый пост раскладывается в ленту подписчика,
+        а после отписки убирается из нее.
+        """
+        new_post = Post.objects.create(
+            author=ViewsTests.user,
+            text=ViewsTests.post.text
+        )
+        self.assertTrue(FeedItem.objects.filter(
+            user=ViewsTests.user2, post=new_post
+        ).exists())
+        self.auth_client2.get(
+            reverse(
+                'posts:profile_unfollow', kwargs={
+                    'username': ViewsTests.user.username
+                }
+            )
+        )
+        self.assertFalse(FeedItem.objects.filter(
+            user=ViewsTests.user2
+        ).exists())
+
+    def test_celebrity_posts_read_at_follow_index(self):
+        """Посты популярного автора не раскладываются по лентам,
+        но попадают в ленту подписок при чтении.
+        """
+        with mock.patch('posts.feed.FEED_FANOUT_LIMIT', 1):
+            new_post = Post.objects.create(
+                author=ViewsTests.user,
+                text=ViewsTests.post.text
+            )
+            response = self.auth_client2.get(reverse('posts:follow_index'))
+        self.assertFalse(FeedItem.objects.filter(post=new_post).exists())
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
 
 class PaginatorViewsTests(TestCase):
     """Тестирует Paginator для view-функций."""
@@ -391,3 +463,313 @@ class PaginatorViewsTests(TestCase):
                 response = self.client.get(reverse_name)
                 self.assertEqual(len(response.context['page_obj']), (
                     NUMBER_OF_POSTS_TEST - NUMBER_OF_POSTS))
+
+    def test_cursor_pagination_pages(self):
+        """Курсорная пагинация отдает следующую и предыдущую страницы
+        для index, group_list, profile.
+        """
+        reverse_name_pages = [
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list', kwargs={
+                    'slug': PaginatorViewsTests.group.slug
+                }
+            ),
+            reverse(
+                'posts:profile', kwargs={
+                    'username': PaginatorViewsTests.user.username
+                }
+            )
+        ]
+        for reverse_name in reverse_name_pages:
+            with self.subTest(reverse_name=reverse_name):
+                first_page = self.client.get(reverse_name).context['page_obj']
+                self.assertTrue(first_page.has_next())
+                self.assertFalse(first_page.has_previous())
+                second_page = self.client.get(
+                    reverse_name, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    len(second_page), NUMBER_OF_POSTS_TEST - NUMBER_OF_POSTS
+                )
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(
+                    set(first_page).isdisjoint(set(second_page))
+                )
+                previous_page = self.client.get(
+                    reverse_name, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(previous_page), list(first_page))
+                self.assertFalse(previous_page.has_previous())
+
+    def test_cursor_pagination_same_pub_date(self):
+        """Посты с одинаковой датой не теряются и не дублируются."""
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        first_page = self.client.get(
+            reverse('posts:index')
+        ).context['page_obj']
+        second_page = self.client.get(
+            reverse('posts:index'), {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            len(set(first_page) | set(second_page)), NUMBER_OF_POSTS_TEST
+        )
+
+    def test_cached_index_pages_differ(self):
+        """Кеш index не отдает первую страницу вместо второй."""
+        first_page = self.client.get(reverse('posts:index'))
+        second_page = self.client.get(
+            reverse('posts:index'),
+            {'cursor': first_page.context['page_obj'].next_cursor}
+        )
+        numbered_page = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertNotEqual(first_page.content, second_page.content)
+        self.assertNotEqual(first_page.content, numbered_page.content)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор возвращает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), NUMBER_OF_POSTS)
+
+
+class QueryCountViewsTests(TestCase):
+    """Тестирует количество запросов к БД в лентах постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовое название группы',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for index in range(NUMBER_OF_POSTS_TEST):
+            group = Group.objects.create(
+                title=f'Группа {index}',
+                slug=f'group-{index}',
+                description='Описание группы'
+            )
+            post = Post.objects.create(
+                author=cls.author,
+                group=group if index % 2 else cls.group,
+                text='Тестовый текст поста'
+            )
+            Comment.objects.create(
+                text='Тестовый комментарий',
+                post=post,
+                author=cls.reader
+            )
+
+    def setUp(self):
+        self.auth_client = Client()
+        self.auth_client.force_login(QueryCountViewsTests.reader)
+
+    def count_queries(self, url, page_size):
+        with mock.patch('posts.utils.NUMBER_OF_POSTS', page_size):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.auth_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), page_size)
+
+        return len(queries)
+
+    def test_list_views_constant_query_count(self):
+        """Количество запросов лент не зависит от размера страницы."""
+        urls = [
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list', kwargs={
+                    'slug': QueryCountViewsTests.group.slug
+                }
+            ),
+            reverse(
+                'posts:profile', kwargs={
+                    'username': QueryCountViewsTests.author.username
+                }
+            ),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 2), self.count_queries(url, 6)
+                )
+
+    def test_list_views_annotate_comment_count(self):
+        """Посты ленты содержат количество комментариев."""
+        response = self.client.get(reverse('posts:index'))
+        for post in response.context['page_obj']:
+            with self.subTest(post=post.pk):
+                self.assertEqual(post.comment_count, 1)
+
+
+class ConditionalViewsTests(TestCase):
+    """Тестирует условные GET-запросы и заголовки кеша HTML-страниц."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+
+    def test_anonymous_not_modified(self):
+        """Анонимная страница без изменений — 304 без запросов к базе
+        (у поста — один запрос автора).
+        """
+        for url, queries in zip(self.urls, (0, 0, 0, 1)):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                self.assertIn('Last-Modified', response)
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_change_modifies_pages(self):
+        """Комментарий меняет ETag всех страниц с постом."""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(
+            text='Ответ', post=self.post, author=self.author
+        )
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def assertModified(self, etags, modified=True):
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, 200 if modified else 304
+                )
+
+    def test_group_change_modifies_pages(self):
+        """Изменение группы меняет ETag страниц с ее названием."""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertModified(etags)
+        self.assertContains(self.client.get(self.urls[1]), 'Новое название')
+        etag = self.client.get(self.urls[1])['ETag']
+        self.group.slug = 'renamed'
+        self.group.save()
+        response = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_user_change_modifies_pages(self):
+        """Изменение имени автора меняет ETag страниц с ним,
+        вход пользователя — нет.
+        """
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        update_last_login(None, self.author)
+        self.assertModified(etags, modified=False)
+        self.author.first_name = 'Лев'
+        self.author.save()
+        self.assertModified(etags)
+
+    def test_authenticated_not_cached(self):
+        """Страницы вошедшего пользователя личные и без ETag."""
+        self.client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn('ETag', response)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+
+class CommentPaginationTests(TestCase):
+    """Тестирует постраничную загрузку комментариев."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.comments = [
+            Comment.objects.create(
+                text=f'Комментарий {index}', post=cls.post, author=cls.author
+            )
+            for index in range(COMMENTS_PER_PAGE + 5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_first_page_is_bounded(self):
+        """На странице поста — первая страница комментариев
+        и ссылка на продолжение.
+        """
+        post = CommentPaginationTests.post
+        comments = CommentPaginationTests.comments
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        page = response.context['comments']
+        self.assertEqual(
+            self.texts(page), self.texts(comments[:COMMENTS_PER_PAGE])
+        )
+        self.assertContains(
+            response, reverse('posts:comments', args=[post.pk])
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]), {'order': 'newest'}
+        )
+        self.assertEqual(
+            response.context['comments'][0].text, comments[-1].text
+        )
+
+    def test_fragment_continues_page(self):
+        """Фрагмент по курсору отдает оставшиеся комментарии."""
+        post = CommentPaginationTests.post
+        first = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:comments', args=[post.pk]),
+            {'cursor': first.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            self.texts(response.context['comments']),
+            self.texts(CommentPaginationTests.comments[COMMENTS_PER_PAGE:])
+        )
+        self.assertNotContains(response, 'Показать еще')
+
+    def test_api_comments(self):
+        """JSON-страницы комментариев листаются курсором."""
+        url = reverse('posts:api_comments', args=[
+            CommentPaginationTests.post.pk
+        ])
+        data = self.client.get(url, {'order': 'newest'}).json()
+        self.assertEqual(len(data['results']), COMMENTS_PER_PAGE)
+        data = self.client.get(
+            url, {'order': 'newest', 'cursor': data['next']}
+        ).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            self.texts(reversed(CommentPaginationTests.comments[:5]))
+        )
+        self.assertIsNone(data['next'])
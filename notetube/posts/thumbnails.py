@@ -0,0 +1,191 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Запрос страницы никогда не декодирует картинку: шаблоны берут только
+уже готовые миниатюры (``responsive_image``), а недостающие создает
+воркер ``python manage.py thumbnail_worker`` из очереди ``ThumbnailJob``.
+
+С ``POST_SHARDS`` задача лежит в шарде поста, а воркер забирает
+самые старые задачи из всех шардов.
+"""
+import heapq
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import islice
+from multiprocessing import get_context
+
+import django
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings, settings
+from sorl.thumbnail.images import ImageFile
+
+from .constants import (
+    THUMBNAIL_BATCH_SIZE,
+    THUMBNAIL_GEOMETRIES,
+    THUMBNAIL_JOB_TIMEOUT,
+    THUMBNAIL_MAX_ATTEMPTS,
+)
+from .models import Post, ThumbnailJob
+from . import sharding, versions
+
+logger = logging.getLogger(__name__)
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, умеющий только искать готовые миниатюры."""
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей sorl или None."""
+        if not file_:
+            return None
+        source = ImageFile(file_)
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = ReadyThumbnailBackend()
+
+
+def enqueue(post):
+    """Ставит картинку поста в очередь на генерацию миниатюр
+    (с шардами — в шард поста).
+    """
+    if post.image:
+        ThumbnailJob.objects.using(sharding.db_for_post(post.pk)).create(
+            post=post, image=post.image.name
+        )
+
+
+def enqueue_missing():
+    """Ставит в очередь все картинки без готовых миниатюр."""
+    count = 0
+    for alias in sharding.databases():
+        posts = Post.objects.using(alias).exclude(image='').only(
+            'pk', 'image'
+        )
+        for post in posts.iterator():
+            if not all(
+                backend.get_ready_thumbnail(post.image, geometry, **options)
+                for geometry, options in THUMBNAIL_GEOMETRIES
+            ):
+                enqueue(post)
+                count += 1
+
+    return count
+
+
+def generate(image):
+    """Создает миниатюры всех стандартных размеров для картинки."""
+    for geometry, options in THUMBNAIL_GEOMETRIES:
+        thumbnail = get_thumbnail(image, geometry, **options)
+        if not thumbnail.exists():
+            raise FileNotFoundError(f'Миниатюра {geometry} не создана')
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, зависшие в обработке."""
+    stale = timezone.now() - timedelta(seconds=THUMBNAIL_JOB_TIMEOUT)
+
+    return sum(
+        ThumbnailJob.objects.using(alias).filter(
+            status=ThumbnailJob.PROCESSING, updated__lt=stale
+        ).update(status=ThumbnailJob.PENDING)
+        for alias in sharding.databases()
+    )
+
+
+def _oldest(alias, batch_size):
+    return [
+        (created, alias, pk)
+        for pk, created in ThumbnailJob.objects.using(alias).filter(
+            status=ThumbnailJob.PENDING
+        ).order_by('created').values_list('pk', 'created')[:batch_size]
+    ]
+
+
+def claim(batch_size=THUMBNAIL_BATCH_SIZE):
+    """Забирает пачку самых старых задач из очереди.
+
+    С шардами самые старые задачи каждого шарда сливаются по дате
+    постановки, и каждый шард отмечает свою часть пачки.
+    """
+    oldest = heapq.merge(
+        *(_oldest(alias, batch_size) for alias in sharding.databases()),
+        key=lambda row: row[0]
+    )
+    by_database = {}
+    for created, alias, pk in islice(oldest, batch_size):
+        by_database.setdefault(alias, []).append(pk)
+    jobs = []
+    for alias, ids in by_database.items():
+        with transaction.atomic(using=alias):
+            ThumbnailJob.objects.using(alias).filter(
+                pk__in=ids, status=ThumbnailJob.PENDING
+            ).update(
+                status=ThumbnailJob.PROCESSING,
+                attempts=F('attempts') + 1,
+                updated=timezone.now()
+            )
+        jobs += sharding.with_related(
+            ThumbnailJob.objects.using(alias).filter(
+                pk__in=ids, status=ThumbnailJob.PROCESSING
+            ),
+            'post__group'
+        )
+
+    return jobs
+
+
+def finish(job, error=None):
+    """Отмечает результат задачи; готовая картинка сбрасывает кеш поста."""
+    if error is None:
+        job.status = ThumbnailJob.DONE
+        job.error = ''
+        versions.bump(*versions.post_scopes(job.post))
+    else:
+        logger.error('Миниатюры для %s не созданы: %s', job.image, error)
+        job.error = str(error)
+        job.status = (
+            ThumbnailJob.PENDING if job.attempts < THUMBNAIL_MAX_ATTEMPTS
+            else ThumbnailJob.FAILED
+        )
+    job.save(update_fields=('status', 'error', 'updated'))
+
+
+def process_batch(jobs, executor=None):
+    """Обрабатывает пачку задач в пуле процессов или в текущем процессе."""
+    if executor is None:
+        for job in jobs:
+            try:
+                generate(job.image)
+            except Exception as error:
+                finish(job, error)
+            else:
+                finish(job)
+        return
+    futures = [(job, executor.submit(generate, job.image)) for job in jobs]
+    for job, future in futures:
+        error = future.exception()
+        finish(job, error)
+
+
+def make_executor(processes):
+    """Пул процессов-генераторов; каждый процесс настраивает Django сам."""
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=get_context('spawn'),
+        initializer=django.setup
+    )
@@ -1,15 +1,19 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/', views.search, name='search'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/', views.comments, name='comments'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -28,4 +32,16 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.comments,
+        name='api_comments'
+    ),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group'),
+    path(
+        'api/profile/<str:username>/', api.profile, name='api_profile'
+    ),
+    path('api/follow/', api.follow_index, name='api_follow'),
 ]
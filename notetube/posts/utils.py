@@ -1,10 +1,267 @@
-from django.core.paginator import Paginator
+import base64
+import hashlib
 
-from .constants import NUMBER_OF_POSTS
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
+from .constants import (
+    COMMENT_ORDER_PARAM,
+    COMMENT_ORDERS,
+    COMMENTS_PER_PAGE,
+    COUNT_CACHE_TIMEOUT,
+    CURSOR_PARAM,
+    ESTIMATED_COUNT_THRESHOLD,
+    NUMBER_OF_POSTS,
+)
+from . import sharding
 
-def page_object(request, post_list):
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
+
+def encode_cursor(direction, key, pk):
+    """Кодирует направление и ключ объекта в строку курсора."""
+    return base64.urlsafe_b64encode(
+        '|'.join([direction, str(key), str(pk)]).encode()
+    ).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse_key=parse_datetime):
+    """Раскодирует строку курсора, для битого курсора возвращает None.
+
+    ``parse_key`` превращает строку ключа в значение (по умолчанию — дату).
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, key, pk = raw.split('|')
+        key = parse_key(key)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if direction not in ('next', 'prev') or key is None:
+        return None
+
+    return direction, key, pk
+
+
+def cached_count(paginator, timeout=COUNT_CACHE_TIMEOUT):
+    """Количество объектов пагинатора, закешированное на ``timeout`` секунд.
+
+    Ключ кеша — текст SQL-запроса, поэтому у разных фильтров
+    свои счетчики.
+    """
+    object_list = paginator.object_list
+    if not timeout or not hasattr(object_list, 'query'):
+        return Paginator.count.func(paginator)
+    query = str(object_list.query).encode()
+    key = 'paginator_count:' + hashlib.md5(query).hexdigest()
+
+    return cache.get_or_set(
+        key, lambda: Paginator.count.func(paginator), timeout
+    )
+
+
+def estimate_count(model, using='default'):
+    """Оценка числа строк таблицы по статистике базы или None.
+
+    Статистика появляется после ``ANALYZE`` (SQLite, PostgreSQL)
+    и может отставать от реального количества.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+        'postgresql': 'SELECT reltuples FROM pg_class WHERE relname = %s',
+        'mysql': (
+            'SELECT table_rows FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = %s'
+        ),
+    }
+    if connection.vendor not in queries:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(queries[connection.vendor], [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(float(str(row[0]).split()[0]))
+
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор для списков админки по большим таблицам.
+
+    Без фильтров количество берется из статистики базы, если таблица
+    больше ``ESTIMATED_COUNT_THRESHOLD`` строк; с фильтрами — считается
+    и кешируется на ``COUNT_CACHE_TIMEOUT`` секунд.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_count(
+                self.object_list.model, self.object_list.db
+            )
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+
+        return cached_count(self)
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации.
+
+    Не знает своего номера: вместо него хранит курсоры соседних страниц.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page of %s>' % len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset) вместо LIMIT/OFFSET.
+
+    Страница выбирается условием на пару полей ``ordering``
+    (дата, первичный ключ), поэтому любая страница стоит столько же,
+    сколько первая. Общее количество объектов считается лениво
+    и кешируется на ``count_timeout`` секунд.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('pub_date', 'pk'),
+                 descending=True, count_timeout=COUNT_CACHE_TIMEOUT,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = ordering
+        self.descending = descending
+        self.count_timeout = count_timeout
+
+    def _check_object_list_is_ordered(self):
+        """Порядок задает сам пагинатор."""
+
+    @cached_property
+    def count(self):
+        """Приблизительное (кешированное) количество объектов."""
+        return cached_count(self, self.count_timeout)
+
+    def _order_by(self, reverse):
+        prefix = '-' if self.descending != reverse else ''
+
+        return [prefix + field for field in self.ordering]
+
+    def _seek(self, queryset, date, pk, forward):
+        date_field, pk_field = self.ordering
+        lookup = 'lt' if self.descending == forward else 'gt'
+
+        return queryset.filter(
+            Q(**{f'{date_field}__{lookup}': date})
+            | Q(**{date_field: date, f'{pk_field}__{lookup}': pk})
+        )
+
+    def cursor_page(self, cursor):
+        """Возвращает страницу после/перед курсором.
+
+        Пустой или битый курсор означает первую страницу.
+        """
+        decoded = decode_cursor(cursor) if cursor else None
+        queryset = self.object_list
+        forward = True
+        if decoded is not None:
+            direction, date, pk = decoded
+            forward = direction == 'next'
+            queryset = self._seek(queryset, date, pk, forward)
+        queryset = queryset.order_by(*self._order_by(reverse=not forward))
+        objects = list(queryset[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if not forward:
+            objects.reverse()
+        has_next = has_more if forward else decoded is not None
+        has_previous = decoded is not None if forward else has_more
+        next_cursor = previous_cursor = None
+        if objects and has_next:
+            next_cursor = self.make_cursor(objects[-1], 'next')
+        if objects and has_previous:
+            previous_cursor = self.make_cursor(objects[0], 'prev')
+
+        return CursorPage(objects, self, next_cursor, previous_cursor)
+
+    def make_cursor(self, obj, direction):
+        """Кодирует ключ объекта и направление в строку курсора."""
+        date_field, pk_field = self.ordering
+
+        return encode_cursor(
+            direction,
+            getattr(obj, date_field).isoformat(),
+            getattr(obj, pk_field)
+        )
+
+
+def page_object(request, post_list, ordering=('pub_date', 'pk')):
+    """Возвращает страницу ленты.
+
+    С параметром ``page`` работает обычная нумерованная пагинация
+    (с кешированным количеством), иначе — курсорная по полям ``ordering``.
+    """
+    paginator = CursorPaginator(post_list, NUMBER_OF_POSTS, ordering=ordering)
     page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+
+    return paginator.cursor_page(request.GET.get(CURSOR_PARAM))
+
+
+def comment_order(request):
+    """Порядок комментариев из запроса: ``oldest`` (по умолчанию)
+    или ``newest``.
+    """
+    order = request.GET.get(COMMENT_ORDER_PARAM)
+
+    return order if order in COMMENT_ORDERS else COMMENT_ORDERS[0]
+
+
+def comment_page(post, cursor=None, order=COMMENT_ORDERS[0]):
+    """Страница комментариев поста с авторами по курсору.
+
+    Страница ограничена ``COMMENTS_PER_PAGE`` комментариями
+    и читается по индексу (пост, дата).
+    """
+    paginator = CursorPaginator(
+        sharding.with_related(post.comments.all(), 'author'),
+        COMMENTS_PER_PAGE,
+        ordering=('created', 'pk'),
+        descending=order == 'newest'
+    )
 
-    return paginator.get_page(page_number)
+    return paginator.cursor_page(cursor)
@@ -0,0 +1,268 @@
+"""Версии содержимого для кеша фрагментов.
+
+Версия области (вся лента, группа, автор, пост) — время ее последнего
+изменения. Она входит в ключи кешированных фрагментов, поэтому
+изменение поста или комментария делает старые фрагменты недоступными
+без явного удаления.
+
+Те же версии дают ETag и Last-Modified для условных GET-запросов
+(``conditional``): ответ 304 отдается без обращения к базе.
+"""
+import datetime
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .constants import HTML_CACHE_MAX_AGE, PAGE_CACHE_TIMEOUT
+from .models import Comment, Group, Post, User
+from . import sharding
+
+VERSION_KEY = 'posts:version:{}'
+
+INDEX = ('index',)
+
+
+def group_scope(slug):
+    return ('group', slug)
+
+
+def author_scope(username):
+    return ('author', username)
+
+
+def post_scope(post_id):
+    return ('post', post_id)
+
+
+def post_scopes(post, *group_slugs):
+    """Области кеша, которые затрагивает изменение поста."""
+    author = User.objects.filter(
+        pk=post.author_id
+    ).values_list('username', flat=True).first()
+    scopes = [INDEX, post_scope(post.pk)]
+    if author is not None:
+        scopes.append(author_scope(author))
+    if post.group_id is not None:
+        group_slugs += (post.group.slug,)
+    scopes.extend(group_scope(slug) for slug in set(group_slugs))
+
+    return scopes
+
+
+def bulk_post_scopes(post_ids, *group_slugs):
+    """Области кеша, которые затрагивает массовое изменение постов."""
+    if sharding.enabled():
+        rows = _shard_post_rows(post_ids)
+    else:
+        rows = Post.objects.filter(
+            pk__in=post_ids
+        ).order_by().values_list('pk', 'author__username', 'group__slug')
+    scopes = {INDEX}
+    for pk, username, slug in rows:
+        scopes.add(post_scope(pk))
+        scopes.add(author_scope(username))
+        if slug is not None:
+            scopes.add(group_scope(slug))
+    scopes.update(group_scope(slug) for slug in group_slugs)
+
+    return list(scopes)
+
+
+def _shard_post_rows(post_ids):
+    """Ключ, автор и группа постов из шардов; имена авторов и адреса
+    групп читаются из основной базы.
+    """
+    rows = []
+    for alias, ids in sharding.by_post_shard(post_ids).items():
+        rows += Post.objects.using(alias).filter(
+            pk__in=ids
+        ).order_by().values_list('pk', 'author_id', 'group_id')
+    usernames = dict(User.objects.filter(
+        pk__in={author_id for _, author_id, _ in rows}
+    ).values_list('pk', 'username'))
+    slugs = dict(Group.objects.filter(
+        pk__in={group_id for _, _, group_id in rows}
+    ).values_list('pk', 'slug'))
+
+    return [
+        (pk, usernames.get(author_id), slugs.get(group_id))
+        for pk, author_id, group_id in rows
+    ]
+
+
+def group_scopes(group, *slugs):
+    """Страницы с названием группы: ее лента (и лента по старому
+    адресу ``slugs``), главная, профили и посты авторов группы.
+    """
+    usernames = User.objects.filter(
+        pk__in=sharding.distinct(Post, 'author_id', group_id=group.pk)
+    ).values_list('username', flat=True)
+
+    return [
+        INDEX,
+        *(group_scope(slug) for slug in {group.slug, *slugs}),
+        *(author_scope(username) for username in usernames),
+    ]
+
+
+def user_scopes(user, *usernames):
+    """Страницы с именем пользователя: профиль (и профиль по старому
+    имени ``usernames``), главная, ленты групп его постов и посты
+    с его комментариями.
+    """
+    slugs = Group.objects.filter(
+        pk__in=sharding.distinct(Post, 'group_id', author_id=user.pk)
+    ).values_list('slug', flat=True)
+    post_ids = sharding.distinct(Comment, 'post_id', author_id=user.pk)
+
+    return [
+        INDEX,
+        *(author_scope(username) for username in {user.username, *usernames}),
+        *(group_scope(slug) for slug in slugs),
+        *(post_scope(post_id) for post_id in post_ids),
+    ]
+
+
+def follow_scopes(follow):
+    """Профили, счетчики подписок которых изменились."""
+    usernames = User.objects.filter(
+        pk__in=(follow.user_id, follow.author_id)
+    ).values_list('username', flat=True)
+
+    return [author_scope(username) for username in usernames]
+
+
+def comment_scopes(comment):
+    """Пост комментария и ленты, в которых показан его счетчик."""
+    post = sharding.for_post(comment.post_id).filter(
+        pk=comment.post_id
+    ).first()
+    if post is None:
+        return [post_scope(comment.post_id)]
+
+    return post_scopes(post)
+
+
+def _key(scope):
+    return VERSION_KEY.format(':'.join(map(str, scope)))
+
+
+def get_versions(*scopes):
+    """Версии областей; отсутствующие в кеше заводятся заново."""
+    keys = [_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, None)
+        versions.update(cache.get_many(missing))
+
+    return [versions.get(key, 0) for key in keys]
+
+
+def get_version(scope):
+    return get_versions(scope)[0]
+
+
+def bump(*scopes):
+    """Отмечает области измененными."""
+    now = time.time()
+    cache.set_many({_key(scope): now for scope in scopes}, None)
+
+
+def cache_context(*scopes):
+    """Контекст для тега ``{% cache %}`` страницы из областей ``scopes``."""
+    return {
+        'cache_timeout': PAGE_CACHE_TIMEOUT,
+        'cache_version': '-'.join(map(str, get_versions(*scopes))),
+    }
+
+
+def annotate_versions(page):
+    """Проставляет постам страницы ``cache_version`` одним запросом к кешу."""
+    page.object_list = list(page.object_list)
+    versions = get_versions(
+        *(post_scope(post.pk) for post in page.object_list)
+    )
+    for post, version in zip(page.object_list, versions):
+        post.cache_version = version
+
+
+def conditional(scopes):
+    """Условный GET по версиям областей ``scopes(request, **kwargs)``.
+
+    ETag — хеш адреса с параметрами, областей и их версий,
+    Last-Modified — время последнего изменения. Если ``scopes``
+    возвращает None, заголовки не ставятся и ответ рисуется как обычно.
+    """
+    def scope_versions(request, **kwargs):
+        if not hasattr(request, '_scope_versions'):
+            request._scopes = scopes(request, **kwargs)
+            request._scope_versions = (
+                None if request._scopes is None
+                else get_versions(*request._scopes)
+            )
+
+        return request._scope_versions
+
+    def etag(request, **kwargs):
+        values = scope_versions(request, **kwargs)
+        if values is None:
+            return None
+        key = '|'.join([
+            request.get_full_path(),
+            *map(repr, request._scopes),
+            *map(repr, values)
+        ])
+
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        values = scope_versions(request, **kwargs)
+        if not values:
+            return None
+
+        return datetime.datetime.fromtimestamp(
+            max(values), tz=datetime.timezone.utc
+        )
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def anonymous_scopes(scopes):
+    """Области страницы только для анонимных запросов: страница
+    вошедшего пользователя зависит от него и не кешируется.
+    """
+    def wrapper(request, **kwargs):
+        if request.user.is_authenticated:
+            return None
+
+        return scopes(request, **kwargs)
+
+    return wrapper
+
+
+def public_cache(view):
+    """Заголовки кеша HTML-страницы: анонимная страница общая
+    и хранится ``HTML_CACHE_MAX_AGE`` секунд, страница вошедшего
+    пользователя — личная и всегда перепроверяется.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ('Cookie',))
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=HTML_CACHE_MAX_AGE
+            )
+
+        return response
+
+    return wrapper
@@ -1,40 +1,96 @@
+from urllib.parse import urlencode
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-
-from .models import Post, Group, User, Follow
+from django.db import transaction
+
+from .models import Group, User, Follow
+from .constants import (
+    COMMENT_ORDER_PARAM,
+    CURSOR_PARAM,
+    PAGE_CACHE_TIMEOUT,
+    SEARCH_PARAM,
+)
 from .forms import PostForm, CommentForm
-from .utils import page_object
+from .feed import FEED_ORDERING, follow_feed
+from .search import SearchPaginator
+from .stats import user_stats
+from .utils import comment_order, comment_page, page_object
+from . import comment_queue, sharding, versions
+
+
+def _post_detail_scopes(request, post_id):
+    """Пост и его автор (счетчики автора показаны рядом с постом)."""
+    username = sharding.author_username(post_id)
+    if username is None:
+        return None
 
+    return [versions.post_scope(post_id), versions.author_scope(username)]
 
+
+@versions.public_cache
+@versions.conditional(
+    versions.anonymous_scopes(lambda request: [versions.INDEX])
+)
 def index(request):
     """Функция главной страницы."""
-    post_list = Post.objects.select_related('author')
+    post_list = sharding.posts().for_listing()
     page_obj = page_object(request, post_list)
+    versions.annotate_versions(page_obj)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **versions.cache_context(versions.INDEX)
     }
 
     return render(request, 'posts/index.html', context)
 
 
+@versions.public_cache
+@versions.conditional(versions.anonymous_scopes(
+    lambda request, slug: [versions.group_scope(slug)]
+))
 def group_posts(request, slug):
     """Функция страниц групп."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = sharding.posts(group=group).for_listing()
     page_obj = page_object(request, post_list)
+    versions.annotate_versions(page_obj)
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **versions.cache_context(versions.group_scope(group.slug))
     }
 
     return render(request, 'posts/group_list.html', context)
 
 
+def search(request):
+    """Функция страницы поиска."""
+    query = request.GET.get(SEARCH_PARAM, '').strip()
+    page_obj = SearchPaginator(query).cursor_page(
+        request.GET.get(CURSOR_PARAM)
+    )
+    versions.annotate_versions(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({SEARCH_PARAM: query}) + '&',
+        'cache_timeout': PAGE_CACHE_TIMEOUT
+    }
+
+    return render(request, 'posts/search.html', context)
+
+
+@versions.public_cache
+@versions.conditional(versions.anonymous_scopes(
+    lambda request, username: [versions.author_scope(username)]
+))
 def profile(request, username):
     """Функция страницы пользователя."""
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    post_list = author.posts.for_listing()
     page_obj = page_object(request, post_list)
+    versions.annotate_versions(page_obj)
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -42,28 +98,66 @@ def profile(request, username):
         ).exists()
     context = {
         'author': author,
+        'stats': user_stats(author),
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        **versions.cache_context(versions.author_scope(author.username))
     }
 
     return render(request, 'posts/profile.html', context)
 
 
+@versions.public_cache
+@versions.conditional(versions.anonymous_scopes(_post_detail_scopes))
 def post_detail(request, post_id):
     """Функция подробной информации поста."""
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        sharding.with_related(
+            sharding.for_post(post_id), 'author__stats', 'group'
+        ),
+        pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    order = comment_order(request)
     context = {
         'post': post,
+        'author_stats': user_stats(post.author),
         'form': form,
-        'comments': comments
+        'comments': comment_page(post, request.GET.get(CURSOR_PARAM), order),
+        'comment_order': order,
+        'order_param': COMMENT_ORDER_PARAM,
+        'pending_comments': (
+            comment_queue.pending(post.pk, request.user.pk)
+            if request.user.is_authenticated else []
+        ),
+        **versions.cache_context(
+            versions.post_scope(post.pk),
+            versions.author_scope(post.author.username)
+        )
     }
 
     return render(request, 'posts/post_detail.html', context)
 
 
+@versions.conditional(
+    lambda request, post_id: [versions.post_scope(post_id)]
+)
+def comments(request, post_id):
+    """Следующая страница комментариев поста фрагментом HTML."""
+    post = get_object_or_404(sharding.for_post(post_id), pk=post_id)
+    order = comment_order(request)
+    context = {
+        'post': post,
+        'comments': comment_page(post, request.GET.get(CURSOR_PARAM), order),
+        'comment_order': order,
+        'order_param': COMMENT_ORDER_PARAM,
+    }
+
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     """Функция создания поста."""
     form = PostForm(
@@ -83,7 +177,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     """Функция редактирования поста."""
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(sharding.for_post(post_id), pk=post_id)
     if request.user != post.author:
 
         return redirect('posts:post_detail', post_id)
@@ -108,8 +202,26 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    """Функция создания комментария."""
-    post = get_object_or_404(Post, pk=post_id)
+    """Функция создания комментария.
+
+    В режиме отложенной записи комментарий уходит в журнал
+    ``comment_queue`` без обращения к посту.
+    """
+    if comment_queue.enabled():
+        form = CommentForm(request.POST or None)
+        if form.is_valid():
+            comment_queue.enqueue(
+                post_id, request.user.pk, form.cleaned_data['text']
+            )
+
+        return redirect('posts:post_detail', post_id)
+
+    return _add_comment(request, post_id)
+
+
+@transaction.atomic
+def _add_comment(request, post_id):
+    post = get_object_or_404(sharding.for_post(post_id), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -123,16 +235,19 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     """Функция страницы подписок."""
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = page_object(request, post_list)
+    post_list = follow_feed(request.user).for_listing()
+    page_obj = page_object(request, post_list, ordering=FEED_ORDERING)
+    versions.annotate_versions(page_obj)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'cache_timeout': PAGE_CACHE_TIMEOUT
     }
 
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     """Функция подписки."""
     author = get_object_or_404(User, username=username)
@@ -146,6 +261,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     """Функция отписки."""
     author = get_object_or_404(User, username=username)
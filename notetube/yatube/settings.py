@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -27,11 +28,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -41,7 +44,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.ProfilingTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -62,9 +65,56 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение переиспользуется между запросами потока.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Реплики только для чтения (core.routers): пути к файлам SQLite через
+# запятую. Локально их заполняет python manage.py replicate.
+# После изменяющего запроса сессия REPLICA_PIN_SECONDS секунд читает
+# из основной базы.
+DATABASE_REPLICAS = []
+for index, path in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+REPLICA_PIN_SECONDS = 5
+
+# Шарды постов и комментариев (posts.sharding): пути к файлам SQLite
+# через запятую. Посты автора хранятся в шарде по хешу его id, схема
+# шарда создается командой migrate --database shardN.
+POST_SHARDS = []
+for index, path in enumerate(
+    filter(None, os.getenv('DB_SHARDS', '').split(','))
+):
+    DATABASES[f'shard{index}'] = {**DATABASES['default'], 'NAME': path}
+    POST_SHARDS.append(f'shard{index}')
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'core.routers.ReplicaRouter',
+]
+
+# PRAGMA для каждого нового соединения SQLite (core.db).
+# default — настройки SQLite по умолчанию.
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'performance')
+SQLITE_PROFILES = {
+    'default': {},
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.'
@@ -100,16 +150,94 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки всегда пишутся во временный файл по частям, а не в память.
+FILE_UPLOAD_HANDLERS = (
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+)
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Общий для всех процессов кеш (L2): locmem, file, db или redis.
+# Для db нужна таблица: python manage.py createcachetable
+# Для redis нужен пакет django-redis.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+SHARED_CACHES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'notetube_cache')
+        ),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'cache_table'),
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', 5)),
+            'LOCAL_EXCLUDE': ('posts:version:',),
+            'LOCK_TIMEOUT': 10,
+        },
+    },
+    'shared': SHARED_CACHES[CACHE_BACKEND],
+}
+
+# Поисковый индекс постов: auto (FTS5 на SQLite, если доступен),
+# fts5 или python (таблица SearchTerm на любой базе).
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+# Отложенная запись комментариев (posts.comment_queue): комментарии
+# пишутся в журнал SQLite и переносятся в базу воркером
+# python manage.py comment_queue_worker.
+COMMENT_QUEUE_ENABLED = os.getenv('COMMENT_QUEUE_ENABLED', '') == '1'
+COMMENT_QUEUE_PATH = os.getenv(
+    'COMMENT_QUEUE_PATH', os.path.join(BASE_DIR, 'comment_queue.sqlite3')
+)
+
+# Выборочное профилирование запросов (core.profiling): доля
+# профилируемых запросов, порог повторов одного SQL для отметки N+1
+# и запись каждого замера в лог core.profiling в формате JSON.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '') == '1'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_DUPLICATE_THRESHOLD = 3
+PROFILING_LOG = os.getenv('PROFILING_LOG', '') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'core.log.JsonFormatter'},
+    },
+    'handlers': {
+        'json': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'core.profiling': {
+            'handlers': ['json'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -3,9 +3,12 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import profiling_stats
+
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('admin/profiling/', profiling_stats, name='profiling_stats'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
@@ -0,0 +1,8 @@
+import pytest
+from core.testing import query_budget as _query_budget
+
+
+@pytest.fixture
+def query_budget(db):
+    """Контекстный менеджер бюджета запросов: query_budget(5, label=...)."""
+    return _query_budget
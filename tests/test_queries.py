@@ -0,0 +1,24 @@
+import pytest
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_queries(self, client, few_posts_with_group,
+                             query_budget):
+        url = f'/profile/{few_posts_with_group.author.username}/'
+        with query_budget(6, label='/profile/<username>/'):
+            response = client.get(url)
+        assert response.status_code == 200, (
+            'Страница `/profile/<username>/` работает неправильно'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_detail_queries(self, client, few_posts_with_group,
+                                 query_budget):
+        url = f'/posts/{few_posts_with_group.id}/'
+        with query_budget(5, label='/posts/<post_id>/'):
+            response = client.get(url)
+        assert response.status_code == 200, (
+            'Страница `/posts/<post_id>/` работает неправильно'
+        )